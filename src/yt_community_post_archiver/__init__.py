@@ -5,7 +5,18 @@ try:
 except PackageNotFoundError:
     __version__ = "unknown"
 
-from yt_community_post_archiver.archiver import main
+# NB: Keep this import light! Anything importing Selenium, Pillow, requests, etc. should only
+# be imported in the code paths that actually need it.
+from yt_community_post_archiver.cli import main as main
 
-if __name__ == "__main__":
-    main()
+# The library API (see `api.py`) is loaded on first use, to keep this import light.
+_API_NAMES = {"iter_posts", "make_settings", "ScrapedPost"}
+
+
+def __getattr__(name: str):
+    if name in _API_NAMES:
+        from yt_community_post_archiver import api
+
+        return getattr(api, name)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,4 @@
-from yt_community_post_archiver.archiver import main
+from yt_community_post_archiver.cli import main
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,100 @@
+# A library API for archiving posts from Python, without going through the command line or the file system.
+
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Any, Iterator
+
+from yt_community_post_archiver.arguments import ArchiverSettings, get_settings
+from yt_community_post_archiver.post import Post, get_post_id
+from yt_community_post_archiver.storage import MemoryStorage
+
+if TYPE_CHECKING:
+    from yt_community_post_archiver.asset_cache import AssetCache
+    from yt_community_post_archiver.comment import Comment
+
+
+@dataclass
+class ScrapedPost:
+    """
+    A post, along with its saved comments and assets (images and screenshots). Assets are only included if the
+    post wasn't persisted to disk. With `--cache-emotes`, the emotes and badges its comments refer to are
+    included in `cached_assets`, by their ID.
+    """
+
+    post: Post
+    comments: list["Comment"] = field(default_factory=list)
+    assets: dict[str, bytes] = field(default_factory=dict)
+    cached_assets: dict[str, bytes] = field(default_factory=dict)
+
+
+def _cached_assets(
+    asset_cache: "AssetCache | None", comments: list["Comment"]
+) -> dict[str, bytes]:
+    if asset_cache is None:
+        return {}
+
+    cached_assets = {}
+    for comment in comments:
+        for asset_id in [*comment.emotes.values(), comment.badge]:
+            if asset_id is None or asset_id in cached_assets:
+                continue
+
+            data = asset_cache.read(asset_id)
+            if data is not None:
+                cached_assets[asset_id] = data
+
+    return cached_assets
+
+
+def make_settings(url: str, *args: str) -> ArchiverSettings:
+    """
+    Create settings the same way as the command line would, e.g.
+    `make_settings(url, "--save-comments", "all", "--max-posts", "10")`. Raises a `ValueError` if the arguments
+    are invalid.
+    """
+
+    settings, _ = get_settings([url, *args], exit_on_error=False)
+    return settings
+
+
+def iter_posts(
+    url: str,
+    settings: ArchiverSettings | None = None,
+    driver: Any | None = None,
+    persist: bool = False,
+) -> Iterator[ScrapedPost]:
+    """
+    Lazily archive posts from a URL, yielding each one as soon as it's been processed. Posts that were skipped
+    or failed aren't yielded.
+
+    If `driver` (a Selenium Chrome or Firefox WebDriver) is given, it's used instead of starting a new browser,
+    and is left running afterwards. If `persist` is set, posts are also saved to the output directory in the
+    settings; otherwise, nothing is written to disk and images are returned in `ScrapedPost.assets` instead.
+    """
+
+    from yt_community_post_archiver.archiver import Archiver
+
+    settings = replace(settings or make_settings(url), url=url)
+    memory = None if persist else MemoryStorage()
+
+    with Archiver(settings, driver=driver, storage=memory) as archiver:
+        archiver.keep_comments = True
+
+        for post_builder in archiver.iter_handled_posts():
+            post = post_builder.built_post
+            if post is None:
+                continue
+
+            assets = {}
+            post_id = get_post_id(post.url)
+            if memory is not None and post_id is not None:
+                assets = dict(memory.iter_assets(post_id))
+                memory.discard(post_id)
+
+            yield ScrapedPost(
+                post=post,
+                comments=post_builder.kept_comments,
+                assets=assets,
+                cached_assets=_cached_assets(
+                    archiver.asset_cache, post_builder.kept_comments
+                ),
+            )
@@ -1,27 +1,109 @@
 #!/usr/bin/python
 
+import asyncio
+import json
 import os
 import signal
 import sys
 import time
 import traceback
 from collections import defaultdict
+from datetime import UTC, datetime
 from pathlib import Path
+from typing import Iterator, TextIO
 
+from selenium.webdriver.chrome.webdriver import WebDriver as ChromeWebDriver
 from selenium.webdriver.common.by import By
+from selenium.webdriver.firefox.webdriver import WebDriver as FirefoxWebDriver
 from selenium.webdriver.remote.webelement import WebElement
 
-from yt_community_post_archiver.arguments import ArchiverSettings, get_settings
+from yt_community_post_archiver.arguments import ArchiverSettings
+from yt_community_post_archiver.asset_cache import AssetCache
 from yt_community_post_archiver.cookies import parse_cookies
+from yt_community_post_archiver.dates import DatePosition
+from yt_community_post_archiver.dead_letter import (
+    DEAD_LETTER_FILE_NAME,
+    DeadLetterQueue,
+)
+from yt_community_post_archiver.governor import RateGovernor
 from yt_community_post_archiver.helpers import (
     LOAD_SLEEP_SECS,
-    close_current_tab,
+    find_post_element,
     get_post_link,
     init_driver,
-    scroll_to_element,
+    navigate,
+)
+from yt_community_post_archiver.jobs import (
+    DEFAULT_LEASE_SECS,
+    JobStore,
+    LeaseHeartbeat,
+    worker_id,
 )
+from yt_community_post_archiver.last_seen import LAST_SEEN_FILE_NAME, LastSeenLog
+from yt_community_post_archiver.pipeline import CrawlPipeline
 from yt_community_post_archiver.post import get_post_id
-from yt_community_post_archiver.post_builder import PostBuilder, get_true_comment_count
+from yt_community_post_archiver.post_builder import PostBuilder
+from yt_community_post_archiver.recycling import JS_HEAP_SIZE_JS, RecycleMonitor
+from yt_community_post_archiver.stages import StageFailedError
+from yt_community_post_archiver.storage import ArchiveStorage, open_storage
+from yt_community_post_archiver.streaming import StreamingStorage
+from yt_community_post_archiver.tabs import DEFAULT_POOL_SIZE, DetailTabPool
+from yt_community_post_archiver.tracing import WebDriverTracer
+
+# Scroll to the continuation at the end of the feed (which loads more posts), or to the bottom of the page if
+# there isn't one.
+SCROLL_TO_FEED_END_JS = """
+const continuations = document.querySelectorAll("ytd-continuation-item-renderer");
+if (continuations.length > 0) {
+    continuations[continuations.length - 1].scrollIntoView();
+} else {
+    window.scrollTo(0, document.documentElement.scrollHeight);
+}
+"""
+
+# Returns the number of posts loaded, and whether there's a continuation to load more.
+FEED_STATE_JS = """
+return [
+    document.querySelectorAll("#post").length,
+    document.querySelector("ytd-continuation-item-renderer") !== null,
+];
+"""
+
+# Describe every post in the feed from the given index onwards, in one go. Posts whose link hasn't loaded yet
+# have a null URL.
+DESCRIBE_FEED_POSTS_JS = """
+const posts = document.querySelectorAll("#post");
+const described = [];
+for (let i = arguments[0]; i < posts.length; i++) {
+    const link = Array.from(posts[i].querySelectorAll("a")).find(
+        (a) => a.href && a.href.includes("post/")
+    );
+    described.push({
+        url: link ? link.href : null,
+        relative_date: link ? link.innerText.trim() : null,
+        is_members: posts[i].querySelector(".ytd-sponsors-only-badge-renderer") !== null,
+    });
+}
+return described;
+"""
+
+# How long to wait for more posts to load after scrolling.
+FEED_LOAD_TIMEOUT_SECS = 5
+
+# How long the continuation needs to be gone before we decide we've hit the end of the feed.
+END_OF_FEED_GRACE_SECS = 0.5
+
+FEED_POLL_INTERVAL_SECS = 0.1
+
+# How many posts in a row have to be older than `--since` before we stop scrolling. The feed is newest first, but
+# a pinned post at the top can be older than the posts after it.
+MAX_OLDER_POSTS_IN_A_ROW = 3
+
+# How many posts before where the crawl had got to are looked at again after restarting the browser.
+RESUME_OVERLAP_POSTS = 20
+
+# How long to wait before checking for more jobs, when the only jobs left are leased by other workers.
+JOB_POLL_INTERVAL_SECS = 10
 
 
 class Archiver:
@@ -29,7 +111,18 @@ class Archiver:
     The main archiver "task"; this handles the overall job of archiving community posts from a URL.
     """
 
-    def __init__(self, settings: ArchiverSettings) -> None:
+    def __init__(
+        self,
+        settings: ArchiverSettings,
+        record_stream: TextIO | None = None,
+        driver: ChromeWebDriver | FirefoxWebDriver | None = None,
+        storage: ArchiveStorage | None = None,
+    ) -> None:
+        """
+        If `driver` is given, it's used instead of starting a new browser, and it's left running afterwards.
+        Likewise, if `storage` is given, it's used instead of the output directory and left open afterwards.
+        """
+
         width = 1920
 
         if settings.headless and settings.take_screenshots:
@@ -39,29 +132,29 @@ class Archiver:
             # If not headless, this might need to be tweaked.
             height = 1080
 
-        self.driver = init_driver(
-            settings.driver,
-            settings.headless,
-            settings.profile_dir,
-            settings.profile_name,
-            settings.binary_override,
-            width,
-            height,
-            settings.remote_debugging_port,
-        )
-
-        def signal_handler(_sig_num, _frame):
-            print("interrupt signal sent, halting...")
-            self.driver.quit()
-            sys.exit(1)
+        self.settings = settings
+        self.window_size = (width, height)
 
-        signal.signal(signal.SIGINT, signal_handler)
+        self.trace_path = settings.trace_webdriver
+        self.tracer = WebDriverTracer() if self.trace_path else None
 
-        self.driver.set_window_size(width, height)  # just in case it wasn't set
+        self.owns_driver = driver is None
+        if driver is None:
+            self.driver = self.__start_driver()
+        else:
+            self.driver = driver
+            if self.tracer is not None:
+                self.tracer.attach(driver)
 
-        # Make sure the output directory exists... if not, then try and make it.
         output_dir = settings.output_dir or "archive-output"
-        Path(os.path.abspath(output_dir)).mkdir(parents=True, exist_ok=True)
+
+        self.owns_storage = storage is None
+        if storage is None:
+            # Make sure the output directory exists... if not, then try and make it.
+            storage = open_storage(output_dir, settings.output_format, settings.layout)
+        self.storage = storage
+        if record_stream is not None:
+            self.storage = StreamingStorage(self.storage, record_stream)
 
         self.cookie_path = settings.cookie_path
         self.url = settings.url
@@ -70,10 +163,197 @@ class Archiver:
         self.max_posts = settings.max_posts
         self.members = settings.members
         self.skip_existing = settings.skip_existing
+        self.refresh_metadata = settings.refresh_metadata
         self.take_screenshots = settings.take_screenshots
         self.save_comments_types = settings.save_comments_types
         self.max_comments = settings.max_comments
+        self.save_replies = settings.save_replies
+        self.comment_scan_limit = settings.comment_scan_limit
+        self.blocklist = settings.blocklist
+        self.fast_comment_count = settings.fast_comment_count
+        self.governor = (
+            RateGovernor(settings.rate_limit, settings.host_rate_limits)
+            if settings.rate_limit > 0
+            else None
+        )
+        self.asset_cache = (
+            AssetCache(self.storage, self.governor) if settings.cache_emotes else None
+        )
+        self.dead_letters = DeadLetterQueue(
+            os.path.join(output_dir, DEAD_LETTER_FILE_NAME)
+            if self.owns_storage
+            else None
+        )
+        self.last_seen = LastSeenLog(
+            os.path.join(output_dir, LAST_SEEN_FILE_NAME) if self.owns_storage else None
+        )
+        self.pipeline = settings.pipeline
         self.original_handle = ""
+        self.tab_pool: DetailTabPool | None = None
+        self.tab_pool_size = DEFAULT_POOL_SIZE
+        self.keep_comments = False
+        self.stalled_scrolls = 0
+        # How many posts at the start of the feed have already been looked at by `find_posts`.
+        self.feed_scanned = 0
+        self.date_range = settings.date_range
+        self.older_posts_in_a_row = 0
+        self.passed_since = False
+        # Posts outside `--since`/`--until`, which are in `seen` but were skipped.
+        self.out_of_range: set[str] = set()
+
+        # We can't restart a browser we didn't start ourselves.
+        if not self.owns_driver:
+            self.recycle_monitor = None
+        elif (
+            settings.remote_debugging_port is not None
+            and settings.recycle_policy.is_enabled()
+        ):
+            print(
+                "warning: not restarting the browser periodically, as it was started separately (--remote-debugging-port)"
+            )
+            self.recycle_monitor = None
+        else:
+            self.recycle_monitor = (
+                RecycleMonitor(settings.recycle_policy)
+                if settings.recycle_policy.is_enabled()
+                else None
+            )
+
+    def quit_on_interrupt(self):
+        """
+        Quit the browser (if we started it) and exit on Ctrl+C. This replaces the process's SIGINT handler,
+        which can only be done from the main thread, so it's only for the command line.
+        """
+
+        if not self.owns_driver:
+            return
+
+        def signal_handler(_sig_num, _frame):
+            print("interrupt signal sent, halting...")
+            self.driver.quit()
+            sys.exit(1)
+
+        signal.signal(signal.SIGINT, signal_handler)
+
+    def __start_driver(self):
+        settings = self.settings
+        width, height = self.window_size
+
+        driver = init_driver(
+            settings.driver,
+            settings.headless,
+            settings.profile_dir,
+            settings.profile_name,
+            settings.binary_override,
+            width,
+            height,
+            settings.remote_debugging_port,
+            settings.blocklist,
+        )
+
+        if self.tracer is not None:
+            self.tracer.attach(driver)
+
+        driver.set_window_size(width, height)  # just in case it wasn't set
+
+        return driver
+
+    def __open_feed(self):
+        navigate(self.driver, self.url, self.governor)
+        self.feed_scanned = 0
+        self.older_posts_in_a_row = 0
+        self.original_handle = self.driver.current_window_handle
+
+        # Validate that the cookies path is valid if set, then set cookies.
+        self.set_cookies()
+        navigate(self.driver, self.url, self.governor)
+
+        time.sleep(LOAD_SLEEP_SECS)
+
+    def page_memory_mb(self) -> float | None:
+        """
+        How much memory the feed page's JS heap is using, if the browser exposes it.
+        """
+
+        try:
+            self.driver.switch_to.window(self.original_handle)
+            heap_size = self.driver.execute_script(JS_HEAP_SIZE_JS)
+        except Exception:
+            return None
+
+        return heap_size / (1024 * 1024) if heap_size is not None else None
+
+    def __reset_recycle_monitor(self):
+        """
+        Start tracking how a freshly opened browser does.
+        """
+
+        if self.recycle_monitor is None:
+            return
+
+        memory_mb = (
+            self.page_memory_mb()
+            if self.recycle_monitor.policy.max_memory_mb > 0
+            else None
+        )
+        self.recycle_monitor.reset(memory_mb)
+
+    def __skip_feed_to(self, position: int):
+        """
+        Load the feed up to `position` without looking at any of the posts on the way, to pick up where the
+        crawl left off after restarting the browser. The feed can only be loaded by scrolling, but this is a
+        lot quicker than going through it again. A few posts before `position` are looked at again, in case
+        posts were added to or removed from the feed since; they're in `self.seen`, so they're not processed
+        again.
+        """
+
+        target = max(0, position - RESUME_OVERLAP_POSTS)
+        while self.feed_state()[0] < target:
+            if not self.advance_feed():
+                break
+
+        self.feed_scanned = min(target, self.feed_state()[0])
+
+    def maybe_recycle_driver(self, post_duration_secs: float, resume_from: int) -> bool:
+        """
+        Record how the browser did on the last post, and restart it if needed. After restarting, the feed is
+        reopened and skipped ahead to `resume_from`, the position of the first post in the feed that might not
+        have been handled yet. Returns True if the browser was restarted, in which case any elements from the
+        old browser are no longer valid.
+        """
+
+        if self.recycle_monitor is None or get_post_id(self.url) is not None:
+            return False
+
+        memory_mb = (
+            self.page_memory_mb()
+            if self.recycle_monitor.policy.max_memory_mb > 0
+            else None
+        )
+        self.recycle_monitor.record_post(post_duration_secs, memory_mb)
+
+        reason = self.recycle_monitor.should_recycle()
+        if reason is None:
+            return False
+
+        print(f"Restarting the browser ({reason}).")
+
+        # The tabs go away with the browser.
+        self.tab_pool = None
+        try:
+            self.driver.quit()
+        except Exception as ex:
+            print(f"warning: couldn't quit the browser cleanly - {ex}")
+
+        older_posts_in_a_row = self.older_posts_in_a_row
+
+        self.driver = self.__start_driver()
+        self.__open_feed()
+        self.__skip_feed_to(resume_from)
+        self.older_posts_in_a_row = older_posts_in_a_row
+        self.__reset_recycle_monitor()
+
+        return True
 
     def set_cookies(self):
         if self.cookie_path is None:
@@ -104,66 +384,205 @@ class Archiver:
                 self.driver.add_cookie(cookie.__dict__)
 
     def find_posts(self) -> list[tuple[WebElement, str]]:
+        """
+        Find posts in the feed that haven't been seen yet. The feed only grows at the end, so only posts past
+        the ones already looked at are checked, rather than going through the whole feed after every scroll.
+        """
+
         posts = []
+        elements = self.driver.find_elements(By.ID, "post")
+        first_unresolved = None
+
+        for i in range(self.feed_scanned, len(elements)):
+            potential_post = elements[i]
 
-        for potential_post in self.driver.find_elements(By.ID, "post"):
             post_link = get_post_link(potential_post)
-            if post_link is None:
+            url = post_link.get_attribute("href") if post_link is not None else None
+
+            if url is None:
+                # It might not have finished loading, so look at it again next time.
+                if first_unresolved is None:
+                    first_unresolved = i
+                continue
+
+            if url in self.seen:
                 continue
 
-            url = post_link.get_attribute("href")
-            if url is None or url in self.seen:
+            if self.date_range.is_enabled() and not self.__in_date_range(
+                post_link.text
+            ):
+                self.__skip_out_of_range(url)
                 continue
 
             # print(f"potential post - {(potential_post, url)}")
             posts.append((potential_post, url))
 
+        self.feed_scanned = (
+            first_unresolved if first_unresolved is not None else len(elements)
+        )
+
         return posts
 
-    def handle_post(self, post: WebElement, url: str):
+    def __in_date_range(self, date_text: str | None) -> bool:
+        """
+        Check whether a post is within `--since`/`--until` from the date shown in its link, before doing
+        anything else with it. Once enough posts in a row are older than `--since`, the rest of the feed will
+        be too, so stop scrolling.
+        """
+
+        match self.date_range.position(date_text, datetime.now(tz=UTC)):
+            case DatePosition.OLDER:
+                self.older_posts_in_a_row += 1
+                if (
+                    self.older_posts_in_a_row >= MAX_OLDER_POSTS_IN_A_ROW
+                    and not self.passed_since
+                ):
+                    print("Reached posts older than --since.")
+                    self.passed_since = True
+                return False
+            case DatePosition.NEWER:
+                self.older_posts_in_a_row = 0
+                return False
+            case _:
+                self.older_posts_in_a_row = 0
+                return True
+
+    def __skip_out_of_range(self, url: str):
         """
-        Try to obtain and process a post. This will retry internally up to 5 times.
+        Mark a post outside `--since`/`--until` as seen, so it isn't checked (and counted towards stopping)
+        again if that part of the feed is looked at again. It doesn't count towards the maximum posts though.
         """
 
-        MAX_ATTEMPTS = 5
-        attempts = 0
+        self.seen.add(url)
+        self.out_of_range.add(url)
 
-        while True:
-            try:
-                scroll_to_element(post, self.driver)
-
-                self.seen.add(url)
-
-                post_builder = PostBuilder(
-                    driver=self.driver,
-                    take_screenshots=self.take_screenshots,
-                    post=post,
-                    url=url,
-                    output_dir=self.output_dir,
-                    members=self.members,
-                    save_comments_types=self.save_comments_types,
-                    max_comments=self.max_comments,
-                    original_handle=self.original_handle,
-                )
-                post_builder.process_post()
+    def __get_tab_pool(self) -> DetailTabPool:
+        if self.tab_pool is None:
+            self.tab_pool = DetailTabPool(
+                self.driver,
+                self.original_handle,
+                size=self.tab_pool_size,
+                blocklist=self.blocklist,
+                governor=self.governor,
+            )
 
-                break
-            except SystemExit:
-                raise SystemExit
-            except Exception as ex:
-                attempts += 1
+        return self.tab_pool
 
-                if attempts == MAX_ATTEMPTS:
-                    raise ex
+    def needs_detail_tab(self) -> bool:
+        """
+        Whether posts need to be opened in their own tab.
+        """
+
+        if get_post_id(self.url) is not None:
+            # The root URL is already the post.
+            return False
+
+        return (
+            not self.fast_comment_count
+            or self.take_screenshots
+            or bool(self.save_comments_types)
+        )
+
+    def prefetch_next_post(self, posts: list[tuple[WebElement, str]], current: int):
+        """
+        Start loading the next post that will be processed after `posts[current]` in a spare tab, so it
+        loads while the current post is processed.
+        """
+
+        if not self.needs_detail_tab():
+            return
+
+        if (
+            self.max_posts is not None
+            and self.num_counted_posts() + 1 >= self.max_posts
+        ):
+            return
+
+        for _, url in posts[current + 1 :]:
+            if url not in self.seen and not self.should_skip_post(url):
+                # Refreshing a post only needs its own tab for the exact comment count.
+                if not (self.fast_comment_count and self.should_refresh_post(url)):
+                    self.__get_tab_pool().prefetch(url)
+                return
+
+    def make_post_builder(self, post: WebElement, url: str) -> PostBuilder:
+        return PostBuilder(
+            driver=self.driver,
+            take_screenshots=self.take_screenshots,
+            post=post,
+            url=url,
+            storage=self.storage,
+            members=self.members,
+            save_comments_types=self.save_comments_types,
+            max_comments=self.max_comments,
+            tab_pool=self.__get_tab_pool(),
+            governor=self.governor,
+            fast_comment_count=self.fast_comment_count,
+            asset_cache=self.asset_cache,
+            save_replies=self.save_replies,
+            comment_scan_limit=self.comment_scan_limit,
+            keep_comments=self.keep_comments,
+            last_seen=self.last_seen,
+        )
+
+    def record_failed_post(self, url: str, ex: Exception):
+        print(f"err: failed to process `{url}` - {ex}")
+        if isinstance(ex, StageFailedError):
+            self.dead_letters.record(url, str(ex.cause), str(ex.stage), ex.attempts)
+        else:
+            self.dead_letters.record(url, str(ex))
+
+    def handle_post(self, post: WebElement, url: str) -> PostBuilder | None:
+        """
+        Try to obtain and process a post. Each stage of processing is retried separately; see `stages.py`.
+        If a stage fails too many times, the post is recorded as failed so it can be retried later, and
+        this returns None.
+        """
+
+        self.seen.add(url)
+
+        post_builder = self.make_post_builder(post, url)
 
-                time.sleep(1)
+        def process():
+            if self.should_refresh_post(url) and post_builder.refresh_metadata():
+                print(f"Refreshed metadata for `{url}`.")
+                return
+
+            post_builder.process_post()
+
+        try:
+            if self.tracer is not None:
+                with self.tracer.post(get_post_id(url)):
+                    process()
+            else:
+                process()
+        except StageFailedError as ex:
+            self.record_failed_post(url, ex)
+            return None
+
+        return post_builder
+
+    def num_counted_posts(self) -> int:
+        """
+        How many posts count towards the maximum; posts skipped for being outside `--since`/`--until` don't.
+        """
+
+        return len(self.seen) - len(self.out_of_range)
 
     def at_max_posts(self) -> bool:
-        return self.max_posts is not None and len(self.seen) >= self.max_posts
+        return self.max_posts is not None and self.num_counted_posts() >= self.max_posts
+
+    def feed_state(self) -> tuple[int, bool]:
+        """
+        Return the number of posts loaded in the feed, and whether there's more to load.
+        """
+
+        num_posts, has_continuation = self.driver.execute_script(FEED_STATE_JS)
+        return (int(num_posts), bool(has_continuation))
 
     def could_scroll(self) -> bool:
         """
-        Try and scroll. If we should no longer scroll, this will return False.
+        Try and scroll to the end of the feed to load more posts. If we should no longer scroll, this will return False.
 
         This will internally try up to 3 times.
         """
@@ -172,13 +591,15 @@ class Archiver:
         scroll_attempts = 0
         while True:
             try:
-                # Check the current URL isn't a post. If it is, try closing the current tab;
-                # if only the original tab was left, then the root URL was a post, so halt.
-                if get_true_comment_count(self.driver) is not None:
-                    if close_current_tab(self.driver, self.original_handle) == 1:
-                        return False
+                # If the root URL was a post, then there's nothing to scroll to, so halt.
+                if get_post_id(self.url) is not None:
+                    return False
+
+                # Scrolling loads more posts, so pace it like any other request.
+                if self.governor is not None:
+                    self.governor.acquire(self.url)
 
-                self.driver.execute_script("window.scrollBy(0, 500);")
+                self.driver.execute_script(SCROLL_TO_FEED_END_JS)
                 return True
             except SystemExit:
                 raise SystemExit
@@ -187,64 +608,353 @@ class Archiver:
                 if scroll_attempts == MAX_ATTEMPTS:
                     raise ex
 
+    def wait_for_more_posts(self, num_posts: int) -> bool | None:
+        """
+        Wait for more posts to load after scrolling. Returns True if more posts loaded, False if the end of
+        the feed was reached, or None if nothing loaded in time but there should be more.
+        """
+
+        deadline = time.monotonic() + FEED_LOAD_TIMEOUT_SECS
+        no_continuation_since = None
+
+        while True:
+            new_num_posts, has_continuation = self.feed_state()
+            now = time.monotonic()
+
+            if new_num_posts > num_posts:
+                return True
+
+            # The continuation is what loads more posts, so if it's gone (and stays gone), there's nothing left.
+            if has_continuation:
+                no_continuation_since = None
+            elif no_continuation_since is None:
+                no_continuation_since = now
+            elif now - no_continuation_since >= END_OF_FEED_GRACE_SECS:
+                return False
+
+            if now >= deadline:
+                return None
+
+            time.sleep(FEED_POLL_INTERVAL_SECS)
+
+    def advance_feed(self) -> bool:
+        """
+        Scroll the feed and wait for more posts to load. Returns False if there's nothing more to load.
+        """
+
+        # If the feed still claims to have more but nothing loads this many times in a row, give up.
+        MAX_STALLED_SCROLLS = 5
+
+        if self.passed_since:
+            return False
+
+        num_posts, _ = self.feed_state()
+
+        if not self.could_scroll():
+            return False
+
+        match self.wait_for_more_posts(num_posts):
+            case True:
+                self.stalled_scrolls = 0
+            case False:
+                print("Reached the end of the feed.")
+                return False
+            case None:
+                self.stalled_scrolls += 1
+                if self.stalled_scrolls >= MAX_STALLED_SCROLLS:
+                    print("No more posts are loading. Halting.")
+                    return False
+
+        return True
+
+    def iter_handled_posts(self) -> Iterator[PostBuilder]:
+        """
+        Go through the feed, processing each post and yielding it once it's been processed. Posts that were
+        skipped or failed aren't yielded.
+        """
+
+        self.__open_feed()
+        self.stalled_scrolls = 0
+        self.__reset_recycle_monitor()
+
+        while True:
+            batch_start = self.feed_scanned
+            posts = self.find_posts()
+            for i, (post, url) in enumerate(posts):
+                if self.at_max_posts():
+                    print(f"Hit maximum posts ({self.max_posts}). Halting.")
+                    return
+
+                self.driver.switch_to.window(self.original_handle)
+
+                if self.should_skip_post(url):
+                    # Still mark it as seen so it counts towards the maximum, and isn't checked again.
+                    self.seen.add(url)
+                    print(f"Skipping `{url}` as it already exists.")
+                    continue
+
+                self.prefetch_next_post(posts, i)
+
+                start = time.monotonic()
+                post_builder = self.handle_post(post, url)
+                recycled = self.maybe_recycle_driver(
+                    time.monotonic() - start, batch_start
+                )
+
+                if post_builder is not None:
+                    yield post_builder
+
+                if recycled:
+                    break
+            else:
+                # Only scroll if we got through all the posts; otherwise the browser was restarted, and the
+                # rest of the posts are found again in the new one.
+                if not self.advance_feed():
+                    return
+
     def scrape(self):
-        # Could use a scrollbar height check instead but idk why but that was flaky sometimes.
-        MAX_SAME_SEEN = 30
+        try:
+            if self.pipeline:
+                self.__open_feed()
+                self.stalled_scrolls = 0
+                asyncio.run(CrawlPipeline(self).run())
+            else:
+                for _ in self.iter_handled_posts():
+                    pass
+        except SystemExit:
+            raise SystemExit
+        except Exception:
+            print("Encountered a fatal error:")
+            traceback.print_exc()
+            if self.owns_driver:
+                self.driver.quit()
+            sys.exit(1)
+        finally:
+            if self.dead_letters.num_recorded > 0:
+                print(
+                    f"{self.dead_letters.num_recorded} post(s) failed and were recorded in `{self.dead_letters.path}`; "
+                    "run again with --retry-failed to retry them."
+                )
+
+    def process_post_url(self, url: str) -> PostBuilder | None:
+        """
+        Load a post directly by its URL and process it, rather than going through the feed. Returns None if the
+        post couldn't be archived (in which case it's recorded as failed).
+        """
 
+        # The post is the root page while it's being processed.
+        self.url = url
         try:
-            self.driver.get(self.url)
-            self.original_handle = self.driver.current_window_handle
+            navigate(self.driver, url, self.governor)
+        except Exception as ex:
+            # E.g. being throttled or timing out; that's only this post's problem.
+            print(f"err: failed to load `{url}` - {ex}")
+            self.dead_letters.record(url, str(ex), "navigate", 1)
+            return None
+
+        self.original_handle = self.driver.current_window_handle
+        time.sleep(LOAD_SLEEP_SECS)
+
+        post = find_post_element(self.driver)
+        if post is None:
+            print(f"err: couldn't find the post at `{url}`")
+            self.dead_letters.record(url, "post not found", None, 1)
+            return None
+
+        return self.handle_post(post, url)
+
+    def retry_failed(self):
+        """
+        Retry posts that failed in previous runs, loading each one directly by its URL rather than going through
+        the feed. Posts that succeed are removed from the failed posts file.
+        """
+
+        failed = self.dead_letters.load()
+        if not failed:
+            print(f"No failed posts found in `{self.dead_letters.path}`.")
+            return
 
-            # Validate that the cookies path is valid if set, then set cookies.
+        print(f"Retrying {len(failed)} failed post(s)...")
+        num_succeeded = 0
+
+        try:
             self.set_cookies()
-            self.driver.get(self.url)
 
-            time.sleep(LOAD_SLEEP_SECS)
-            num_seen = len(self.seen)
-            same_seen = 0
+            for entry in failed:
+                if self.process_post_url(entry.url) is not None:
+                    self.dead_letters.resolve(entry.url)
+                    num_succeeded += 1
+        except SystemExit:
+            raise SystemExit
+        except Exception:
+            print("Encountered a fatal error:")
+            traceback.print_exc()
+            if self.owns_driver:
+                self.driver.quit()
+            sys.exit(1)
+
+        print(f"{num_succeeded} of {len(failed)} failed post(s) were archived.")
+
+    def enumerate_posts(self, store: JobStore):
+        """
+        Go through the feed and add every post to the job store for workers to archive, without archiving
+        anything ourselves.
+        """
+
+        try:
+            self.__open_feed()
+            self.stalled_scrolls = 0
 
             while True:
-                posts = self.find_posts()
-                for post, url in posts:
+                urls = []
+                for _, url in self.find_posts():
                     if self.at_max_posts():
-                        print(f"Hit maximum posts ({self.max_posts}). Halting.")
-                        return
+                        break
 
-                    self.driver.switch_to.window(self.original_handle)
+                    self.seen.add(url)
+                    if not self.should_skip_post(url):
+                        urls.append(url)
 
-                    if not self.should_skip_post(url) and url not in self.seen:
-                        self.handle_post(post, url)
-                    else:
-                        print(f"Skipping `{url}` as it already exists.")
+                added = store.enqueue(urls)
+                print(f"Found {len(urls)} post(s), {added} of which are new.")
 
-                if not self.could_scroll():
+                if self.at_max_posts():
+                    print(f"Hit maximum posts ({self.max_posts}). Halting.")
                     break
 
-                time.sleep(LOAD_SLEEP_SECS)
-                new_seen = len(self.seen)
-                if num_seen == new_seen:
-                    same_seen += 1
-                else:
-                    same_seen = 0
+                if not self.advance_feed():
+                    break
+        except SystemExit:
+            raise SystemExit
+        except Exception:
+            print("Encountered a fatal error:")
+            traceback.print_exc()
+            if self.owns_driver:
+                self.driver.quit()
+            sys.exit(1)
+
+        print(f"Job counts: {store.counts()}")
+
+    def list_posts(self, stream: TextIO):
+        """
+        Go through the feed and write a JSON line for each post, without opening or archiving anything. Each
+        batch of posts is described with one script rather than looking at each post separately, so this goes
+        as fast as the feed loads.
+        """
+
+        num_listed = 0
+
+        try:
+            self.__open_feed()
+            self.stalled_scrolls = 0
+
+            while True:
+                described = self.driver.execute_script(
+                    DESCRIBE_FEED_POSTS_JS, self.feed_scanned
+                )
+
+                for post in described:
+                    url = post["url"]
+                    if url is None:
+                        # Look at it (and everything after it) again once it's loaded.
+                        break
 
-                if same_seen >= MAX_SAME_SEEN:
+                    self.feed_scanned += 1
+
+                    if url in self.seen:
+                        continue
+
+                    if self.date_range.is_enabled() and not self.__in_date_range(
+                        post["relative_date"]
+                    ):
+                        self.__skip_out_of_range(url)
+                        continue
+
+                    if self.at_max_posts():
+                        break
+
+                    self.seen.add(url)
+                    record = {
+                        "post_id": get_post_id(url),
+                        "url": url,
+                        "relative_date": post["relative_date"],
+                        "is_members": post["is_members"],
+                    }
+                    stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    num_listed += 1
+
+                stream.flush()
+
+                if self.at_max_posts():
+                    print(f"Hit maximum posts ({self.max_posts}). Halting.")
                     break
 
-                num_seen = new_seen
+                if not self.advance_feed():
+                    break
         except SystemExit:
             raise SystemExit
         except Exception:
             print("Encountered a fatal error:")
             traceback.print_exc()
-            self.driver.quit()
+            if self.owns_driver:
+                self.driver.quit()
+            sys.exit(1)
+
+        print(f"Listed {num_listed} post(s).")
+
+    def work_from(self, store: JobStore, lease_secs: float = DEFAULT_LEASE_SECS):
+        """
+        Keep leasing posts from the job store and archiving them, until there's nothing left. If the only jobs
+        left are leased by other workers, wait in case their leases run out.
+        """
+
+        worker = worker_id()
+        num_archived = 0
+
+        try:
+            self.set_cookies()
+
+            while True:
+                job = store.lease(worker, lease_secs)
+                if job is None:
+                    if store.counts()["leased"] == 0:
+                        break
+
+                    time.sleep(JOB_POLL_INTERVAL_SECS)
+                    continue
+
+                print(f"Working on `{job.url}` (attempt {job.attempts})...")
+
+                with LeaseHeartbeat(store, job.url, worker, lease_secs):
+                    succeeded = self.process_post_url(job.url) is not None
+
+                if succeeded:
+                    store.complete(job.url, worker)
+                    num_archived += 1
+                else:
+                    store.fail(job.url, worker, "failed to process post")
+
+                if self.at_max_posts():
+                    print(f"Hit maximum posts ({self.max_posts}). Halting.")
+                    break
+        except SystemExit:
+            raise SystemExit
+        except Exception:
+            print("Encountered a fatal error:")
+            traceback.print_exc()
+            if self.owns_driver:
+                self.driver.quit()
             sys.exit(1)
 
+        print(f"Archived {num_archived} post(s). Job counts: {store.counts()}")
+
     def should_skip_post(self, url: str) -> bool:
         """
         If we have skip_existing set, then we want to skip posts if the path already exists.
         """
 
-        if not self.skip_existing:
+        # When refreshing, existing posts are refreshed rather than skipped.
+        if not self.skip_existing or self.refresh_metadata:
             return False
 
         post_id = get_post_id(url)
@@ -253,34 +963,39 @@ class Archiver:
             print(f"err: could not parse post ID from `{url}`")
             return True
 
-        post_output_dir = os.path.join(self.output_dir, post_id)
+        return self.storage.has_post(post_id)
 
-        return Path(post_output_dir).exists()
+    def should_refresh_post(self, url: str) -> bool:
+        """
+        If we have refresh_metadata set, then existing posts only have their metadata refreshed.
+        """
+
+        if not self.refresh_metadata:
+            return False
+
+        post_id = get_post_id(url)
+        return post_id is not None and self.storage.has_post(post_id)
 
     def __enter__(self):
         return self
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.driver.quit()
-
+    def write_trace(self):
+        if self.tracer is None or self.trace_path is None:
+            return
 
-def main():
-    settings, rerun = get_settings()
+        self.tracer.print_summary()
+        self.tracer.write_chrome_trace(self.trace_path)
+        print(f"Saved WebDriver trace to `{self.trace_path}`.")
 
-    try:
-        if rerun == 1:
-            print(f"Running the archiver on `{settings.url}`...")
-        else:
-            print(f"Running the archiver {rerun} times on `{settings.url}`...")
-        for i in range(rerun):
-            with Archiver(settings) as archiver:
-                if rerun > 1:
-                    print(f"===== Run {i + 1} ======")
-                archiver.scrape()
-        print("Done!")
-    except SystemExit as sys_ex:
-        sys.exit(sys_ex.code)
-    except Exception:
-        print("Encountered a fatal error:")
-        traceback.print_exc()
-        sys.exit(1)
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.write_trace()
+        if self.asset_cache is not None:
+            self.asset_cache.flush()
+        if self.owns_driver:
+            self.driver.quit()
+        elif self.tab_pool is not None:
+            # Leave someone else's browser with only the tabs it had.
+            self.tab_pool.close()
+            self.tab_pool = None
+        if self.owns_storage:
+            self.storage.close()
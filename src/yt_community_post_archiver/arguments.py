@@ -2,9 +2,29 @@ import argparse
 import shlex
 from dataclasses import dataclass
 from enum import Enum, unique
+from typing import NoReturn
 
 from yt_community_post_archiver import __version__
-from yt_community_post_archiver.helpers import Driver
+from yt_community_post_archiver.asset_cache import ASSET_CACHE_ID
+from yt_community_post_archiver.blocking import (
+    DEFAULT_BLOCKED_URL_PATTERNS,
+    ResourceBlocklist,
+    ResourceType,
+)
+from yt_community_post_archiver.dates import DateRange, parse_date_bound
+from yt_community_post_archiver.dead_letter import DEAD_LETTER_FILE_NAME
+from yt_community_post_archiver.jobs import DEFAULT_LEASE_SECS
+from yt_community_post_archiver.recycling import RecyclePolicy
+
+
+@unique
+class Driver(Enum):
+    """
+    The backing browser to use for scraping.
+    """
+
+    FIREFOX = 1
+    CHROME = 2
 
 
 @unique
@@ -56,6 +76,46 @@ class MembersPostType(Enum):
                 raise Exception("Unsupported members post type!")
 
 
+@unique
+class OutputFormat(Enum):
+    """
+    How to store the archive.
+    """
+
+    DIRECTORY = 1
+    SQLITE = 2
+
+    @staticmethod
+    def from_str(s: str):
+        match s:
+            case "directory":
+                return OutputFormat.DIRECTORY
+            case "sqlite":
+                return OutputFormat.SQLITE
+            case _:
+                raise Exception("Unsupported output format!")
+
+
+@unique
+class DirectoryLayout(Enum):
+    """
+    How post directories are laid out in the output directory.
+    """
+
+    FLAT = 1
+    SHARDED = 2
+
+    @staticmethod
+    def from_str(s: str):
+        match s:
+            case "flat":
+                return DirectoryLayout.FLAT
+            case "sharded":
+                return DirectoryLayout.SHARDED
+            case _:
+                raise Exception("Unsupported directory layout!")
+
+
 @dataclass
 class ArchiverSettings:
     url: str
@@ -70,9 +130,50 @@ class ArchiverSettings:
     driver: Driver
     save_comments_types: set[CommentType]
     max_comments: int | None
+    save_replies: bool
+    comment_scan_limit: int
+    cache_emotes: bool
     take_screenshots: bool
     skip_existing: bool
+    refresh_metadata: bool
+    retry_failed: bool
+    enumerate_to: str | None
+    list_only: str | None
+    work_from: str | None
+    lease_secs: float
+    stream_ndjson: str | None
     remote_debugging_port: int | None
+    blocklist: ResourceBlocklist | None
+    rate_limit: float
+    host_rate_limits: dict[str, float]
+    output_format: OutputFormat
+    layout: DirectoryLayout
+    fast_comment_count: bool
+    pipeline: bool
+    trace_webdriver: str | None
+    recycle_policy: RecyclePolicy
+    date_range: DateRange
+
+
+def _parse_host_rate_limit(s: str) -> tuple[str, float]:
+    host, sep, rate = s.partition("=")
+    try:
+        if not sep or not host:
+            raise ValueError
+        return (host, float(rate))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"`{s}` is not in the format HOST=REQUESTS_PER_SEC"
+        )
+
+
+def _parse_date_bound(s: str):
+    try:
+        return parse_date_bound(s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"`{s}` is not a date (e.g. 2024-05-01) or a duration (e.g. 30d)"
+        )
 
 
 def _create_parser() -> argparse.ArgumentParser:
@@ -84,6 +185,22 @@ def _create_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "-o", "--output-dir", type=str, required=False, help="The directory to save to."
     )
+    parser.add_argument(
+        "--output-format",
+        type=str,
+        required=False,
+        default="directory",
+        help="How to store the archive. `directory` stores each post in its own directory, while `sqlite` stores everything in a single `archive.sqlite3` file in the output directory.",
+        choices=["directory", "sqlite"],
+    )
+    parser.add_argument(
+        "--layout",
+        type=str,
+        required=False,
+        default="flat",
+        help="How to lay out post directories when using the `directory` output format. `flat` puts every post directly in the output directory, while `sharded` groups them into subdirectories by a hash of the post ID, which is faster for very large archives. Use the `migrate` subcommand to convert an existing archive.",
+        choices=["flat", "sharded"],
+    )
     parser.add_argument(
         "-p",
         "--profile-dir",
@@ -122,7 +239,21 @@ def _create_parser() -> argparse.ArgumentParser:
         type=int,
         required=False,
         default=None,
-        help="Set a limit on how many posts to check. Skipped posts will count towards this.",
+        help="Set a limit on how many posts to check. Skipped posts will count towards this, but posts outside of --since/--until won't.",
+    )
+    parser.add_argument(
+        "--since",
+        type=_parse_date_bound,
+        required=False,
+        default=None,
+        help="Only archive posts made after this; either a date (e.g. 2024-05-01, in UTC) or a duration before now (e.g. 30d, 12h, 2w, 6m, 1y). Scrolling stops once the feed gets to older posts.",
+    )
+    parser.add_argument(
+        "--until",
+        type=_parse_date_bound,
+        required=False,
+        default=None,
+        help="Only archive posts made before this, in the same format as --since.",
     )
     parser.add_argument(
         "-d",
@@ -171,11 +302,43 @@ def _create_parser() -> argparse.ArgumentParser:
         default=None,
         help="Set a limit on how many comments to grab per post.",
     )
+    parser.add_argument(
+        "--comment-scan-limit",
+        type=int,
+        required=False,
+        default=0,
+        help="When only saving some types of comments (i.e. not `all`), stop looking for them after this many comments. By default (0), every comment is looked through.",
+    )
+    parser.add_argument(
+        "--save-replies",
+        action="store_true",
+        help="Also save replies to comments, with each reply linked to the comment it replies to. Replies are filtered by --save-comments and count towards --max-comments.",
+    )
+    parser.add_argument(
+        "--cache-emotes",
+        action="store_true",
+        help=f"Save the custom emotes and member badges used in saved comments. Each image is only downloaded once and kept in `{ASSET_CACHE_ID}` in the output directory (or the SQLite database), with comments referring to them by ID.",
+    )
+    parser.add_argument(
+        "--fast-comment-count",
+        action="store_true",
+        help="Don't open each post in its own tab just to get the exact number of comments. The count shown on the posts tab is used if it's exact (i.e. not abbreviated like `2.5K`); otherwise the exact count is only saved if the post has to be opened anyway for screenshots or comments.",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Overlap the different stages of archiving posts (finding posts, extracting them, saving them, downloading images, and screenshots/comments) instead of finishing each post before starting the next one. The browser isn't restarted periodically in this mode.",
+    )
     parser.add_argument(
         "--skip-existing",
         action="store_true",
         help="Skip any posts if the save location already contains data.",
     )
+    parser.add_argument(
+        "--refresh-metadata",
+        action="store_true",
+        help="For posts that have already been archived, only update the likes, comment counts, and poll results (keeping a history of previous values) rather than archiving them again. Images, screenshots, and comments are left alone. New posts are archived as usual.",
+    )
     parser.add_argument(
         "--remote-debugging-port",
         type=int,
@@ -183,6 +346,81 @@ def _create_parser() -> argparse.ArgumentParser:
         default=None,
         help="Connect to an running Chrome/Chromium instance launched with --remote-debugging-port=PORT.",
     )
+    parser.add_argument(
+        "--no-block-resources",
+        action="store_true",
+        help="Don't block the browser from loading resources that aren't needed for archiving (ads, tracking, fonts, etc.).",
+    )
+    parser.add_argument(
+        "--block-url-patterns",
+        type=str,
+        required=False,
+        nargs="+",
+        default=[],
+        help="Additional URL patterns (using `*` as a wildcard) to block the browser from loading, on top of the defaults.",
+    )
+    parser.add_argument(
+        "--block-resource-types",
+        type=str,
+        required=False,
+        nargs="+",
+        default=["font", "media"],
+        help="Types of resources to block the browser from loading. Images are not blocked if taking screenshots.",
+        choices=["font", "media", "image"],
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        required=False,
+        default=0,
+        help="The maximum number of requests per second to make to each host (page loads, scrolls, and image downloads), e.g. 2. This is automatically lowered if we get throttled. Off (0) by default.",
+    )
+    parser.add_argument(
+        "--host-rate-limits",
+        type=_parse_host_rate_limit,
+        required=False,
+        nargs="+",
+        default=[],
+        help="Override the rate limit for specific hosts, in the format HOST=REQUESTS_PER_SEC (e.g. yt3.ggpht.com=5). Only used with --rate-limit.",
+    )
+    parser.add_argument(
+        "--recycle-after-posts",
+        type=int,
+        required=False,
+        default=0,
+        help="Restart the browser after it has handled this many posts, to keep its memory usage in check. Off (0) by default.",
+    )
+    parser.add_argument(
+        "--recycle-memory-mb",
+        type=float,
+        required=False,
+        default=0,
+        help="Restart the browser once the page's memory usage (JS heap) has grown by this many MB since it was started. Only supported with Chrome. Off (0) by default.",
+    )
+    parser.add_argument(
+        "--recycle-latency-factor",
+        type=float,
+        required=False,
+        default=0,
+        help="Restart the browser once posts take this many times longer to process than they did when the browser was started. Off (0) by default.",
+    )
+    parser.add_argument(
+        "--stream-ndjson",
+        type=str,
+        required=False,
+        default=None,
+        metavar="TARGET",
+        help="Also write every post, comment, and image as a JSON line as soon as it's saved. TARGET is `-` for stdout (other output goes to stderr instead), `tcp://HOST:PORT` or `unix:///path` for a socket, or a path to a file or named pipe.",
+    )
+    parser.add_argument(
+        "--trace-webdriver",
+        type=str,
+        required=False,
+        nargs="?",
+        const="webdriver-trace.json",
+        default=None,
+        help="Count and time every WebDriver command, print a summary at the end, and save a trace (in the Chrome trace event format) to the given path.",
+    )
     parser.add_argument(
         "-v",
         "--version",
@@ -191,13 +429,88 @@ def _create_parser() -> argparse.ArgumentParser:
         version=f"%(prog)s {__version__}",
     )
 
-    parser.add_argument("url", type=str, help="The URL to try and grab posts from.")
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help=f"Only retry the posts that failed in previous runs (recorded in `{DEAD_LETTER_FILE_NAME}` in the output directory), loading each one directly by its URL. The URL argument isn't needed in this case.",
+    )
+    parser.add_argument(
+        "--list-only",
+        type=str,
+        required=False,
+        nargs="?",
+        const="-",
+        default=None,
+        metavar="PATH",
+        help="Don't archive anything; instead, quickly go through the feed and write each post's ID, URL, date and whether it's members-only as JSON lines. Writes to stdout if no path is given (with everything else printed to stderr instead).",
+    )
+    parser.add_argument(
+        "--enumerate-to",
+        type=str,
+        required=False,
+        default=None,
+        metavar="JOB_STORE",
+        help="Don't archive anything; instead, add every post found at the URL to a shared job store for workers started with --work-from. The job store is a path to a SQLite database (or `sqlite:///path`) that every worker can access.",
+    )
+    parser.add_argument(
+        "--work-from",
+        type=str,
+        required=False,
+        default=None,
+        metavar="JOB_STORE",
+        help="Archive posts from a shared job store filled by --enumerate-to, until there are none left. Several workers can share the same job store (and output directory). The URL argument isn't needed in this case.",
+    )
+    parser.add_argument(
+        "--lease-secs",
+        type=float,
+        required=False,
+        default=DEFAULT_LEASE_SECS,
+        help="With --work-from, how long a post is held by a worker before it's given to another one if the worker stops responding.",
+    )
+    parser.add_argument(
+        "url",
+        type=str,
+        nargs="?",
+        help="The URL to try and grab posts from. Not needed with --retry-failed or --work-from.",
+    )
 
     return parser
 
 
-def get_settings() -> tuple[ArchiverSettings, int]:
-    args = _create_parser().parse_args()
+def get_settings(
+    argv: list[str] | None = None, exit_on_error: bool = True
+) -> tuple[ArchiverSettings, int]:
+    """
+    Parse settings from the command line arguments (or `argv`, if given). If `exit_on_error` is false, invalid
+    arguments raise a `ValueError` rather than printing the usage and exiting.
+    """
+
+    parser = _create_parser()
+    if not exit_on_error:
+
+        def raise_error(message: str) -> NoReturn:
+            raise ValueError(message)
+
+        parser.error = raise_error  # type: ignore
+
+    args = parser.parse_args(argv)
+
+    modes = [
+        args.retry_failed,
+        args.enumerate_to is not None,
+        args.work_from is not None,
+        args.list_only is not None,
+    ]
+    if sum(modes) > 1:
+        parser.error(
+            "only one of --retry-failed, --enumerate-to, --work-from, and --list-only can be used at a time"
+        )
+
+    if args.url is None and not (args.retry_failed or args.work_from is not None):
+        parser.error("the following arguments are required: url")
+
+    if args.since is not None and args.until is not None and args.since > args.until:
+        parser.error("--since must be before --until")
 
     rerun = int(args.rerun) if args.rerun and int(args.rerun) > 0 else 1
 
@@ -208,9 +521,30 @@ def get_settings() -> tuple[ArchiverSettings, int]:
     else:
         raise Exception("Unsupported driver type!")
 
+    if args.host_rate_limits and args.rate_limit <= 0:
+        print("warning: --host-rate-limits does nothing without --rate-limit")
+
+    if args.save_replies and not args.save_comments:
+        print("warning: --save-replies does nothing without --save-comments")
+
+    if args.no_block_resources:
+        blocklist = None
+    else:
+        resource_types = set(
+            [ResourceType.from_str(ty) for ty in args.block_resource_types]
+        )
+        if args.take_screenshots and ResourceType.IMAGE in resource_types:
+            print("warning: not blocking images as screenshots are enabled")
+            resource_types.discard(ResourceType.IMAGE)
+
+        blocklist = ResourceBlocklist(
+            url_patterns=DEFAULT_BLOCKED_URL_PATTERNS + args.block_url_patterns,
+            resource_types=resource_types,
+        )
+
     return (
         ArchiverSettings(
-            url=shlex.split(args.url)[0],
+            url=shlex.split(args.url)[0] if args.url else "",
             output_dir=args.output_dir,
             cookie_path=args.cookie_path,
             max_posts=args.max_posts,
@@ -226,9 +560,33 @@ def get_settings() -> tuple[ArchiverSettings, int]:
                 else set()
             ),
             max_comments=args.max_comments,
+            save_replies=args.save_replies,
+            comment_scan_limit=args.comment_scan_limit,
+            cache_emotes=args.cache_emotes,
             take_screenshots=args.take_screenshots,
             skip_existing=args.skip_existing,
+            refresh_metadata=args.refresh_metadata,
+            retry_failed=args.retry_failed,
+            enumerate_to=args.enumerate_to,
+            list_only=args.list_only,
+            work_from=args.work_from,
+            lease_secs=args.lease_secs,
+            stream_ndjson=args.stream_ndjson,
             remote_debugging_port=args.remote_debugging_port,
+            blocklist=blocklist,
+            rate_limit=args.rate_limit,
+            host_rate_limits=dict(args.host_rate_limits),
+            output_format=OutputFormat.from_str(args.output_format),
+            layout=DirectoryLayout.from_str(args.layout),
+            fast_comment_count=args.fast_comment_count,
+            pipeline=args.pipeline,
+            trace_webdriver=args.trace_webdriver,
+            recycle_policy=RecyclePolicy(
+                max_posts=args.recycle_after_posts,
+                max_memory_mb=args.recycle_memory_mb,
+                latency_factor=args.recycle_latency_factor,
+            ),
+            date_range=DateRange(since=args.since, until=args.until),
         ),
         rerun,
     )
@@ -0,0 +1,164 @@
+# A channel-level cache of images that show up across many comments (custom emotes and member badges), so
+# each one is only downloaded and stored once.
+
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlparse
+
+from yt_community_post_archiver.governor import RateGovernor, fetch
+
+if TYPE_CHECKING:
+    from yt_community_post_archiver.storage import ArchiveStorage
+
+# The cache is saved as the assets of a post with this (reserved) ID, so it goes wherever the rest of the archive
+# does. With directory storage, that's an `asset-cache` directory in the output directory.
+ASSET_CACHE_ID = "asset-cache"
+INDEX_FILE_NAME = "index.json"
+
+# How many images to download at once when flushing the cache.
+DOWNLOAD_WORKERS = 4
+
+
+def _normalize_url(url: str) -> str:
+    """
+    Emotes and badges are served at different sizes depending on where they show up (e.g. `...=w24-h24-c-k-nd`),
+    so request the original size to make the same image always have the same URL.
+    """
+
+    host = urlparse(url).hostname or ""
+    if (
+        host.endswith("ggpht.com") or host.endswith("googleusercontent.com")
+    ) and "=" in url:
+        return url.rsplit("=", 1)[0] + "=s0"
+
+    return url
+
+
+def asset_id_for(url: str) -> str:
+    """
+    The ID comments use to refer to an image, based on its (normalized) URL.
+    """
+
+    return hashlib.sha256(_normalize_url(url).encode("utf-8")).hexdigest()[:16]
+
+
+class AssetCache:
+    """
+    Images are referenced by an ID derived from their URL as soon as they're seen, but only downloaded when the
+    cache is flushed, in a batch. Images with identical contents are stored as one file. Files and an index of
+    what's been downloaded are saved to the storage backend (see `ASSET_CACHE_ID`), so the cache carries over
+    between runs.
+    """
+
+    def __init__(
+        self,
+        storage: "ArchiveStorage",
+        governor: RateGovernor | None = None,
+        fetcher: Callable[[str, RateGovernor | None], bytes] | None = None,
+    ) -> None:
+        self.storage = storage
+        self.governor = governor
+        self.fetcher = fetcher if fetcher is not None else fetch
+
+        # Asset ID -> info about the asset (the URL, what it is, and which file has its contents).
+        self.assets: dict[str, dict] = {}
+        # Content hash -> file name.
+        self.files: dict[str, str] = {}
+        # Asset ID -> (URL, kind, name) for assets that haven't been downloaded yet.
+        self.pending: dict[str, tuple[str, str, str | None]] = {}
+
+        self.__load_index()
+
+    def __load_index(self):
+        try:
+            data = self.storage.read_asset(ASSET_CACHE_ID, INDEX_FILE_NAME)
+            if data is None:
+                return
+
+            index = json.loads(data)
+            self.assets = index.get("assets", {})
+            self.files = index.get("files", {})
+        except Exception as ex:
+            print(f"warning: couldn't read the asset cache index, starting over - {ex}")
+
+    def __save_index(self):
+        index = json.dumps(
+            {"assets": self.assets, "files": self.files}, ensure_ascii=False, indent=4
+        )
+        self.storage.write_asset(ASSET_CACHE_ID, INDEX_FILE_NAME, index.encode("utf-8"))
+
+    def register(self, url: str, kind: str, name: str | None = None) -> str:
+        """
+        Return the ID for an image, queueing it to be downloaded if it hasn't been already.
+        """
+
+        asset_id = asset_id_for(url)
+        if asset_id not in self.assets and asset_id not in self.pending:
+            self.pending[asset_id] = (_normalize_url(url), kind, name)
+
+        return asset_id
+
+    def read(self, asset_id: str) -> bytes | None:
+        """
+        The image for an ID, if it's been downloaded.
+        """
+
+        asset = self.assets.get(asset_id)
+        if asset is None:
+            return None
+
+        return self.storage.read_asset(ASSET_CACHE_ID, asset["file"])
+
+    def __download(self, url: str) -> bytes | None:
+        try:
+            return self.fetcher(url, self.governor)
+        except Exception as ex:
+            print(f"err: couldn't download `{url}` for the asset cache - {ex}")
+            return None
+
+    def flush(self):
+        """
+        Download everything that's been registered since the last flush, and save the index.
+        """
+
+        if not self.pending:
+            return
+
+        import filetype
+
+        pending = list(self.pending.items())
+        self.pending = {}
+
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            results = list(
+                executor.map(lambda item: self.__download(item[1][0]), pending)
+            )
+
+        for (asset_id, (url, kind, name)), data in zip(pending, results):
+            if data is None:
+                # Leave it to be retried on the next flush.
+                self.pending[asset_id] = (url, kind, name)
+                continue
+
+            content_hash = hashlib.sha256(data).hexdigest()
+            file_name = self.files.get(content_hash)
+
+            if file_name is None:
+                guessed = filetype.guess(data)
+                extension = guessed.extension if guessed else "png"
+                file_name = f"{content_hash[:16]}.{extension}"
+
+                self.storage.write_asset(ASSET_CACHE_ID, file_name, data)
+
+                self.files[content_hash] = file_name
+
+            self.assets[asset_id] = {
+                "url": url,
+                "kind": kind,
+                "name": name,
+                "file": file_name,
+            }
+
+        self.__save_index()
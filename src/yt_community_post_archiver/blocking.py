@@ -0,0 +1,128 @@
+# Resource blocking to cut down on what the browser loads while scraping. We never use things like
+# fonts, ads, tracking beacons, or the video player, so there's no point loading them.
+#
+# Note this file is kept free of Selenium imports; applying these is done in `helpers.py`.
+
+from dataclasses import dataclass, field
+from enum import Enum, unique
+
+
+@unique
+class ResourceType(Enum):
+    """
+    Types of resources that can be blocked.
+    """
+
+    FONT = 1
+    MEDIA = 2
+    IMAGE = 3
+
+    @staticmethod
+    def from_str(s: str):
+        match s:
+            case "font":
+                return ResourceType.FONT
+            case "media":
+                return ResourceType.MEDIA
+            case "image":
+                return ResourceType.IMAGE
+            case _:
+                raise Exception("Unsupported resource type!")
+
+
+# Ads, tracking/stats beacons, and the video player's JS. None of these are needed for posts, polls, or
+# comments to render.
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*googleadservices.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*youtube.com/pagead/*",
+    "*youtube.com/ptracking*",
+    "*youtube.com/api/stats/*",
+    "*youtube.com/youtubei/v1/log_event*",
+    "*youtube.com/generate_204*",
+    "*youtube.com/s/player/*",
+    "*play.google.com/log*",
+]
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = {ResourceType.FONT, ResourceType.MEDIA}
+
+# Chrome's DevTools protocol only lets us block by URL, so resource types are mapped to URL patterns.
+_CHROME_RESOURCE_TYPE_PATTERNS = {
+    ResourceType.FONT: ["*fonts.gstatic.com*", "*.woff2*", "*.woff*", "*.ttf*"],
+    ResourceType.MEDIA: ["*googlevideo.com/videoplayback*"],
+    # Post images are fetched separately at full size, and the `src` attributes are still set even if the
+    # image isn't loaded, so it's safe to block these from being displayed.
+    ResourceType.IMAGE: [
+        "*i.ytimg.com/*",
+        "*yt3.ggpht.com/*",
+        "*yt3.googleusercontent.com/*",
+    ],
+}
+
+
+@dataclass
+class ResourceBlocklist:
+    """
+    What to block from being loaded by the browser.
+    """
+
+    url_patterns: list[str] = field(
+        default_factory=lambda: list(DEFAULT_BLOCKED_URL_PATTERNS)
+    )
+    resource_types: set[ResourceType] = field(
+        default_factory=lambda: set(DEFAULT_BLOCKED_RESOURCE_TYPES)
+    )
+
+
+def chrome_blocked_urls(blocklist: ResourceBlocklist) -> list[str]:
+    """
+    The URL patterns to pass to Chrome's `Network.setBlockedURLs`.
+    """
+
+    urls = list(blocklist.url_patterns)
+    for resource_type in sorted(blocklist.resource_types, key=lambda t: t.value):
+        urls += _CHROME_RESOURCE_TYPE_PATTERNS[resource_type]
+
+    return list(dict.fromkeys(urls))
+
+
+def chrome_prefs(blocklist: ResourceBlocklist) -> dict[str, object]:
+    """
+    Chrome preferences to set based on the blocklist.
+    """
+
+    prefs: dict[str, object] = {}
+
+    if ResourceType.IMAGE in blocklist.resource_types:
+        prefs["profile.managed_default_content_settings.images"] = 2
+
+    return prefs
+
+
+def firefox_prefs(blocklist: ResourceBlocklist) -> dict[str, object]:
+    """
+    Firefox preferences to set based on the blocklist. Firefox has no way to block arbitrary URLs
+    without an extension, so we lean on its built-in tracking protection instead.
+    """
+
+    prefs: dict[str, object] = {}
+
+    if blocklist.url_patterns:
+        prefs["privacy.trackingprotection.enabled"] = True
+
+    if ResourceType.FONT in blocklist.resource_types:
+        prefs["gfx.downloadable_fonts.enabled"] = False
+
+    if ResourceType.MEDIA in blocklist.resource_types:
+        prefs["media.autoplay.default"] = 5
+        prefs["media.autoplay.blocking_policy"] = 2
+        prefs["media.preload.default"] = 0
+        prefs["media.preload.auto"] = 0
+
+    if ResourceType.IMAGE in blocklist.resource_types:
+        prefs["permissions.default.image"] = 2
+
+    return prefs
@@ -0,0 +1,111 @@
+import contextlib
+import importlib
+import io
+import sys
+import traceback
+
+from yt_community_post_archiver.arguments import get_settings
+
+# Subcommands that aren't about archiving, mapped to the module that handles them.
+SUBCOMMANDS = {
+    "export": "yt_community_post_archiver.export",
+    "migrate": "yt_community_post_archiver.migrate",
+    "verify": "yt_community_post_archiver.verify",
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        subcommand = importlib.import_module(SUBCOMMANDS[sys.argv[1]])
+        subcommand.main(sys.argv[2:])
+        return
+
+    # Parse arguments before importing the archiver itself, so things like `--help`, `--version`
+    # and argument errors don't have to pay for loading Selenium and friends.
+    #
+    # Whether stdout is only for streamed records isn't known until then, so anything printed while parsing
+    # (like warnings) is held onto until it is.
+    parse_output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(parse_output):
+            settings, rerun = get_settings()
+    except SystemExit:
+        # E.g. for `--help` or `--version`.
+        sys.stdout.write(parse_output.getvalue())
+        raise
+
+    stdout = sys.stdout
+    if settings.stream_ndjson == "-" or settings.list_only == "-":
+        # Stdout is for streamed records only, so send everything else to stderr.
+        sys.stdout = sys.stderr
+    sys.stdout.write(parse_output.getvalue())
+
+    from yt_community_post_archiver.archiver import Archiver
+    from yt_community_post_archiver.streaming import open_record_stream
+
+    record_stream = None
+    if settings.stream_ndjson is not None:
+        record_stream = open_record_stream(settings.stream_ndjson)
+
+    try:
+        if settings.retry_failed:
+            with Archiver(settings, record_stream) as archiver:
+                archiver.quit_on_interrupt()
+                archiver.retry_failed()
+            print("Done!")
+            return
+
+        if settings.list_only is not None:
+            from yt_community_post_archiver.storage import MemoryStorage
+
+            list_stream = open_record_stream(settings.list_only)
+            try:
+                # Nothing is archived, so don't touch the output directory.
+                with Archiver(
+                    settings, record_stream, storage=MemoryStorage()
+                ) as archiver:
+                    archiver.quit_on_interrupt()
+                    archiver.list_posts(list_stream)
+            finally:
+                if list_stream is not sys.__stdout__:
+                    list_stream.close()
+            print("Done!")
+            return
+
+        if settings.enumerate_to is not None or settings.work_from is not None:
+            from yt_community_post_archiver.jobs import open_job_store
+
+            store = open_job_store(settings.enumerate_to or settings.work_from or "")
+            try:
+                with Archiver(settings, record_stream) as archiver:
+                    archiver.quit_on_interrupt()
+                    if settings.enumerate_to is not None:
+                        archiver.enumerate_posts(store)
+                    else:
+                        archiver.work_from(store, settings.lease_secs)
+            finally:
+                store.close()
+            print("Done!")
+            return
+
+        if rerun == 1:
+            print(f"Running the archiver on `{settings.url}`...")
+        else:
+            print(f"Running the archiver {rerun} times on `{settings.url}`...")
+        for i in range(rerun):
+            with Archiver(settings, record_stream) as archiver:
+                archiver.quit_on_interrupt()
+                if rerun > 1:
+                    print(f"===== Run {i + 1} ======")
+                archiver.scrape()
+        print("Done!")
+    except SystemExit as sys_ex:
+        sys.exit(sys_ex.code)
+    except Exception:
+        print("Encountered a fatal error:")
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        if record_stream is not None and record_stream is not sys.__stdout__:
+            record_stream.close()
+        sys.stdout = stdout
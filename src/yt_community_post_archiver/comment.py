@@ -1,14 +1,12 @@
-import json
-import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
-from pathlib import Path
 
-from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
 
+from yt_community_post_archiver.asset_cache import AssetCache
 from yt_community_post_archiver.post import get_post_id
+from yt_community_post_archiver.storage import ArchiveStorage
 
 
 def _get_comment_id(url: str) -> str:
@@ -27,34 +25,24 @@ class Comment:
     replies: str | None
     link: str | None
     when_archived: str
+    # IDs of images in the asset cache, if enabled; emotes are keyed by their name in `contents`.
+    emotes: dict[str, str] = field(default_factory=dict)
+    badge: str | None = None
+    # The ID of the comment this is a reply to, if it's a reply.
+    parent: str | None = None
 
-    def save(self, output_dir: str, post_url: str):
+    def save(self, storage: ArchiveStorage, post_url: str):
         post_id = get_post_id(post_url)
-        comment_dir = Path(os.path.join(output_dir, post_id, "comments"))
-        if not comment_dir.exists():
-            try:
-                comment_dir.mkdir(parents=True, exist_ok=True)
-            except Exception as ex:
-                print(
-                    f"err: couldn't make directory for comment at {comment_dir} - {ex}"
-                )
-                return
+        if post_id is None:
+            print(f"err: could not parse post ID from `{post_url}`")
+            return
 
         comment_id = _get_comment_id(self.link) if self.link else "unknown"
-        comment_path = os.path.join(comment_dir, f"{comment_id}.json")
 
         try:
-            with open(comment_path, "w", encoding="utf-8") as f:
-                json.dump(
-                    self.__dict__,
-                    f,
-                    ensure_ascii=False,
-                    indent=4,
-                    default=lambda o: o.__dict__,
-                    skipkeys=True,
-                )
+            storage.write_comment_if_changed(post_id, comment_id, self.__dict__)
         except Exception:
-            print(f"err: couldn't save comment data dump at {comment_path}")
+            print(f"err: couldn't save comment data dump for {comment_id}")
 
 
 def _get_author(comment: WebElement) -> str | None:
@@ -81,7 +69,7 @@ def _get_relative_date(comment: WebElement) -> str | None:
     return relative_date if relative_date else None
 
 
-def _get_member_length(comment: WebElement) -> str | None:
+def _get_badge(comment: WebElement) -> WebElement | None:
     possible_member_length = comment.find_elements(By.ID, "custom-badge")
 
     if not possible_member_length:
@@ -91,13 +79,28 @@ def _get_member_length(comment: WebElement) -> str | None:
         By.TAG_NAME, "yt-img-shadow"
     )
 
-    if not possible_text:
+    return possible_text[0] if possible_text else None
+
+
+def _get_member_length(badge: WebElement | None) -> str | None:
+    if badge is None:
         return None
 
-    length = possible_text[0].get_attribute("shared-tooltip-text").strip()
+    length = badge.get_attribute("shared-tooltip-text").strip()
     return length if length else None
 
 
+def _get_badge_url(badge: WebElement | None) -> str | None:
+    if badge is None:
+        return None
+
+    possible_img = badge.find_elements(By.TAG_NAME, "img")
+    if not possible_img:
+        return None
+
+    return possible_img[0].get_attribute("src") or None
+
+
 def _get_likes(comment: WebElement) -> str | None:
     possible_likes = comment.find_elements(By.ID, "vote-count-middle")
 
@@ -124,36 +127,47 @@ def _get_is_pinned(comment: WebElement) -> bool:
     return possible_pins[0].is_displayed()
 
 
-def _get_contents(comment: WebElement) -> str | None:
+def _get_contents(comment: WebElement) -> tuple[str | None, dict[str, str]]:
+    """
+    Get the comment's text, with emotes replaced by `<::name::>`, and the URL of each emote by name.
+    """
+
     # This is SO hardcoded holy SHIT. Definitely test this one.
     # Also I could probably do this all with bs4 but for whatever
     # reason we get this mess lol.
 
+    from bs4 import BeautifulSoup
+
     comment_html = comment.get_attribute("innerHTML")
     if not comment_html:
-        return None
+        return (None, {})
 
     soup = BeautifulSoup(comment_html, "html.parser")
 
     content_wrapper = soup.find(id="content-text")
     if not content_wrapper:
-        return None
+        return (None, {})
 
     content_wrapper = content_wrapper.find("span")
     if not content_wrapper:
-        return None
+        return (None, {})
 
     text = ""
+    emotes = {}
 
     for c in content_wrapper.descendants:
         if c.name == "img":
             emote_name = c.get("alt")
             if emote_name:
                 text += f"<::{emote_name}::>"
+
+                emote_url = c.get("src")
+                if emote_url:
+                    emotes[emote_name] = emote_url
         elif c.name is None:
             text += c.text
 
-    return text
+    return (text, emotes)
 
 
 def _get_replies(comment: WebElement) -> str | None:
@@ -165,16 +179,34 @@ def _get_replies(comment: WebElement) -> str | None:
     return replies if replies else None
 
 
-def build_comment(comment: WebElement, link: str) -> Comment:
+def build_comment(
+    comment: WebElement,
+    link: str,
+    asset_cache: AssetCache | None = None,
+    parent_link: str | None = None,
+) -> Comment:
     author = _get_author(comment)
     relative_date = _get_relative_date(comment)
-    member_length = _get_member_length(comment)
+    badge = _get_badge(comment)
+    member_length = _get_member_length(badge)
     likes = _get_likes(comment)
     is_hearted = _get_is_hearted(comment)
     is_pinned = _get_is_pinned(comment)
-    contents = _get_contents(comment)
+    contents, emote_urls = _get_contents(comment)
     replies = _get_replies(comment)
 
+    emotes = {}
+    badge_id = None
+    if asset_cache is not None:
+        emotes = {
+            name: asset_cache.register(url, "emote", name)
+            for name, url in emote_urls.items()
+        }
+
+        badge_url = _get_badge_url(badge)
+        if badge_url is not None:
+            badge_id = asset_cache.register(badge_url, "badge", member_length)
+
     return Comment(
         author=author,
         relative_date=relative_date,
@@ -186,4 +218,7 @@ def build_comment(comment: WebElement, link: str) -> Comment:
         replies=replies,
         link=link,
         when_archived=str(datetime.now(tz=UTC)),
+        emotes=emotes,
+        badge=badge_id,
+        parent=_get_comment_id(parent_link) if parent_link else None,
     )
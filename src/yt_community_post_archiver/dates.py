@@ -0,0 +1,109 @@
+# Working out when posts were made from the dates shown in the feed, for `--since` and `--until`.
+
+import re
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from enum import Enum, unique
+
+# Roughly how long each unit YouTube uses in relative dates is.
+_UNITS = {
+    "second": timedelta(seconds=1),
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+}
+
+_RELATIVE_DATE_RE = re.compile(
+    r"(\d+)\s+(second|minute|hour|day|week|month|year)s?\s+ago", re.IGNORECASE
+)
+
+# Formats YouTube uses for exact dates, e.g. `Jan 5, 2024`.
+_EXACT_DATE_FORMATS = ["%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%Y-%m-%d"]
+
+# `--since`/`--until` values like `30d`, relative to now.
+_DURATION_RE = re.compile(r"(\d+)\s*([hdwmy])")
+_DURATION_UNITS = {"h": "hour", "d": "day", "w": "week", "m": "month", "y": "year"}
+
+
+def parse_post_date(text: str, now: datetime) -> tuple[datetime, datetime] | None:
+    """
+    Work out the earliest and latest a post could have been made, from the date shown for it in the feed.
+    Relative dates are rounded down by YouTube (e.g. `1 month ago` could be anywhere up to two months ago),
+    so they give a range; exact dates give a range of a day. Returns None if the date can't be understood.
+    """
+
+    text = text.strip()
+
+    match = _RELATIVE_DATE_RE.search(text)
+    if match is not None:
+        amount, unit = int(match.group(1)), _UNITS[match.group(2).lower()]
+        return (now - (amount + 1) * unit, now - amount * unit)
+
+    # Drop things like `(edited)` or `Premiered` around exact dates.
+    cleaned = re.sub(r"\(.*?\)", "", text).strip()
+    for fmt in _EXACT_DATE_FORMATS:
+        try:
+            start = datetime.strptime(cleaned, fmt).replace(tzinfo=UTC)
+            return (start, start + timedelta(days=1))
+        except ValueError:
+            continue
+
+    return None
+
+
+def parse_date_bound(value: str, now: datetime | None = None) -> datetime:
+    """
+    Parse a `--since`/`--until` value: either a date or time (e.g. `2024-05-01` or `2024-05-01T12:00`, in UTC
+    unless a timezone is given), or a duration before now (e.g. `30d`, `12h`, `2w`, `6m`, or `1y`).
+    """
+
+    now = now or datetime.now(tz=UTC)
+
+    match = _DURATION_RE.fullmatch(value.strip().lower())
+    if match is not None:
+        return now - int(match.group(1)) * _UNITS[_DURATION_UNITS[match.group(2)]]
+
+    bound = datetime.fromisoformat(value.strip())
+    return bound if bound.tzinfo is not None else bound.replace(tzinfo=UTC)
+
+
+@unique
+class DatePosition(Enum):
+    """
+    Where a post falls relative to a date range.
+    """
+
+    OLDER = 1
+    IN_RANGE = 2
+    NEWER = 3
+
+
+@dataclass
+class DateRange:
+    since: datetime | None
+    until: datetime | None
+
+    def is_enabled(self) -> bool:
+        return self.since is not None or self.until is not None
+
+    def position(self, date_text: str | None, now: datetime) -> DatePosition:
+        """
+        Where a post falls relative to the range, given the date shown for it. Posts are only treated as
+        outside the range if they definitely are; posts whose date can't be worked out, or that might be in
+        the range, count as in it.
+        """
+
+        dates = parse_post_date(date_text, now) if date_text else None
+        if dates is None:
+            return DatePosition.IN_RANGE
+
+        earliest, latest = dates
+        if self.since is not None and latest < self.since:
+            return DatePosition.OLDER
+        if self.until is not None and earliest > self.until:
+            return DatePosition.NEWER
+
+        return DatePosition.IN_RANGE
@@ -0,0 +1,97 @@
+# Posts that failed to be archived are recorded here rather than stopping the whole run, so they can be
+# retried later with `--retry-failed`.
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+
+DEAD_LETTER_FILE_NAME = "failed-posts.jsonl"
+
+
+@dataclass
+class FailedPost:
+    url: str
+    error: str
+    stage: str | None
+    attempts: int
+    when: str
+
+
+class DeadLetterQueue:
+    """
+    A JSON Lines file of posts that failed to be archived. Entries are appended as posts fail; if a post
+    fails more than once, its latest entry is the one that counts. If there's no path, entries are only kept
+    in memory.
+    """
+
+    def __init__(self, path: str | None) -> None:
+        self.path = path
+        self.num_recorded = 0
+        self.in_memory: list[FailedPost] = []
+
+    def record(self, url: str, error: str, stage: str | None = None, attempts: int = 1):
+        failed = FailedPost(
+            url=url,
+            error=error,
+            stage=stage,
+            attempts=attempts,
+            when=str(datetime.now(tz=UTC)),
+        )
+
+        self.num_recorded += 1
+
+        if self.path is None:
+            self.in_memory.append(failed)
+            return
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(failed), ensure_ascii=False) + "\n")
+
+    def load(self) -> list[FailedPost]:
+        """
+        Load the failed posts, in the order they first failed.
+        """
+
+        if self.path is None:
+            return list({entry.url: entry for entry in self.in_memory}.values())
+
+        if not os.path.exists(self.path):
+            return []
+
+        failed: dict[str, FailedPost] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line_num, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    entry = FailedPost(**json.loads(line))
+                except Exception as ex:
+                    print(
+                        f"warning: skipping line {line_num} of {self.path}, as it couldn't be parsed - {ex}"
+                    )
+                    continue
+
+                failed[entry.url] = entry
+
+        return list(failed.values())
+
+    def resolve(self, url: str):
+        """
+        Remove a post from the queue, e.g. after it's been successfully retried.
+        """
+
+        remaining = [entry for entry in self.load() if entry.url != url]
+
+        if self.path is None:
+            self.in_memory = remaining
+            return
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in remaining:
+                f.write(json.dumps(asdict(entry), ensure_ascii=False) + "\n")
+
+        os.replace(temp_path, self.path)
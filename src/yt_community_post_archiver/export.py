@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+
+from yt_community_post_archiver.arguments import DirectoryLayout
+from yt_community_post_archiver.storage import (
+    SQLITE_FILE_NAME,
+    DirectoryStorage,
+    SqliteStorage,
+    export_archive,
+)
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-community-post-archiver export",
+        description="Exports a SQLite archive back to the directory layout.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    parser.add_argument(
+        "source",
+        type=str,
+        help=f"The SQLite archive to export; either the database itself, or the output directory containing `{SQLITE_FILE_NAME}`.",
+    )
+    parser.add_argument(
+        "destination", type=str, help="The directory to export the archive to."
+    )
+    parser.add_argument(
+        "--layout",
+        type=str,
+        required=False,
+        default="flat",
+        help="How to lay out post directories in the exported archive.",
+        choices=["flat", "sharded"],
+    )
+
+    return parser
+
+
+def main(argv: list[str]):
+    args = _create_parser().parse_args(argv)
+
+    source_path = args.source
+    if os.path.isdir(source_path):
+        source_path = os.path.join(source_path, SQLITE_FILE_NAME)
+
+    if not os.path.exists(source_path):
+        print(f"err: no archive found at {source_path}")
+        sys.exit(1)
+
+    source = SqliteStorage(source_path)
+    try:
+        num_posts = export_archive(
+            source,
+            DirectoryStorage(args.destination, DirectoryLayout.from_str(args.layout)),
+        )
+    finally:
+        source.close()
+
+    print(f"Exported {num_posts} post(s) to `{args.destination}`.")
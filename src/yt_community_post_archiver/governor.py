@@ -0,0 +1,194 @@
+# A central rate governor shared by browser navigations and HTTP fetches, to avoid getting throttled.
+
+import threading
+import time
+from typing import Callable
+from urllib.parse import urlparse
+
+# HTTP status codes that indicate we're being throttled.
+THROTTLED_STATUS_CODES = {429, 503}
+
+
+class ThrottledError(Exception):
+    """
+    Raised when we detect that we're being throttled (e.g. a 429 or a captcha page).
+    """
+
+
+class TokenBucket:
+    """
+    A simple token bucket; tokens are refilled at `rate` per second, up to `burst` tokens.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.clock = clock
+        self.last_refill = clock()
+
+    def __refill(self):
+        now = self.clock()
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.last_refill) * self.rate
+        )
+        self.last_refill = now
+
+    def reserve(self) -> float:
+        """
+        Take a token, and return how long to wait before using it. The bucket may go into debt,
+        so concurrent callers queue up behind each other.
+        """
+
+        self.__refill()
+        self.tokens -= 1
+
+        if self.tokens >= 0:
+            return 0
+
+        return -self.tokens / self.rate
+
+
+def _host(url: str) -> str:
+    return urlparse(url).hostname or url
+
+
+class RateGovernor:
+    """
+    Paces requests per host using token buckets. On throttling, the host's rate is halved (down to
+    `min_rate`) and the host is paused for a cooldown; after enough successful requests in a row, the rate
+    is ramped back up towards its configured value.
+    """
+
+    # How many successful requests in a row before ramping the rate back up.
+    SUCCESS_STREAK = 10
+
+    def __init__(
+        self,
+        default_rate: float,
+        host_rates: dict[str, float] | None = None,
+        burst: float = 5,
+        min_rate: float = 0.05,
+        cooldown_secs: float = 30,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.default_rate = default_rate
+        self.host_rates = host_rates or {}
+        self.burst = burst
+        self.min_rate = min_rate
+        self.cooldown_secs = cooldown_secs
+        self.clock = clock
+        self.sleep = sleep
+
+        self.buckets: dict[str, TokenBucket] = {}
+        self.paused_until: dict[str, float] = {}
+        self.success_streaks: dict[str, int] = {}
+        self.penalties: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def target_rate(self, host: str) -> float:
+        return self.host_rates.get(host, self.default_rate)
+
+    def __bucket(self, host: str) -> TokenBucket:
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = TokenBucket(self.target_rate(host), self.burst, self.clock)
+            self.buckets[host] = bucket
+
+        return bucket
+
+    def current_rate(self, url: str) -> float:
+        with self.lock:
+            return self.__bucket(_host(url)).rate
+
+    def acquire(self, url: str):
+        """
+        Block until we're allowed to make a request to the URL's host.
+        """
+
+        host = _host(url)
+
+        with self.lock:
+            wait = self.__bucket(host).reserve()
+            paused_until = self.paused_until.get(host)
+            if paused_until is not None:
+                wait = max(wait, paused_until - self.clock())
+
+        if wait > 0:
+            self.sleep(wait)
+
+    def penalize(self, url: str, reason: str):
+        """
+        Back off from the URL's host after being throttled.
+        """
+
+        host = _host(url)
+
+        with self.lock:
+            bucket = self.__bucket(host)
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            bucket.tokens = min(bucket.tokens, 0)
+
+            penalties = self.penalties.get(host, 0) + 1
+            self.penalties[host] = penalties
+            self.success_streaks[host] = 0
+
+            # Each penalty in a row doubles the cooldown, capped at 16x.
+            cooldown = self.cooldown_secs * (2 ** min(penalties - 1, 4))
+            self.paused_until[host] = self.clock() + cooldown
+
+        print(
+            f"warning: throttled by {host} ({reason}), backing off to {bucket.rate:.2f} requests/sec for now"
+        )
+
+    def reward(self, url: str):
+        """
+        Record a successful request to the URL's host, ramping the rate back up if it was lowered.
+        """
+
+        host = _host(url)
+
+        with self.lock:
+            self.paused_until.pop(host, None)
+            self.penalties[host] = 0
+
+            streak = self.success_streaks.get(host, 0) + 1
+            if streak < self.SUCCESS_STREAK:
+                self.success_streaks[host] = streak
+                return
+
+            self.success_streaks[host] = 0
+            bucket = self.__bucket(host)
+            target = self.target_rate(host)
+            bucket.rate = min(target, bucket.rate + target / 10)
+
+
+def fetch(url: str, governor: RateGovernor | None) -> bytes:
+    """
+    Fetch a URL's contents over HTTP, paced by the governor if set.
+    """
+
+    import requests
+
+    if governor is not None:
+        governor.acquire(url)
+
+    response = requests.get(url, timeout=60)
+
+    if response.status_code in THROTTLED_STATUS_CODES:
+        if governor is not None:
+            governor.penalize(url, f"HTTP {response.status_code}")
+        raise ThrottledError(f"got HTTP {response.status_code} for `{url}`")
+
+    response.raise_for_status()
+
+    if governor is not None:
+        governor.reward(url)
+
+    return response.content
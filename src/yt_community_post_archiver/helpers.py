@@ -1,8 +1,5 @@
 # A series of helper functions to avoid cluttering the main archiver code file.
 
-import time
-from enum import Enum, unique
-
 from selenium import webdriver
 from selenium.common.exceptions import (
     MoveTargetOutOfBoundsException,
@@ -14,17 +11,16 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.webdriver import WebDriver as FirefoxWebDriver
 from selenium.webdriver.remote.webelement import WebElement
 
-LOAD_SLEEP_SECS = 1
-
-
-@unique
-class Driver(Enum):
-    """
-    The backing browser to use for scraping.
-    """
+from yt_community_post_archiver.arguments import Driver
+from yt_community_post_archiver.blocking import (
+    ResourceBlocklist,
+    chrome_blocked_urls,
+    chrome_prefs,
+    firefox_prefs,
+)
+from yt_community_post_archiver.governor import RateGovernor, ThrottledError
 
-    FIREFOX = 1
-    CHROME = 2
+LOAD_SLEEP_SECS = 1
 
 
 def init_driver(
@@ -36,6 +32,7 @@ def init_driver(
     width: int,
     height: int,
     remote_debugging_port: int | None = None,
+    blocklist: ResourceBlocklist | None = None,
 ) -> ChromeWebDriver | FirefoxWebDriver:
     """
     Initialize the driver and return it, based on the settings passed.
@@ -47,7 +44,9 @@ def init_driver(
 
             if remote_debugging_port is not None:
                 options.debugger_address = f"127.0.0.1:{remote_debugging_port}"
-                return webdriver.Chrome(options)
+                chrome = webdriver.Chrome(options)
+                apply_resource_blocking(chrome, blocklist)
+                return chrome
 
             options.add_argument(f"--window-size={width},{height}")
             options.add_argument("--disable-gpu")
@@ -63,7 +62,14 @@ def init_driver(
             if binary_override:
                 options.binary_location = binary_override
 
-            return webdriver.Chrome(options)
+            if blocklist is not None:
+                prefs = chrome_prefs(blocklist)
+                if prefs:
+                    options.add_experimental_option("prefs", prefs)
+
+            chrome = webdriver.Chrome(options)
+            apply_resource_blocking(chrome, blocklist)
+            return chrome
         case Driver.FIREFOX:
             options = webdriver.FirefoxOptions()
             options.add_argument(f"--window-size={width},{height}")
@@ -83,11 +89,74 @@ def init_driver(
             if binary_override:
                 options.binary_location = binary_override
 
+            if blocklist is not None:
+                for pref, value in firefox_prefs(blocklist).items():
+                    options.set_preference(pref, value)
+
             return webdriver.Firefox(options)
         case _:
             raise Exception("Unsupported driver type!")
 
 
+def apply_resource_blocking(
+    driver: ChromeWebDriver | FirefoxWebDriver, blocklist: ResourceBlocklist | None
+):
+    """
+    Block URLs from being loaded in the current tab via the DevTools protocol. This is only supported for Chrome,
+    and needs to be called for every new tab; Firefox's blocking is all done through preferences at startup.
+    """
+
+    if blocklist is None or not isinstance(driver, ChromeWebDriver):
+        return
+
+    urls = chrome_blocked_urls(blocklist)
+    if not urls:
+        return
+
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": urls})
+    except Exception as ex:
+        print(f"warning: couldn't set up resource blocking - {ex}")
+
+
+def is_throttled_page(driver: ChromeWebDriver | FirefoxWebDriver) -> bool:
+    """
+    Check if the current page is one that YouTube/Google shows when it thinks we're a bot.
+    """
+
+    if "google.com/sorry" in driver.current_url:
+        return True
+
+    return bool(
+        driver.find_elements(By.ID, "captcha-form")
+        or driver.find_elements(By.CSS_SELECTOR, "iframe[src*='recaptcha']")
+    )
+
+
+def navigate(
+    driver: ChromeWebDriver | FirefoxWebDriver,
+    url: str,
+    governor: RateGovernor | None,
+):
+    """
+    Navigate to a URL, paced by the governor if set. Raises `ThrottledError` if we hit a captcha/throttling page.
+    """
+
+    if governor is not None:
+        governor.acquire(url)
+
+    driver.get(url)
+
+    if is_throttled_page(driver):
+        if governor is not None:
+            governor.penalize(url, "captcha page")
+        raise ThrottledError(f"hit a captcha page when loading `{url}`")
+
+    if governor is not None:
+        governor.reward(url)
+
+
 def __is_post(candidate: WebElement) -> bool:
     href = candidate.get_attribute("href")
     if href is not None:
@@ -116,21 +185,20 @@ def find_post_element(driver: ChromeWebDriver | FirefoxWebDriver) -> WebElement
     return post
 
 
-def close_current_tab(
-    driver: ChromeWebDriver | FirefoxWebDriver, original_handle: str
-) -> int:
+def get_true_comment_count(
+    driver: ChromeWebDriver | FirefoxWebDriver,
+) -> str | None:
     """
-    Try to close the current tab if there was more than one tab left. Returns the number of tabs left before closing.
+    Get the number of comments. This should always be a valid int.
     """
 
-    original_tabs_left = len(driver.window_handles)
-
-    if original_tabs_left > 1:
-        driver.close()
-        driver.switch_to.window(original_handle)
-        time.sleep(0.5)
+    comment_elements = driver.find_elements(By.TAG_NAME, "ytd-comments")
+    if comment_elements:
+        count = comment_elements[0].find_elements(By.ID, "count")
+        if count:
+            return count[0].text.split()[0]
 
-    return original_tabs_left
+    return None
 
 
 def scroll_to_element(
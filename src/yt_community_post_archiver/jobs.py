@@ -0,0 +1,255 @@
+# A shared store of post URLs to archive, so several machines can split up the work. One process enumerates
+# posts into the store (`--enumerate-to`), and any number of workers lease posts from it (`--work-from`).
+
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable
+
+# How long a worker has a post for before it's given to someone else, unless the lease is renewed.
+DEFAULT_LEASE_SECS = 300
+
+# How many times a post can be leased before giving up on it.
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+@dataclass
+class Job:
+    url: str
+    attempts: int
+
+
+class JobStore(ABC):
+    """
+    The base class for job stores. A job is a post URL; workers lease a job, renew the lease while working on
+    it, and then mark it as done or failed. Jobs whose lease runs out are handed out again.
+    """
+
+    @abstractmethod
+    def enqueue(self, urls: list[str]) -> int:
+        """
+        Add jobs, ignoring any that already exist. Returns how many were added.
+        """
+
+    @abstractmethod
+    def lease(self, worker: str, lease_secs: float) -> Job | None:
+        """
+        Lease the next available job, or return None if there aren't any available right now.
+        """
+
+    @abstractmethod
+    def heartbeat(self, url: str, worker: str, lease_secs: float) -> bool:
+        """
+        Renew a lease. Returns False if the worker no longer holds it.
+        """
+
+    @abstractmethod
+    def complete(self, url: str, worker: str): ...
+
+    @abstractmethod
+    def fail(self, url: str, worker: str, error: str):
+        """
+        Give up on a job for now; it's handed out again unless it's been tried too many times.
+        """
+
+    @abstractmethod
+    def counts(self) -> dict[str, int]:
+        """
+        How many jobs are in each state (`pending`, `leased`, `done`, and `failed`).
+        """
+
+    def close(self):
+        pass
+
+
+class SqliteJobStore(JobStore):
+    """
+    A job store in a SQLite database, which relies on SQLite's file locking to stop two workers from
+    leasing the same job. The file has to be somewhere every worker can get to, and file locking needs to
+    work there (which isn't the case for some network file systems).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        import sqlite3
+
+        self.path = path
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False, timeout=30
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (url TEXT PRIMARY KEY, state TEXT NOT NULL DEFAULT 'pending', "
+            "worker TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+
+    def __transaction(self, fn: Callable):
+        # `BEGIN IMMEDIATE` takes the write lock up front, so no other process can lease in between us
+        # picking a job and marking it as leased.
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self.connection)
+                self.connection.execute("COMMIT")
+                return result
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, urls: list[str]) -> int:
+        def insert(connection) -> int:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO jobs (url) VALUES (?)", [(url,) for url in urls]
+            )
+            return connection.total_changes - before
+
+        return self.__transaction(insert)
+
+    def lease(self, worker: str, lease_secs: float) -> Job | None:
+        now = self.clock()
+
+        def take(connection) -> Job | None:
+            # Jobs whose lease ran out too many times are given up on.
+            connection.execute(
+                "UPDATE jobs SET state = 'failed', worker = NULL, error = 'lease expired too many times' "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+
+            row = connection.execute(
+                "SELECT url, attempts FROM jobs WHERE state = 'pending' "
+                "OR (state = 'leased' AND lease_expires < ?) ORDER BY rowid LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            url, attempts = row
+            connection.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, lease_expires = ?, attempts = ? WHERE url = ?",
+                (worker, now + lease_secs, attempts + 1, url),
+            )
+            return Job(url=url, attempts=attempts + 1)
+
+        return self.__transaction(take)
+
+    def heartbeat(self, url: str, worker: str, lease_secs: float) -> bool:
+        def renew(connection) -> bool:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE url = ? AND worker = ? AND state = 'leased'",
+                (self.clock() + lease_secs, url, worker),
+            )
+            return cursor.rowcount > 0
+
+        return self.__transaction(renew)
+
+    def complete(self, url: str, worker: str):
+        self.__transaction(
+            lambda connection: connection.execute(
+                "UPDATE jobs SET state = 'done', worker = NULL, error = NULL WHERE url = ? AND worker = ?",
+                (url, worker),
+            )
+        )
+
+    def fail(self, url: str, worker: str, error: str):
+        self.__transaction(
+            lambda connection: connection.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "worker = NULL, error = ? WHERE url = ? AND worker = ?",
+                (self.max_attempts, error, url, worker),
+            )
+        )
+
+    def counts(self) -> dict[str, int]:
+        now = self.clock()
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'pending' ELSE state END AS s, "
+                "COUNT(*) FROM jobs GROUP BY s",
+                (now,),
+            ).fetchall()
+
+        counts = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        counts.update({state: count for state, count in rows})
+        return counts
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+# Job store backends by URL scheme. Other backends can be added with `register_job_store`.
+JOB_STORES: dict[str, Callable[[str], JobStore]] = {
+    "sqlite": SqliteJobStore,
+}
+
+
+def register_job_store(scheme: str, factory: Callable[[str], JobStore]):
+    JOB_STORES[scheme] = factory
+
+
+def open_job_store(location: str) -> JobStore:
+    """
+    Open a job store from a location like `sqlite:///path/to/jobs.sqlite3`. A plain path is treated as a
+    SQLite database. Raises a `ValueError` if there's no job store for the location's scheme.
+    """
+
+    scheme, sep, rest = location.partition("://")
+    if not sep:
+        return SqliteJobStore(location)
+
+    factory = JOB_STORES.get(scheme)
+    if factory is None:
+        raise ValueError(f"Unsupported job store `{scheme}`!")
+
+    # For `sqlite:///path`, the path is what comes after the scheme.
+    return factory(rest)
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseHeartbeat:
+    """
+    Keeps renewing a lease in the background while a job is being worked on.
+    """
+
+    def __init__(self, store: JobStore, url: str, worker: str, lease_secs: float):
+        self.store = store
+        self.url = url
+        self.worker = worker
+        self.lease_secs = lease_secs
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+
+    def __run(self):
+        while not self.stopped.wait(self.lease_secs / 3):
+            try:
+                if not self.store.heartbeat(self.url, self.worker, self.lease_secs):
+                    print(
+                        f"warning: lost the lease on `{self.url}`; another worker may pick it up"
+                    )
+                    return
+            except Exception as ex:
+                print(f"warning: couldn't renew the lease on `{self.url}` - {ex}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,70 @@
+# A log of when each post was last checked. Saved posts that haven't changed aren't written again (so their files
+# stay untouched for backups and syncing), so this is where it's recorded that they were still there.
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+
+LAST_SEEN_FILE_NAME = "last-seen.jsonl"
+
+
+@dataclass
+class Sighting:
+    post_id: str
+    when: str
+    # Whether the post's metadata was written, i.e. it was new or had changed.
+    changed: bool
+
+
+class LastSeenLog:
+    """
+    A JSON Lines file that's appended to every time a post is checked, so the rest of the archive doesn't need to
+    be touched. If there's no path, entries are only kept in memory.
+    """
+
+    def __init__(self, path: str | None) -> None:
+        self.path = path
+        self.in_memory: list[Sighting] = []
+
+    def record(self, post_id: str, changed: bool):
+        sighting = Sighting(
+            post_id=post_id, when=str(datetime.now(tz=UTC)), changed=changed
+        )
+
+        if self.path is None:
+            self.in_memory.append(sighting)
+            return
+
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(sighting), ensure_ascii=False) + "\n")
+
+    def load(self) -> dict[str, Sighting]:
+        """
+        When each post was last seen.
+        """
+
+        if self.path is None:
+            return {sighting.post_id: sighting for sighting in self.in_memory}
+
+        if not os.path.exists(self.path):
+            return {}
+
+        sightings: dict[str, Sighting] = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line_num, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    sighting = Sighting(**json.loads(line))
+                except Exception as ex:
+                    print(
+                        f"warning: skipping line {line_num} of {self.path}, as it couldn't be parsed - {ex}"
+                    )
+                    continue
+
+                sightings[sighting.post_id] = sighting
+
+        return sightings
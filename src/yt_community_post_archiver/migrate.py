@@ -0,0 +1,87 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from yt_community_post_archiver.arguments import DirectoryLayout
+from yt_community_post_archiver.storage import find_post_dirs, post_dir_for
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-community-post-archiver migrate",
+        description="Moves an existing archive to a different directory layout.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    parser.add_argument("output_dir", type=str, help="The archive to migrate.")
+    parser.add_argument(
+        "--to",
+        type=str,
+        required=True,
+        help="The layout to migrate to.",
+        choices=["flat", "sharded"],
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        required=False,
+        default=16,
+        help="How many posts to move at once.",
+    )
+
+    return parser
+
+
+def _move_post(output_dir: str, post_dir: Path, layout: DirectoryLayout) -> bool:
+    """
+    Move a single post directory to where it should be for the layout. Returns whether it was moved.
+    """
+
+    target = post_dir_for(output_dir, post_dir.name, layout)
+    if target == post_dir:
+        return False
+
+    if target.exists():
+        print(f"err: not moving {post_dir} as {target} already exists")
+        return False
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(post_dir, target)
+
+    # Clean up shards that are now empty; this fails if the shard still has posts in it, or another
+    # worker already removed it.
+    if post_dir.parent != Path(output_dir):
+        try:
+            post_dir.parent.rmdir()
+        except OSError:
+            pass
+
+    return True
+
+
+def migrate_archive(output_dir: str, layout: DirectoryLayout, jobs: int = 16) -> int:
+    """
+    Move every post directory in the archive to the given layout. Returns the number of posts moved.
+    """
+
+    post_dirs = list(find_post_dirs(output_dir))
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        moved = executor.map(lambda dir: _move_post(output_dir, dir, layout), post_dirs)
+        return sum(moved)
+
+
+def main(argv: list[str]):
+    args = _create_parser().parse_args(argv)
+
+    if not os.path.isdir(args.output_dir):
+        print(f"err: no archive found at {args.output_dir}")
+        sys.exit(1)
+
+    num_moved = migrate_archive(
+        args.output_dir, DirectoryLayout.from_str(args.to), args.jobs
+    )
+    print(f"Moved {num_moved} post(s) to the {args.to} layout.")
@@ -0,0 +1,194 @@
+# An asyncio pipeline for crawling, so the different stages of archiving posts overlap rather than each post
+# going through every stage before the next one starts.
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, TypeVar
+
+from selenium.webdriver.remote.webelement import WebElement
+
+from yt_community_post_archiver.post_builder import PostBuilder
+
+if TYPE_CHECKING:
+    from yt_community_post_archiver.archiver import Archiver
+
+T = TypeVar("T")
+
+# How many posts can be waiting between two stages. Once a queue is full, the stage before it waits, so the
+# feed isn't scrolled much further ahead than the slowest stage.
+QUEUE_SIZE = 4
+
+# How many posts can have their images downloaded at once.
+FETCH_WORKERS = 4
+
+# Marks that there's nothing more coming through a queue.
+_DONE: Any = object()
+
+
+class CrawlPipeline:
+    """
+    Crawls the archiver's feed with each stage running concurrently, connected by bounded queues:
+
+    ```
+    discovery -> extraction -> persistence -> asset fetching
+                                          \\-> screenshots and comments
+    ```
+
+    WebDriver isn't thread-safe, so every stage that uses the browser (discovery, extraction, screenshots and
+    comments) runs on one shared thread, one call at a time. Persistence and asset fetching don't touch the
+    browser, so they run on their own threads alongside it.
+
+    If a post fails in any stage, it's recorded as failed and the rest carry on without it.
+    """
+
+    def __init__(
+        self,
+        archiver: "Archiver",
+        queue_size: int = QUEUE_SIZE,
+        fetch_workers: int = FETCH_WORKERS,
+    ) -> None:
+        self.archiver = archiver
+        self.queue_size = queue_size
+        self.fetch_workers = fetch_workers
+
+        # Posts waiting to be harvested need to stay open in their tabs, so make room for them.
+        archiver.tab_pool_size = max(archiver.tab_pool_size, queue_size + 2)
+
+        self.driver_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="driver"
+        )
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=fetch_workers + 1, thread_name_prefix="io"
+        )
+
+    async def __on_driver(self, fn: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.driver_executor, fn, *args
+        )
+
+    async def __on_io(self, fn: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.io_executor, fn, *args
+        )
+
+    async def run(self):
+        extract_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        persist_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        fetch_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        harvest_queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        try:
+            async with asyncio.TaskGroup() as tasks:
+                tasks.create_task(self.discover(extract_queue))
+                tasks.create_task(self.extract(extract_queue, persist_queue))
+                tasks.create_task(
+                    self.persist(persist_queue, fetch_queue, harvest_queue)
+                )
+                for _ in range(self.fetch_workers):
+                    tasks.create_task(self.fetch_assets(fetch_queue))
+                tasks.create_task(self.harvest(harvest_queue))
+        finally:
+            self.driver_executor.shutdown(wait=True)
+            self.io_executor.shutdown(wait=True)
+
+    async def discover(self, out: asyncio.Queue):
+        """
+        Find posts in the feed, scrolling for more once they've all been queued up.
+        """
+
+        await self.__discover_posts(out)
+
+        # This is only reached if discovery finished cleanly. If it failed, the task group cancels every
+        # other stage instead, so nothing is left waiting on a queue.
+        await out.put(_DONE)
+
+    async def __discover_posts(self, out: asyncio.Queue):
+        archiver = self.archiver
+
+        while True:
+            posts = await self.__on_driver(archiver.find_posts)
+            for post, url in posts:
+                if archiver.at_max_posts():
+                    print(f"Hit maximum posts ({archiver.max_posts}). Halting.")
+                    return
+
+                # Mark it as seen now, so it isn't found again while it's still going through the pipeline.
+                archiver.seen.add(url)
+
+                if archiver.should_skip_post(url):
+                    print(f"Skipping `{url}` as it already exists.")
+                    continue
+
+                await out.put((post, url))
+
+            if not await self.__on_driver(archiver.advance_feed):
+                return
+
+    def __extract_post(self, post: WebElement, url: str) -> PostBuilder | None:
+        archiver = self.archiver
+        archiver.driver.switch_to.window(archiver.original_handle)
+
+        builder = archiver.make_post_builder(post, url)
+
+        try:
+            if archiver.should_refresh_post(url) and builder.refresh_metadata():
+                print(f"Refreshed metadata for `{url}`.")
+                return None
+
+            return builder if builder.extract() is not None else None
+        finally:
+            builder.close_opened_tab()
+
+    async def extract(self, inp: asyncio.Queue, out: asyncio.Queue):
+        while (item := await inp.get()) is not _DONE:
+            post, url = item
+
+            try:
+                builder = await self.__on_driver(self.__extract_post, post, url)
+            except Exception as ex:
+                self.archiver.record_failed_post(url, ex)
+                continue
+
+            if builder is not None:
+                await out.put(builder)
+
+        await out.put(_DONE)
+
+    async def persist(
+        self, inp: asyncio.Queue, fetch_out: asyncio.Queue, harvest_out: asyncio.Queue
+    ):
+        while (builder := await inp.get()) is not _DONE:
+            try:
+                await self.__on_io(builder.persist)
+            except Exception as ex:
+                self.archiver.record_failed_post(builder.url, ex)
+                continue
+
+            await fetch_out.put(builder)
+            if builder.needs_harvest():
+                await harvest_out.put(builder)
+
+        # Every fetch worker needs to be told that there's nothing left.
+        for _ in range(self.fetch_workers):
+            await fetch_out.put(_DONE)
+        await harvest_out.put(_DONE)
+
+    async def fetch_assets(self, inp: asyncio.Queue):
+        while (builder := await inp.get()) is not _DONE:
+            try:
+                await self.__on_io(builder.fetch_assets)
+            except Exception as ex:
+                self.archiver.record_failed_post(builder.url, ex)
+
+    def __harvest_post(self, builder: PostBuilder):
+        try:
+            builder.harvest()
+        finally:
+            builder.close_opened_tab()
+
+    async def harvest(self, inp: asyncio.Queue):
+        while (builder := await inp.get()) is not _DONE:
+            try:
+                await self.__on_driver(self.__harvest_post, builder)
+            except Exception as ex:
+                self.archiver.record_failed_post(builder.url, ex)
@@ -1,11 +1,13 @@
 import json
-import os
 from dataclasses import dataclass
-from pathlib import Path
+from typing import Any
 from urllib.parse import urlparse
 
-import filetype
-import requests
+from yt_community_post_archiver.governor import RateGovernor, fetch
+from yt_community_post_archiver.storage import ArchiveStorage, to_json
+
+# Fields that can change after a post goes up, and are updated by `--refresh-metadata`.
+VOLATILE_FIELDS = ("num_thumbs_up", "num_comments", "approximate_num_comments", "poll")
 
 
 class PollEntry:
@@ -48,6 +50,47 @@ def get_post_id(url: str) -> str | None:
         return None
 
 
+def exact_comment_count(approximate_num_comments: str | None) -> str | None:
+    """
+    The posts tab shows the number of comments in full until it gets large enough to be abbreviated
+    (e.g. "2.5K"). If it hasn't been abbreviated, then it's already the exact count.
+    """
+
+    if approximate_num_comments is None:
+        return None
+
+    count = approximate_num_comments.replace(",", "").strip()
+    return count if count.isdigit() else None
+
+
+def refresh_post_data(existing: dict, fresh: dict[str, Any], when: str) -> dict | None:
+    """
+    Update a previously saved post's volatile fields with freshly extracted values. Each refresh is
+    recorded as a snapshot in the post's `history`; the first refresh also records the values from when
+    the post was originally archived. Returns None if none of the values have changed, in which case
+    there's nothing to save.
+    """
+
+    # Round trip through JSON so things like polls are stored the same way as in a full save.
+    fresh = json.loads(to_json({field: fresh.get(field) for field in VOLATILE_FIELDS}))
+
+    if all(existing.get(field) == fresh[field] for field in VOLATILE_FIELDS):
+        return None
+
+    history = list(existing.get("history") or [])
+    if not history:
+        history.append(
+            {
+                "when": existing.get("when_archived"),
+                **{field: existing.get(field) for field in VOLATILE_FIELDS},
+            }
+        )
+
+    history.append({"when": when, **fresh})
+
+    return {**existing, **fresh, "when_refreshed": when, "history": history}
+
+
 @dataclass
 class Post:
     """
@@ -66,48 +109,53 @@ class Post:
     poll: Poll | None
     when_archived: str
 
-    def save(self, output_dir: str):
+    def save(self, storage: ArchiveStorage, governor: RateGovernor | None = None):
+        self.save_metadata(storage)
+        self.save_images(storage, governor)
+
+    def save_metadata(self, storage: ArchiveStorage) -> bool:
+        """
+        Save the post's metadata (i.e. `post.json`). If it's already been saved and nothing but its timestamps
+        have changed, it isn't written again. Returns whether it was written.
+        """
+
         post_id = get_post_id(self.url)
         if post_id is None:
             print(f"err: could not parse post ID from `{self.url}`")
-            return
-
-        dir = Path(os.path.join(output_dir, post_id))
-
-        if not dir.exists():
-            try:
-                dir.mkdir(parents=True, exist_ok=True)
-            except Exception as ex:
-                print(f"err: couldn't make directory for post at {dir} - {ex}")
-                return
+            return False
 
-        data_path = os.path.join(dir, "post.json")
         try:
-            with open(data_path, "w", encoding="utf-8") as f:
-                json.dump(
-                    self.__dict__,
-                    f,
-                    ensure_ascii=False,
-                    indent=4,
-                    default=lambda o: o.__dict__,
-                    skipkeys=True,
-                )
+            return storage.write_post_if_changed(post_id, self.__dict__)
         except Exception as ex:
-            print(f"err: couldn't save data dump at {data_path} - {ex}")
+            print(f"err: couldn't save data dump for {post_id} - {ex}")
+            raise ex
+
+    def save_images(
+        self, storage: ArchiveStorage, governor: RateGovernor | None = None
+    ):
+        """
+        Download and save the post's images. Images that have already been saved are skipped without
+        being downloaded again, so this is safe to retry.
+        """
+
+        import filetype
+
+        post_id = get_post_id(self.url)
+        if post_id is None:
+            print(f"err: could not parse post ID from `{self.url}`")
+            return
 
         for itx, image in enumerate(self.images):
-            img_data = requests.get(image).content
+            if storage.has_asset(post_id, f"{post_id}-{itx}."):
+                # print(f"Skipping saving image {itx} as it's already been saved.")
+                continue
+
+            img_data = fetch(image, governor)
             img_format = filetype.guess(img_data)
             img_extension = img_format.extension if img_format else "png"
             img_name = f"{post_id}-{itx}.{img_extension}"
-            img_path = os.path.join(dir, img_name)
 
             try:
-                if not os.path.exists(img_path):
-                    with open(img_path, "wb") as f:
-                        f.write(img_data)
-                else:
-                    # print(f"Skipping saving image at {img_path} as it's already been saved.")
-                    pass
+                storage.write_asset(post_id, img_name, img_data)
             except Exception as ex:
-                print(f"err: couldn't save image `{image}` dump at {img_path} - {ex}")
+                print(f"err: couldn't save image `{image}` as {img_name} - {ex}")
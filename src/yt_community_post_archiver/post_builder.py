@@ -1,12 +1,10 @@
 import io
-import os
 import re
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import UTC, datetime
 from urllib.parse import parse_qs, unquote, urlparse
 
-from PIL import Image
 from selenium.webdriver.chrome.webdriver import WebDriver as ChromeWebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.webdriver import WebDriver as FirefoxWebDriver
@@ -14,37 +12,33 @@ from selenium.webdriver.remote.webelement import WebElement
 from typing_extensions import TypeIs
 
 from yt_community_post_archiver.arguments import CommentType, MembersPostType
-from yt_community_post_archiver.comment import build_comment
+from yt_community_post_archiver.asset_cache import AssetCache
+from yt_community_post_archiver.comment import Comment, build_comment
+from yt_community_post_archiver.governor import RateGovernor
 from yt_community_post_archiver.helpers import (
     LOAD_SLEEP_SECS,
-    close_current_tab,
-    find_post_element,
     get_post_link,
+    get_true_comment_count,
     scroll_to_element,
 )
-from yt_community_post_archiver.post import Poll, PollEntry, Post, get_post_id
+from yt_community_post_archiver.last_seen import LastSeenLog
+from yt_community_post_archiver.post import (
+    Poll,
+    PollEntry,
+    Post,
+    exact_comment_count,
+    get_post_id,
+    refresh_post_data,
+)
+from yt_community_post_archiver.stages import Stage, StageTracker
+from yt_community_post_archiver.storage import ArchiveStorage
+from yt_community_post_archiver.tabs import DetailTabPool
 
 
 def _is_members_post(post: WebElement) -> bool:
     return bool(post.find_elements(By.CLASS_NAME, "ytd-sponsors-only-badge-renderer"))
 
 
-def get_true_comment_count(
-    driver: ChromeWebDriver | FirefoxWebDriver,
-) -> str | None:
-    """
-    Get the number of comments. This should always be a valid int.
-    """
-
-    comment_elements = driver.find_elements(By.TAG_NAME, "ytd-comments")
-    if comment_elements:
-        count = comment_elements[0].find_elements(By.ID, "count")
-        if count:
-            return count[0].text.split()[0]
-
-    return None
-
-
 def _get_likes(post: WebElement) -> str | None:
     """
     Get the number of comments. These return string as the values may be represented by strings like "2.5K".
@@ -201,29 +195,161 @@ def _get_poll(
     return None
 
 
+# Describes a comment for deciding whether to save it: its link, and which badges it has. `top` is the element
+# with the actual comment, since a thread also contains its replies.
+_DESCRIBE_COMMENT_JS = """
+const describe = (element, top) => ({
+    element: element,
+    link: top.querySelector("#published-time-text a")?.href ?? null,
+    creator: top.querySelector("#author-comment-badge") !== null,
+    hearted: top.querySelector("#creator-heart-button") !== null,
+    pinned: top.querySelector("#pinned-comment-badge") !== null,
+    members: top.querySelector("#custom-badge") !== null,
+});
+"""
+
+# Describes every comment thread from the given index onwards, in one go rather than a few calls per thread.
+DESCRIBE_THREADS_JS = _DESCRIBE_COMMENT_JS + """
+return Array.from(document.querySelectorAll("ytd-comment-thread-renderer"))
+    .slice(arguments[0])
+    .map((thread) => describe(thread, thread.querySelector("#comment") ?? thread));
+"""
+
+# Scroll to the end of the comments to load more, or down a screen if there isn't a continuation.
+SCROLL_COMMENTS_JS = """
+const continuations = document.querySelectorAll("ytd-comments ytd-continuation-item-renderer");
+if (continuations.length > 0) {
+    continuations[continuations.length - 1].scrollIntoView();
+} else {
+    window.scrollBy(0, window.innerHeight);
+}
+"""
+
+# Clicks the "N replies" button of each of the given comment threads. Returns how many were clicked.
+EXPAND_REPLIES_JS = """
+let clicked = 0;
+for (const thread of arguments[0]) {
+    const button = thread.querySelector("ytd-comment-replies-renderer #more-replies button");
+    if (button && button.offsetParent !== null) {
+        button.click();
+        clicked++;
+    }
+}
+return clicked;
+"""
+
+# Clicks the "Show more replies" button of each of the given (expanded) comment threads. Returns how many were
+# clicked.
+LOAD_MORE_REPLIES_JS = """
+let clicked = 0;
+for (const thread of arguments[0]) {
+    const button = thread.querySelector("ytd-comment-replies-renderer ytd-continuation-item-renderer button");
+    if (button) {
+        button.click();
+        clicked++;
+    }
+}
+return clicked;
+"""
+
+# Describes the replies of each of the given comment threads, and whether they've all loaded: the thread has to
+# have been expanded, and either have as many replies as its "N replies" button says, or have some replies and no
+# "Show more replies" button left. Threads without replies have nothing to load.
+GET_REPLIES_JS = _DESCRIBE_COMMENT_JS + """
+return arguments[0].map((thread) => {
+    const replies = Array.from(thread.querySelectorAll(
+        "ytd-comment-replies-renderer #contents > ytd-comment-view-model, "
+        + "ytd-comment-replies-renderer #contents > ytd-comment-renderer"
+    )).map((reply) => describe(reply, reply));
+
+    const button = thread.querySelector("ytd-comment-replies-renderer #more-replies button");
+    if (!button) {
+        return { replies: replies, complete: true };
+    }
+
+    const expected = parseInt(
+        (button.getAttribute("aria-label") ?? button.textContent).replace(/[^0-9]/g, ""), 10
+    );
+    const continuation = thread.querySelector(
+        "ytd-comment-replies-renderer ytd-continuation-item-renderer"
+    );
+
+    return {
+        replies: replies,
+        complete: button.offsetParent === null
+            && (replies.length >= expected || (replies.length > 0 && continuation === null)),
+    };
+});
+"""
+
+# How many times to load more replies for a batch of threads, to avoid getting stuck on huge threads.
+MAX_REPLY_CONTINUATIONS = 20
+
+# How many times to check again for replies that haven't finished loading.
+MAX_REPLY_ATTEMPTS = 3
+
+
 @dataclass
 class PostBuilder:
     driver: ChromeWebDriver | FirefoxWebDriver
     post: WebElement
     url: str
     take_screenshots: bool
-    output_dir: str
+    storage: ArchiveStorage
     members: MembersPostType | None
     save_comments_types: set[CommentType]
     max_comments: int | None
-    original_handle: str
+    tab_pool: DetailTabPool
+    governor: RateGovernor | None = None
+    fast_comment_count: bool = False
+    asset_cache: AssetCache | None = None
+    save_replies: bool = False
+    comment_scan_limit: int = 0
+    # Whether to keep built comments around in `kept_comments`, for using them directly (see `api.py`).
+    keep_comments: bool = False
+    last_seen: LastSeenLog | None = None
+
+    # State that is kept across retries, so a failed stage can be retried without redoing earlier stages.
+    stages: StageTracker = field(default_factory=StageTracker, init=False)
+    built_post: Post | None = field(default=None, init=False)
+    opened_post: WebElement | None = field(default=None, init=False)
+    opened_tab: bool = field(default=False, init=False)
+    existing_data: dict | None = field(default=None, init=False)
+    refreshed_metadata: dict | None = field(default=None, init=False)
+    seen_comments: set[str] = field(default_factory=set, init=False)
+    comments_saved: int = field(default=0, init=False)
+    harvested_threads: set[str] = field(default_factory=set, init=False)
+    threads_scanned: int = field(default=0, init=False)
+    kept_comments: list[Comment] = field(default_factory=list, init=False)
+
+    def __ensure_opened_post(self):
+        """
+        Make sure the post is opened in its own tab, e.g. if we're resuming after the tab was released.
+        """
+
+        if self.opened_post is None and not self.opened_tab:
+            self.opened_tab = True
+            self.opened_post = self.tab_pool.open(self.url)
+
+    def __reload_opened_post(self):
+        """
+        Called before retrying a stage that needs the opened post, in case the page is in a bad state.
+        """
+
+        if not self.opened_tab:
+            return
 
-    def __open_post_in_tab(self, url: str) -> WebElement | None:
-        self.driver.switch_to.new_window("tab")
-        self.driver.get(url)
-        time.sleep(LOAD_SLEEP_SECS)
+        self.opened_post = self.tab_pool.open(self.url, reload=True)
 
-        return find_post_element(self.driver)
+    def __take_screenshots(self):
+        self.__ensure_opened_post()
 
-    def __take_screenshots(self, new_tab_post: WebElement | None):
+        new_tab_post = self.opened_post
         if new_tab_post is None:
             return
 
+        from PIL import Image
+
         more = new_tab_post.find_elements(By.CLASS_NAME, "more-button")
         if more:
             # NB: DO NOT TRY AND RE-USE THE ACTIONCHAINS FROM THE ORIGINAL ARCHIVER!
@@ -245,103 +371,226 @@ class PostBuilder:
             print(f"err: could not parse post ID from `{self.url}`")
             return
 
-        screenshot = os.path.join(self.output_dir, post_id, "screenshot.png")
         img_bytes = new_tab_post.screenshot_as_png
         img = Image.open(io.BytesIO(img_bytes))
-        img.save(screenshot)
+        screenshot = io.BytesIO()
+        img.save(screenshot, format="PNG")
+        self.storage.write_asset(post_id, "screenshot.png", screenshot.getvalue())
 
-    def __get_comments(self):
-        seen_comments = set()
+    def __should_save_comment(self, comment: dict) -> bool:
+        """
+        Whether a comment described by `DESCRIBE_THREADS_JS` or `GET_REPLIES_JS` should be saved.
+        """
 
-        def get_link(comment: WebElement) -> str | None:
-            possible_relative_date = comment.find_elements(By.ID, "published-time-text")
-            if not possible_relative_date:
-                return None
+        types = self.save_comments_types
+
+        return (
+            (CommentType.ALL in types)
+            or (CommentType.CREATOR in types and comment["creator"])
+            or (CommentType.HEARTED in types and comment["hearted"])
+            or (CommentType.PINNED in types and comment["pinned"])
+            or (CommentType.MEMBERS in types and comment["members"])
+        )
 
-            possible_links = possible_relative_date[0].find_elements(By.TAG_NAME, "a")
-            return possible_links[0].get_attribute("href") if possible_links else None
+    def __at_max_comments(self) -> bool:
+        return (
+            self.max_comments is not None and self.comments_saved >= self.max_comments
+        )
 
-        def get_comment_elements() -> list[tuple[WebElement, str]]:
-            prospective_comments = self.driver.find_elements(
-                By.TAG_NAME, "ytd-comment-thread-renderer"
-            )
-            to_return = []
+    def __save_comment(self, comment: dict, parent_link: str | None = None):
+        built = build_comment(
+            comment["element"], comment["link"], self.asset_cache, parent_link
+        )
+        # print(built.__dict__)
+        self.comments_saved += 1
+        built.save(self.storage, self.url)
 
-            for pc in prospective_comments:
-                link = get_link(pc)
-                if link and link not in seen_comments:
-                    to_return.append((pc, link))
+        if self.keep_comments:
+            self.kept_comments.append(built)
 
-            return to_return
+    def __get_comments(self):
+        self.__ensure_opened_post()
 
-        comments = get_comment_elements()
+        seen_comments = self.seen_comments
+        save_all = CommentType.ALL in self.save_comments_types
 
-        if not comments:
-            return
+        # A pinned comment is always the first one, so if that's all we want, there's no need to look further.
+        only_pinned = self.save_comments_types == {CommentType.PINNED}
 
-        save_comments_types = self.save_comments_types
+        # Without saving everything, the comments we want are usually near the top (e.g. creator comments
+        # show up first under "Top comments"), so only look through so many.
+        scan_limit = (
+            self.comment_scan_limit
+            if not save_all and self.comment_scan_limit > 0
+            else None
+        )
 
-        def is_creator(comment_element: WebElement) -> bool:
-            return CommentType.CREATOR in save_comments_types and bool(
-                comment_element.find_elements(By.ID, "author-comment-badge")
-            )
+        no_new_comments_counter = 0
 
-        def is_hearted(comment_element: WebElement) -> bool:
-            return CommentType.HEARTED in save_comments_types and bool(
-                comment_element.find_elements(By.ID, "creator-heart-button")
-            )
+        # How many threads have been loaded and looked at, including any that are waiting to be looked at again.
+        num_described = self.threads_scanned
 
-        def is_pinned(comment_element: WebElement) -> bool:
-            return CommentType.PINNED in save_comments_types and bool(
-                comment_element.find_elements(By.ID, "pinned-comment-badge")
-            )
+        while True:
+            start = self.threads_scanned
+            threads = self.driver.execute_script(DESCRIBE_THREADS_JS, start)
 
-        def is_members(comment_element: WebElement) -> bool:
-            return CommentType.MEMBERS in save_comments_types and bool(
-                comment_element.find_elements(By.ID, "custom-badge")
+            # Threads without a link might not have finished loading, so start from the first one next time
+            # to look at them again.
+            first_unresolved = next(
+                (i for i, thread in enumerate(threads) if not thread["link"]), None
+            )
+            self.threads_scanned = start + (
+                first_unresolved if first_unresolved is not None else len(threads)
             )
 
-        comments_saved = 0
-        no_new_comments_counter = 0
+            if start + len(threads) > num_described:
+                num_described = start + len(threads)
+            else:
+                if num_described == 0:
+                    return
 
-        while True:
-            for comment_element, link in comments:
-                if not (
-                    (CommentType.ALL in save_comments_types)
-                    or is_creator(comment_element)
-                    or is_hearted(comment_element)
-                    or is_pinned(comment_element)
-                    or is_members(comment_element)
-                ):
+                no_new_comments_counter += 1
+                if no_new_comments_counter >= 5:
+                    break
+
+            for thread in threads:
+                link = thread["link"]
+                if not link or link in seen_comments:
+                    continue
+
+                seen_comments.add(link)
+                if not self.__should_save_comment(thread):
                     continue
 
-                if (
-                    self.max_comments is not None
-                    and comments_saved >= self.max_comments
-                ):
+                if self.__at_max_comments():
                     return
 
-                scroll_to_element(comment_element, self.driver)
-                seen_comments.add(link)
-                comment = build_comment(comment_element, link)
-                # print(comment.__dict__)
-                comments_saved += 1
-                comment.save(self.output_dir, self.url)
+                scroll_to_element(thread["element"], self.driver)
+                self.__save_comment(thread)
+
+            if self.save_replies and not self.__save_replies(threads):
+                return
 
-            self.driver.execute_script("window.scrollBy(0, 500);")
+            if only_pinned:
+                return
+
+            if scan_limit is not None and num_described >= scan_limit:
+                return
+
+            # Scrolling loads more comments, so pace it like any other request.
+            if self.governor is not None:
+                self.governor.acquire(self.url)
+
+            self.driver.execute_script(SCROLL_COMMENTS_JS)
             time.sleep(LOAD_SLEEP_SECS)
 
-            comments = get_comment_elements()
-            if len(comments) == 0:
-                no_new_comments_counter += 1
+    def __load_replies(self, thread_elements: list, retrying: bool):
+        """
+        Expand the given comment threads' replies (if they aren't already), and keep loading more for as long as
+        there are more to load.
+        """
 
-                if no_new_comments_counter >= 5:
-                    break
+        expanded = self.driver.execute_script(EXPAND_REPLIES_JS, thread_elements)
 
-    def process_post(self) -> Post | None:
+        # If nothing was expanded, there's nothing more to load, unless we're checking on replies that were
+        # still loading.
+        if not expanded and not retrying:
+            return
+
+        for _ in range(MAX_REPLY_CONTINUATIONS):
+            # Loading replies is a request, so pace it like any other.
+            if self.governor is not None:
+                self.governor.acquire(self.url)
+
+            time.sleep(LOAD_SLEEP_SECS)
+            if not self.driver.execute_script(LOAD_MORE_REPLIES_JS, thread_elements):
+                break
+
+    def __save_replies(self, threads: list[dict]) -> bool:
+        """
+        Save the replies to a batch of comment threads. All of the threads are expanded at once, rather than one
+        at a time, and threads whose replies were already saved are skipped. Replies are filtered the same way as
+        other comments. Returns False if we hit the maximum number of comments.
+
+        A thread's replies only count as saved once they've all loaded. Threads whose replies are still loading
+        are checked again a few times before giving up on them.
+        """
+
+        threads = [
+            thread
+            for thread in threads
+            if thread["link"] and thread["link"] not in self.harvested_threads
+        ]
+
+        for attempt in range(MAX_REPLY_ATTEMPTS):
+            if not threads:
+                return True
+
+            thread_elements = [thread["element"] for thread in threads]
+            self.__load_replies(thread_elements, retrying=attempt > 0)
+            reply_groups = self.driver.execute_script(GET_REPLIES_JS, thread_elements)
+
+            still_loading = []
+            for thread, group in zip(threads, reply_groups):
+                for reply in group["replies"]:
+                    link = reply["link"]
+                    if not link or link in self.seen_comments:
+                        continue
+
+                    self.seen_comments.add(link)
+                    if not self.__should_save_comment(reply):
+                        continue
+
+                    if self.__at_max_comments():
+                        return False
+
+                    self.__save_comment(reply, parent_link=thread["link"])
+
+                if group["complete"]:
+                    self.harvested_threads.add(thread["link"])
+                else:
+                    still_loading.append(thread)
+
+            threads = still_loading
+
+        if threads:
+            print(
+                f"warning: not all replies loaded for {len(threads)} comment(s) on `{self.url}`"
+            )
+
+        return True
+
+    def __get_num_comments(
+        self, approximate_num_comments: str | None, needs_tab: bool
+    ) -> str | None:
+        """
+        Get the exact number of comments, which may require opening the post in a new tab.
+        `needs_tab` is whether the post will be opened anyway for something else.
+        """
+
+        num_comments = get_true_comment_count(self.driver)
+
+        # If there are no comments then we must not be in the post link itself.
+        if num_comments is None:
+            # Only open the post in a new tab if we need the exact count or it's needed later on anyway.
+            if not self.fast_comment_count or needs_tab:
+                self.opened_tab = True
+                self.opened_post = self.tab_pool.open(self.url)
+                num_comments = get_true_comment_count(self.driver)
+
+            if num_comments is None and self.fast_comment_count:
+                num_comments = exact_comment_count(approximate_num_comments)
+        else:
+            self.opened_post = self.post
+
+        return num_comments
+
+    def __extract(self):
         post = self.post
         url = self.url
 
+        scroll_to_element(post, self.driver)
+
         post_link = get_post_link(post)
         if post_link is None:
             return
@@ -367,20 +616,12 @@ class PostBuilder:
         text = _get_text(post, links)
         poll = _get_poll(post, self.driver)
 
-        # The following block may require opening things in a new tab.
-        num_comments = get_true_comment_count(self.driver)
-        opened_post: None | WebElement = None
-        opened_tab = False
-
-        # If there are no comments then we must not be in the post link itself.
-        if num_comments is None:
-            opened_post = self.__open_post_in_tab(url)
-            num_comments = get_true_comment_count(self.driver)
-            opened_tab = True
-        else:
-            opened_post = post
+        num_comments = self.__get_num_comments(
+            approximate_num_comments,
+            needs_tab=self.take_screenshots or bool(self.save_comments_types),
+        )
 
-        post = Post(
+        self.built_post = Post(
             url=url,
             text=text,
             links=links,
@@ -395,13 +636,147 @@ class PostBuilder:
             when_archived=str(datetime.now(tz=UTC)),
         )
 
-        post.save(self.output_dir)
+    def __record_seen(self, changed: bool):
+        post_id = get_post_id(self.url)
+        if self.last_seen is not None and post_id is not None:
+            self.last_seen.record(post_id, changed)
+
+    def __persist_metadata(self):
+        assert self.built_post is not None
+        changed = self.built_post.save_metadata(self.storage)
+        self.__record_seen(changed)
+
+    def __fetch_assets(self):
+        assert self.built_post is not None
+        self.built_post.save_images(self.storage, self.governor)
+
+    def __extract_metadata(self):
+        post = self.post
+
+        scroll_to_element(post, self.driver)
+
+        approximate_num_comments = _get_approximate_num_comments(post)
+        num_thumbs_up = _get_likes(post)
+        poll = _get_poll(post, self.driver)
+        num_comments = self.__get_num_comments(
+            approximate_num_comments, needs_tab=False
+        )
+
+        self.refreshed_metadata = {
+            "num_thumbs_up": num_thumbs_up,
+            "num_comments": num_comments,
+            "approximate_num_comments": approximate_num_comments,
+            "poll": poll,
+        }
+
+    def __persist_refreshed_metadata(self):
+        assert self.existing_data is not None and self.refreshed_metadata is not None
+
+        post_id = get_post_id(self.url)
+        assert post_id is not None
+
+        data = refresh_post_data(
+            self.existing_data, self.refreshed_metadata, str(datetime.now(tz=UTC))
+        )
+        if data is not None:
+            self.storage.write_post(post_id, data)
+        self.__record_seen(data is not None)
+
+    def close_opened_tab(self):
+        if self.opened_tab:
+            self.tab_pool.release()
+            self.opened_tab = False
+            self.opened_post = None
+
+    def needs_harvest(self) -> bool:
+        """
+        Whether there's anything to do after extracting the post that needs the browser.
+        """
+
+        return self.take_screenshots or bool(self.save_comments_types)
+
+    def extract(self) -> Post | None:
+        """
+        Extract the post's metadata. Returns None if the post should be skipped.
+        """
+
+        # If extraction fails after opening the post in another tab, go back to the original page
+        # before retrying.
+        self.stages.run(Stage.EXTRACT, self.__extract, on_retry=self.close_opened_tab)
+        return self.built_post
+
+    def persist(self):
+        """
+        Save the extracted metadata (i.e. `post.json`). This doesn't use the browser.
+        """
+
+        self.stages.run(Stage.PERSIST_METADATA, self.__persist_metadata)
+
+    def fetch_assets(self):
+        """
+        Download the post's images. This doesn't use the browser.
+        """
+
+        self.stages.run(Stage.FETCH_ASSETS, self.__fetch_assets)
+
+    def harvest(self):
+        """
+        Take screenshots and save comments, if enabled. The post is opened in a tab if it isn't already.
+        """
 
         if self.take_screenshots:
-            self.__take_screenshots(opened_post)
+            self.stages.run(
+                Stage.SCREENSHOT,
+                self.__take_screenshots,
+                on_retry=self.__reload_opened_post,
+            )
 
         if self.save_comments_types:
-            self.__get_comments()
+            self.stages.run(Stage.COMMENTS, self.__get_comments)
+
+            # Download any new emotes and badges in one go.
+            if self.asset_cache is not None:
+                self.asset_cache.flush()
+
+    def process_post(self) -> Post | None:
+        """
+        Process the post, running each stage that hasn't completed yet. If a stage fails too many
+        times, a `StageFailedError` is raised; calling this again will resume from the failed stage.
+        """
+
+        try:
+            if self.extract() is None:
+                return None
+
+            self.persist()
+            self.fetch_assets()
+            self.harvest()
 
-        if opened_tab and opened_post is not None:
-            close_current_tab(self.driver, self.original_handle)
+            return self.built_post
+        finally:
+            self.close_opened_tab()
+
+    def refresh_metadata(self) -> bool:
+        """
+        Update an already archived post's volatile fields (likes, comment counts, and the poll) without
+        touching its images, screenshots, or comments. Returns False if the post hasn't been archived
+        before, in which case nothing is done.
+        """
+
+        post_id = get_post_id(self.url)
+        if post_id is None:
+            return False
+
+        if self.existing_data is None:
+            self.existing_data = self.storage.read_post(post_id)
+            if self.existing_data is None:
+                return False
+
+        try:
+            self.stages.run(
+                Stage.EXTRACT, self.__extract_metadata, on_retry=self.close_opened_tab
+            )
+            self.stages.run(Stage.PERSIST_METADATA, self.__persist_refreshed_metadata)
+            return True
+        finally:
+            self.close_opened_tab()
@@ -0,0 +1,101 @@
+# Deciding when to restart the browser, since it tends to grow in memory and slow down over long runs.
+
+import statistics
+from collections import deque
+from dataclasses import dataclass
+
+# Returns the page's used JS heap size in bytes, or null if the browser doesn't expose it (e.g. Firefox).
+JS_HEAP_SIZE_JS = """
+return (window.performance && window.performance.memory)
+    ? window.performance.memory.usedJSHeapSize
+    : null;
+"""
+
+
+@dataclass
+class RecyclePolicy:
+    """
+    When to restart the browser. Any limit that is 0 is disabled.
+
+    - `max_posts`: restart after this many posts have been handled by the same browser.
+    - `max_memory_mb`: restart once the feed page's JS heap has grown by this much since the browser was
+      started.
+    - `latency_factor`: restart once the recent median time per post is this many times slower than when
+      the browser was fresh.
+    """
+
+    max_posts: int
+    max_memory_mb: float
+    latency_factor: float
+    latency_window: int = 10
+
+    def is_enabled(self) -> bool:
+        return self.max_posts > 0 or self.max_memory_mb > 0 or self.latency_factor > 0
+
+
+class RecycleMonitor:
+    """
+    Keeps track of how the current browser is doing, to decide when it should be restarted.
+    """
+
+    def __init__(self, policy: RecyclePolicy) -> None:
+        self.policy = policy
+        self.reset()
+
+    def reset(self, memory_mb: float | None = None):
+        """
+        Start tracking a fresh browser, whose page is using `memory_mb` to begin with, if that's known.
+        Otherwise, the first reading from `record_post` is used.
+        """
+
+        self.num_posts = 0
+        self.baseline_memory_mb = memory_mb
+        self.memory_mb = memory_mb
+        self.baseline: list[float] = []
+        self.recent: deque[float] = deque(maxlen=max(1, self.policy.latency_window))
+
+    def record_post(self, duration_secs: float, memory_mb: float | None = None):
+        self.num_posts += 1
+        if memory_mb is not None:
+            if self.baseline_memory_mb is None:
+                self.baseline_memory_mb = memory_mb
+            self.memory_mb = memory_mb
+
+        if len(self.baseline) < self.policy.latency_window:
+            self.baseline.append(duration_secs)
+        else:
+            self.recent.append(duration_secs)
+
+    def should_recycle(self) -> str | None:
+        """
+        Return the reason the browser should be restarted, or None if it's fine.
+        """
+
+        policy = self.policy
+
+        if policy.max_posts > 0 and self.num_posts >= policy.max_posts:
+            return f"handled {self.num_posts} posts"
+
+        if (
+            policy.max_memory_mb > 0
+            and self.memory_mb is not None
+            and self.baseline_memory_mb is not None
+        ):
+            growth = self.memory_mb - self.baseline_memory_mb
+            if growth >= policy.max_memory_mb:
+                return f"page memory grew by {growth:.0f} MB"
+
+        if (
+            policy.latency_factor > 0
+            and self.baseline
+            and len(self.recent) == self.recent.maxlen
+        ):
+            # Medians, so that the odd slow post (e.g. one with a lot of images) doesn't skew things.
+            baseline = statistics.median(self.baseline)
+            recent = statistics.median(self.recent)
+            if baseline > 0 and recent >= baseline * policy.latency_factor:
+                return (
+                    f"posts are taking {recent:.1f}s vs. {baseline:.1f}s at the start"
+                )
+
+        return None
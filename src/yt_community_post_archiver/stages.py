@@ -0,0 +1,117 @@
+import time
+from dataclasses import dataclass
+from enum import Enum, unique
+from typing import Callable
+
+
+@unique
+class Stage(Enum):
+    """
+    The stages of processing a post. Each stage is retried separately.
+    """
+
+    EXTRACT = 1
+    PERSIST_METADATA = 2
+    FETCH_ASSETS = 3
+    SCREENSHOT = 4
+    COMMENTS = 5
+
+    def __str__(self) -> str:
+        return self.name.lower()
+
+
+@dataclass
+class RetryPolicy:
+    """
+    How many times to try a stage, and how long to wait in between attempts. The wait time
+    is multiplied by `backoff_multiplier` after each failed attempt.
+    """
+
+    max_attempts: int
+    backoff_secs: float
+    backoff_multiplier: float = 2.0
+
+    def delay(self, attempt: int) -> float:
+        """
+        How long to wait after the given (1-indexed) failed attempt.
+        """
+
+        return self.backoff_secs * (self.backoff_multiplier ** (attempt - 1))
+
+
+DEFAULT_RETRY_POLICIES = {
+    Stage.EXTRACT: RetryPolicy(max_attempts=3, backoff_secs=1),
+    Stage.PERSIST_METADATA: RetryPolicy(max_attempts=3, backoff_secs=0.5),
+    Stage.FETCH_ASSETS: RetryPolicy(max_attempts=5, backoff_secs=1),
+    Stage.SCREENSHOT: RetryPolicy(max_attempts=3, backoff_secs=1),
+    Stage.COMMENTS: RetryPolicy(max_attempts=3, backoff_secs=2),
+}
+
+
+class StageFailedError(Exception):
+    """
+    Raised when a stage has failed too many times.
+    """
+
+    def __init__(self, stage: Stage, attempts: int, cause: Exception) -> None:
+        super().__init__(
+            f"stage `{stage}` failed after {attempts} attempt(s) - {cause}"
+        )
+        self.stage = stage
+        self.attempts = attempts
+        self.cause = cause
+
+
+class StageTracker:
+    """
+    Runs stages with their own retry policies, and keeps track of which stages have completed
+    so they aren't run again.
+    """
+
+    def __init__(
+        self,
+        policies: dict[Stage, RetryPolicy] | None = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.policies = policies if policies is not None else DEFAULT_RETRY_POLICIES
+        self.completed: set[Stage] = set()
+        self.sleep = sleep
+
+    def is_done(self, stage: Stage) -> bool:
+        return stage in self.completed
+
+    def run(
+        self,
+        stage: Stage,
+        fn: Callable[[], None],
+        on_retry: Callable[[], None] | None = None,
+    ):
+        """
+        Run `fn` for the given stage if it hasn't already completed, retrying as per the stage's policy.
+        `on_retry` is called before each retry, if set.
+        """
+
+        if self.is_done(stage):
+            return
+
+        policy = self.policies[stage]
+        attempts = 0
+
+        while True:
+            try:
+                if attempts > 0 and on_retry is not None:
+                    on_retry()
+
+                fn()
+                self.completed.add(stage)
+                return
+            except SystemExit:
+                raise SystemExit
+            except Exception as ex:
+                attempts += 1
+
+                if attempts >= policy.max_attempts:
+                    raise StageFailedError(stage, attempts, ex) from ex
+
+                print(f"warning: stage `{stage}` failed (attempt {attempts}) - {ex}")
+                self.sleep(policy.delay(attempts))
@@ -0,0 +1,541 @@
+# Where and how archived data is stored. Everything that writes out archived data (posts, images,
+# screenshots, comments) should go through an `ArchiveStorage`.
+
+import hashlib
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Iterator
+
+from yt_community_post_archiver.arguments import DirectoryLayout, OutputFormat
+from yt_community_post_archiver.asset_cache import ASSET_CACHE_ID, INDEX_FILE_NAME
+
+SQLITE_FILE_NAME = "archive.sqlite3"
+
+# How many hex characters of the post ID's hash to use as the shard name in the sharded layout. Two
+# characters gives 256 shards, or about 400 posts per shard for a 100k post archive.
+SHARD_PREFIX_LENGTH = 2
+
+
+def to_json(data: Any) -> str:
+    """
+    Serialize archived data the same way regardless of the storage backend.
+    """
+
+    return json.dumps(
+        data,
+        ensure_ascii=False,
+        indent=4,
+        default=lambda o: o.__dict__,
+        skipkeys=True,
+    )
+
+
+# Fields that change every time a record is saved, or just as time passes, without the record itself changing.
+# They're ignored when checking whether a record needs to be written again.
+VOLATILE_TIMESTAMP_FIELDS = ("when_archived", "relative_date")
+
+
+# Fields that are only added when a post's metadata is refreshed (see `refresh_post_data`), so a full save of
+# the post doesn't have them. They're carried over from the saved post rather than being dropped.
+REFRESH_FIELDS = ("when_refreshed", "history")
+
+
+def _with_refresh_fields(existing: dict | None, data: Any) -> Any:
+    """
+    Add any refresh fields from an already saved post to `data`, if it doesn't have them.
+    """
+
+    if existing is None or not any(field in existing for field in REFRESH_FIELDS):
+        return data
+
+    new = json.loads(to_json(data))
+    if not isinstance(new, dict):
+        return data
+
+    for field in REFRESH_FIELDS:
+        if field in existing and field not in new:
+            new[field] = existing[field]
+
+    return new
+
+
+def _is_unchanged(existing: dict | None, data: Any) -> bool:
+    """
+    Whether `data` is the same as an already saved record, other than its timestamps.
+    """
+
+    if existing is None:
+        return False
+
+    new = json.loads(to_json(data))
+    if not isinstance(new, dict):
+        return existing == new
+
+    def strip(record: dict) -> dict:
+        return {
+            key: value
+            for key, value in record.items()
+            if key not in VOLATILE_TIMESTAMP_FIELDS
+        }
+
+    return strip(existing) == strip(new)
+
+
+class ArchiveStorage(ABC):
+    """
+    The base class for storage backends.
+    """
+
+    @abstractmethod
+    def has_post(self, post_id: str) -> bool: ...
+
+    @abstractmethod
+    def read_post(self, post_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def write_post(self, post_id: str, data: Any): ...
+
+    def write_post_if_changed(self, post_id: str, data: Any) -> bool:
+        """
+        Write a post, unless it's the same as what's already saved (other than its timestamps), in which case
+        the saved post is left untouched. Returns whether it was written. The saved post's refresh history is
+        kept either way.
+        """
+
+        try:
+            existing = self.read_post(post_id)
+        except ValueError:
+            # Whatever's saved is broken, so replace it.
+            existing = None
+
+        data = _with_refresh_fields(existing, data)
+        if _is_unchanged(existing, data):
+            return False
+
+        self.write_post(post_id, data)
+        return True
+
+    @abstractmethod
+    def has_asset(self, post_id: str, prefix: str) -> bool:
+        """
+        Whether an asset (e.g. an image) whose name starts with `prefix` exists for the post.
+        """
+
+    @abstractmethod
+    def read_asset(self, post_id: str, name: str) -> bytes | None: ...
+
+    @abstractmethod
+    def write_asset(self, post_id: str, name: str, data: bytes): ...
+
+    @abstractmethod
+    def delete_asset(self, post_id: str, name: str): ...
+
+    @abstractmethod
+    def read_comment(self, post_id: str, comment_id: str) -> dict | None: ...
+
+    @abstractmethod
+    def write_comment(self, post_id: str, comment_id: str, data: Any): ...
+
+    def write_comment_if_changed(
+        self, post_id: str, comment_id: str, data: Any
+    ) -> bool:
+        """
+        Like `write_post_if_changed`, but for comments.
+        """
+
+        try:
+            existing = self.read_comment(post_id, comment_id)
+        except ValueError:
+            existing = None
+
+        if _is_unchanged(existing, data):
+            return False
+
+        self.write_comment(post_id, comment_id, data)
+        return True
+
+    @abstractmethod
+    def iter_post_ids(self) -> Iterator[str]: ...
+
+    @abstractmethod
+    def iter_assets(self, post_id: str) -> Iterator[tuple[str, bytes]]: ...
+
+    @abstractmethod
+    def iter_comments(self, post_id: str) -> Iterator[tuple[str, str]]:
+        """
+        Iterate over the post's comments as (comment ID, JSON) pairs.
+        """
+
+    def close(self):
+        pass
+
+
+def shard_name(post_id: str) -> str:
+    return hashlib.sha1(post_id.encode("utf-8")).hexdigest()[:SHARD_PREFIX_LENGTH]
+
+
+def is_shard_dir(name: str) -> bool:
+    return len(name) == SHARD_PREFIX_LENGTH and all(
+        c in "0123456789abcdef" for c in name
+    )
+
+
+def post_dir_for(
+    output_dir: str, post_id: str, layout: DirectoryLayout = DirectoryLayout.FLAT
+) -> Path:
+    """
+    The directory a post is stored in, for the given layout. The asset cache is always directly in the output
+    directory.
+    """
+
+    if post_id == ASSET_CACHE_ID:
+        return Path(os.path.join(output_dir, post_id))
+
+    match layout:
+        case DirectoryLayout.FLAT:
+            return Path(os.path.join(output_dir, post_id))
+        case DirectoryLayout.SHARDED:
+            return Path(os.path.join(output_dir, shard_name(post_id), post_id))
+        case _:
+            raise Exception("Unsupported directory layout!")
+
+
+def find_post_dirs(output_dir: str) -> Iterator[Path]:
+    """
+    Find every post directory in the output directory, regardless of the layout used.
+    """
+
+    if not os.path.isdir(output_dir):
+        return
+
+    for entry in os.scandir(output_dir):
+        if not entry.is_dir():
+            continue
+
+        if os.path.exists(os.path.join(entry.path, "post.json")):
+            yield Path(entry.path)
+        elif is_shard_dir(entry.name):
+            for shard_entry in os.scandir(entry.path):
+                if shard_entry.is_dir():
+                    yield Path(shard_entry.path)
+
+
+class DirectoryStorage(ArchiveStorage):
+    """
+    A directory per post containing `post.json`, images, and a `comments/` directory. Post directories are
+    either directly in the output directory, or grouped into shards depending on the layout.
+    """
+
+    def __init__(
+        self, output_dir: str, layout: DirectoryLayout = DirectoryLayout.FLAT
+    ) -> None:
+        self.output_dir = output_dir
+        self.layout = layout
+
+    def post_dir(self, post_id: str) -> Path:
+        return post_dir_for(self.output_dir, post_id, self.layout)
+
+    def __make_dir(self, dir: Path):
+        if not dir.exists():
+            try:
+                dir.mkdir(parents=True, exist_ok=True)
+            except Exception as ex:
+                print(f"err: couldn't make directory at {dir} - {ex}")
+                raise ex
+
+    def has_post(self, post_id: str) -> bool:
+        return self.post_dir(post_id).exists()
+
+    def read_post(self, post_id: str) -> dict | None:
+        data_path = self.post_dir(post_id) / "post.json"
+        if not data_path.exists():
+            return None
+
+        with open(data_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_post(self, post_id: str, data: Any):
+        dir = self.post_dir(post_id)
+        self.__make_dir(dir)
+
+        data_path = dir / "post.json"
+        with open(data_path, "w", encoding="utf-8") as f:
+            f.write(to_json(data))
+
+    def has_asset(self, post_id: str, prefix: str) -> bool:
+        return any(self.post_dir(post_id).glob(f"{prefix}*"))
+
+    def read_asset(self, post_id: str, name: str) -> bytes | None:
+        path = self.post_dir(post_id) / name
+        if not path.exists():
+            return None
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    def write_asset(self, post_id: str, name: str, data: bytes):
+        dir = self.post_dir(post_id)
+        self.__make_dir(dir)
+
+        with open(dir / name, "wb") as f:
+            f.write(data)
+
+    def delete_asset(self, post_id: str, name: str):
+        (self.post_dir(post_id) / name).unlink(missing_ok=True)
+
+    def read_comment(self, post_id: str, comment_id: str) -> dict | None:
+        comment_path = self.post_dir(post_id) / "comments" / f"{comment_id}.json"
+        if not comment_path.exists():
+            return None
+
+        with open(comment_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def write_comment(self, post_id: str, comment_id: str, data: Any):
+        comment_dir = self.post_dir(post_id) / "comments"
+        self.__make_dir(comment_dir)
+
+        with open(comment_dir / f"{comment_id}.json", "w", encoding="utf-8") as f:
+            f.write(to_json(data))
+
+    def iter_post_ids(self) -> Iterator[str]:
+        for dir in find_post_dirs(self.output_dir):
+            if dir == self.post_dir(dir.name) and (dir / "post.json").exists():
+                yield dir.name
+
+    def iter_assets(self, post_id: str) -> Iterator[tuple[str, bytes]]:
+        for entry in os.scandir(self.post_dir(post_id)):
+            if entry.is_file() and entry.name != "post.json":
+                with open(entry.path, "rb") as f:
+                    yield (entry.name, f.read())
+
+    def iter_comments(self, post_id: str) -> Iterator[tuple[str, str]]:
+        comment_dir = self.post_dir(post_id) / "comments"
+        if not comment_dir.is_dir():
+            return
+
+        for entry in os.scandir(comment_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                with open(entry.path, encoding="utf-8") as f:
+                    yield (entry.name.removesuffix(".json"), f.read())
+
+
+class SqliteStorage(ArchiveStorage):
+    """
+    Stores everything in a single SQLite database, with images and screenshots as blobs. Writes are
+    committed as they happen, so a killed run only loses what it was in the middle of writing.
+    """
+
+    def __init__(self, path: str) -> None:
+        import sqlite3
+
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS posts (post_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS assets (post_id TEXT NOT NULL, name TEXT NOT NULL, data BLOB NOT NULL, "
+            "PRIMARY KEY (post_id, name))"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS comments (post_id TEXT NOT NULL, comment_id TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (post_id, comment_id))"
+        )
+
+    def __query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self.lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def has_post(self, post_id: str) -> bool:
+        return bool(self.__query("SELECT 1 FROM posts WHERE post_id = ?", (post_id,)))
+
+    def read_post(self, post_id: str) -> dict | None:
+        rows = self.__query("SELECT data FROM posts WHERE post_id = ?", (post_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def write_post(self, post_id: str, data: Any):
+        self.__query(
+            "INSERT OR REPLACE INTO posts (post_id, data) VALUES (?, ?)",
+            (post_id, to_json(data)),
+        )
+
+    def has_asset(self, post_id: str, prefix: str) -> bool:
+        return bool(
+            self.__query(
+                "SELECT 1 FROM assets WHERE post_id = ? AND substr(name, 1, ?) = ?",
+                (post_id, len(prefix), prefix),
+            )
+        )
+
+    def read_asset(self, post_id: str, name: str) -> bytes | None:
+        rows = self.__query(
+            "SELECT data FROM assets WHERE post_id = ? AND name = ?", (post_id, name)
+        )
+        return rows[0][0] if rows else None
+
+    def write_asset(self, post_id: str, name: str, data: bytes):
+        self.__query(
+            "INSERT OR REPLACE INTO assets (post_id, name, data) VALUES (?, ?, ?)",
+            (post_id, name, data),
+        )
+
+    def delete_asset(self, post_id: str, name: str):
+        self.__query(
+            "DELETE FROM assets WHERE post_id = ? AND name = ?", (post_id, name)
+        )
+
+    def read_comment(self, post_id: str, comment_id: str) -> dict | None:
+        rows = self.__query(
+            "SELECT data FROM comments WHERE post_id = ? AND comment_id = ?",
+            (post_id, comment_id),
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def write_comment(self, post_id: str, comment_id: str, data: Any):
+        self.__query(
+            "INSERT OR REPLACE INTO comments (post_id, comment_id, data) VALUES (?, ?, ?)",
+            (post_id, comment_id, to_json(data)),
+        )
+
+    def iter_post_ids(self) -> Iterator[str]:
+        for (post_id,) in self.__query("SELECT post_id FROM posts ORDER BY post_id"):
+            yield post_id
+
+    def iter_assets(self, post_id: str) -> Iterator[tuple[str, bytes]]:
+        for name, data in self.__query(
+            "SELECT name, data FROM assets WHERE post_id = ? ORDER BY name", (post_id,)
+        ):
+            yield (name, data)
+
+    def iter_comments(self, post_id: str) -> Iterator[tuple[str, str]]:
+        for comment_id, data in self.__query(
+            "SELECT comment_id, data FROM comments WHERE post_id = ? ORDER BY comment_id",
+            (post_id,),
+        ):
+            yield (comment_id, data)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class MemoryStorage(ArchiveStorage):
+    """
+    Keeps everything in memory, for when archived data is used directly rather than saved (see `api.py`).
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.posts: dict[str, str] = {}
+        self.assets: dict[str, dict[str, bytes]] = {}
+        self.comments: dict[str, dict[str, str]] = {}
+
+    def has_post(self, post_id: str) -> bool:
+        return post_id in self.posts
+
+    def read_post(self, post_id: str) -> dict | None:
+        data = self.posts.get(post_id)
+        return json.loads(data) if data is not None else None
+
+    def write_post(self, post_id: str, data: Any):
+        with self.lock:
+            self.posts[post_id] = to_json(data)
+
+    def has_asset(self, post_id: str, prefix: str) -> bool:
+        return any(name.startswith(prefix) for name in self.assets.get(post_id, {}))
+
+    def read_asset(self, post_id: str, name: str) -> bytes | None:
+        return self.assets.get(post_id, {}).get(name)
+
+    def write_asset(self, post_id: str, name: str, data: bytes):
+        with self.lock:
+            self.assets.setdefault(post_id, {})[name] = data
+
+    def delete_asset(self, post_id: str, name: str):
+        with self.lock:
+            self.assets.get(post_id, {}).pop(name, None)
+
+    def read_comment(self, post_id: str, comment_id: str) -> dict | None:
+        data = self.comments.get(post_id, {}).get(comment_id)
+        return json.loads(data) if data is not None else None
+
+    def write_comment(self, post_id: str, comment_id: str, data: Any):
+        with self.lock:
+            self.comments.setdefault(post_id, {})[comment_id] = to_json(data)
+
+    def iter_post_ids(self) -> Iterator[str]:
+        yield from sorted(self.posts)
+
+    def iter_assets(self, post_id: str) -> Iterator[tuple[str, bytes]]:
+        yield from sorted(self.assets.get(post_id, {}).items())
+
+    def iter_comments(self, post_id: str) -> Iterator[tuple[str, str]]:
+        yield from sorted(self.comments.get(post_id, {}).items())
+
+    def discard(self, post_id: str):
+        """
+        Forget everything about a post, once it's no longer needed.
+        """
+
+        with self.lock:
+            self.posts.pop(post_id, None)
+            self.assets.pop(post_id, None)
+            self.comments.pop(post_id, None)
+
+
+def open_storage(
+    output_dir: str,
+    output_format: OutputFormat,
+    layout: DirectoryLayout = DirectoryLayout.FLAT,
+) -> ArchiveStorage:
+    """
+    Open the storage backend for the given output directory and format.
+    """
+
+    Path(os.path.abspath(output_dir)).mkdir(parents=True, exist_ok=True)
+
+    match output_format:
+        case OutputFormat.DIRECTORY:
+            return DirectoryStorage(output_dir, layout)
+        case OutputFormat.SQLITE:
+            return SqliteStorage(os.path.join(output_dir, SQLITE_FILE_NAME))
+        case _:
+            raise Exception("Unsupported output format!")
+
+
+def export_archive(source: ArchiveStorage, destination: ArchiveStorage) -> int:
+    """
+    Copy everything from one storage backend to another, including the asset cache. Returns the number of posts
+    copied.
+    """
+
+    if source.has_asset(ASSET_CACHE_ID, INDEX_FILE_NAME):
+        for name, asset in source.iter_assets(ASSET_CACHE_ID):
+            destination.write_asset(ASSET_CACHE_ID, name, asset)
+
+    num_posts = 0
+
+    for post_id in source.iter_post_ids():
+        data = source.read_post(post_id)
+        if data is None:
+            continue
+
+        destination.write_post(post_id, data)
+
+        for name, asset in source.iter_assets(post_id):
+            destination.write_asset(post_id, name, asset)
+
+        for comment_id, comment in source.iter_comments(post_id):
+            destination.write_comment(post_id, comment_id, json.loads(comment))
+
+        num_posts += 1
+
+    return num_posts
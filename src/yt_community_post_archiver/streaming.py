@@ -0,0 +1,151 @@
+# Streaming archived records out as newline-delimited JSON as they're saved, so other programs can consume the
+# archive in real time instead of scanning the output directory.
+
+import hashlib
+import json
+import socket
+import sys
+import threading
+from typing import Any, Iterator, TextIO
+
+from yt_community_post_archiver.storage import ArchiveStorage, DirectoryStorage
+
+
+def open_record_stream(target: str) -> TextIO:
+    """
+    Open where records should be streamed to:
+
+    - `-` for stdout. It's up to the caller to keep anything else from being printed there (the command line
+      prints everything else to stderr instead).
+    - `tcp://HOST:PORT` or `unix:///path/to/socket` to connect to a socket.
+    - Anything else is a path to a file or named pipe, which is appended to.
+    """
+
+    if target == "-":
+        return sys.__stdout__
+
+    if target.startswith("tcp://"):
+        host, _, port = target.removeprefix("tcp://").rpartition(":")
+        connection = socket.create_connection((host, int(port)))
+        return connection.makefile("w", encoding="utf-8")
+
+    if target.startswith("unix://"):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(target.removeprefix("unix://"))
+        return connection.makefile("w", encoding="utf-8")
+
+    return open(target, "a", encoding="utf-8")
+
+
+class StreamingStorage(ArchiveStorage):
+    """
+    Wraps another storage backend, and also writes a JSON line to a stream for every post, comment, and asset
+    that's saved. Assets are streamed as their hash and size (and path, if saved to a directory) rather than
+    their contents.
+
+    Records are streamed even if the wrapped backend skips writing them because they haven't changed, so the
+    stream has everything that was archived.
+
+    If the stream breaks, streaming stops but archiving carries on.
+    """
+
+    def __init__(self, inner: ArchiveStorage, stream: TextIO) -> None:
+        self.inner = inner
+        self.stream: TextIO | None = stream
+        self.lock = threading.Lock()
+
+    def __emit(self, record: dict[str, Any]):
+        line = json.dumps(
+            record, ensure_ascii=False, default=lambda o: o.__dict__, skipkeys=True
+        )
+
+        with self.lock:
+            if self.stream is None:
+                return
+
+            try:
+                self.stream.write(line + "\n")
+                self.stream.flush()
+            except Exception as ex:
+                print(f"warning: stopped streaming records as the stream broke - {ex}")
+                self.stream = None
+
+    def has_post(self, post_id: str) -> bool:
+        return self.inner.has_post(post_id)
+
+    def read_post(self, post_id: str) -> dict | None:
+        return self.inner.read_post(post_id)
+
+    def write_post(self, post_id: str, data: Any):
+        self.inner.write_post(post_id, data)
+        self.__emit({"type": "post", "post_id": post_id, "data": data})
+
+    def write_post_if_changed(self, post_id: str, data: Any) -> bool:
+        written = self.inner.write_post_if_changed(post_id, data)
+        self.__emit({"type": "post", "post_id": post_id, "data": data})
+        return written
+
+    def has_asset(self, post_id: str, prefix: str) -> bool:
+        return self.inner.has_asset(post_id, prefix)
+
+    def read_asset(self, post_id: str, name: str) -> bytes | None:
+        return self.inner.read_asset(post_id, name)
+
+    def write_asset(self, post_id: str, name: str, data: bytes):
+        self.inner.write_asset(post_id, name, data)
+
+        path = (
+            str(self.inner.post_dir(post_id) / name)
+            if isinstance(self.inner, DirectoryStorage)
+            else None
+        )
+        self.__emit(
+            {
+                "type": "asset",
+                "post_id": post_id,
+                "name": name,
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "size": len(data),
+                "path": path,
+            }
+        )
+
+    def delete_asset(self, post_id: str, name: str):
+        self.inner.delete_asset(post_id, name)
+
+    def read_comment(self, post_id: str, comment_id: str) -> dict | None:
+        return self.inner.read_comment(post_id, comment_id)
+
+    def __emit_comment(self, post_id: str, comment_id: str, data: Any):
+        self.__emit(
+            {
+                "type": "comment",
+                "post_id": post_id,
+                "comment_id": comment_id,
+                "data": data,
+            }
+        )
+
+    def write_comment(self, post_id: str, comment_id: str, data: Any):
+        self.inner.write_comment(post_id, comment_id, data)
+        self.__emit_comment(post_id, comment_id, data)
+
+    def write_comment_if_changed(
+        self, post_id: str, comment_id: str, data: Any
+    ) -> bool:
+        written = self.inner.write_comment_if_changed(post_id, comment_id, data)
+        self.__emit_comment(post_id, comment_id, data)
+        return written
+
+    def iter_post_ids(self) -> Iterator[str]:
+        return self.inner.iter_post_ids()
+
+    def iter_assets(self, post_id: str) -> Iterator[tuple[str, bytes]]:
+        return self.inner.iter_assets(post_id)
+
+    def iter_comments(self, post_id: str) -> Iterator[tuple[str, str]]:
+        return self.inner.iter_comments(post_id)
+
+    def close(self):
+        # The stream is owned by whoever opened it, as it may outlive this storage (e.g. with `--rerun`).
+        self.inner.close()
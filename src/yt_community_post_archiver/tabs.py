@@ -0,0 +1,184 @@
+import time
+from dataclasses import dataclass
+
+from selenium.webdriver.chrome.webdriver import WebDriver as ChromeWebDriver
+from selenium.webdriver.firefox.webdriver import WebDriver as FirefoxWebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from yt_community_post_archiver.blocking import ResourceBlocklist
+from yt_community_post_archiver.governor import RateGovernor, ThrottledError
+from yt_community_post_archiver.helpers import (
+    LOAD_SLEEP_SECS,
+    apply_resource_blocking,
+    find_post_element,
+    get_true_comment_count,
+    is_throttled_page,
+    navigate,
+)
+
+# Starts loading a page without waiting for it to finish loading, unlike `driver.get`.
+START_LOADING_JS = "window.location.assign(arguments[0]);"
+
+# How long to wait for a post to show up on an opened page.
+POST_LOAD_TIMEOUT_SECS = 10
+
+# How often to check if a page is ready.
+POLL_INTERVAL_SECS = 0.1
+
+# Enough tabs for the post being processed, the next post being prefetched, and one spare to load into.
+DEFAULT_POOL_SIZE = 3
+
+
+@dataclass
+class DetailTab:
+    handle: str
+    url: str | None = None
+    last_used: float = 0
+    # Whether the tab was prefetched and hasn't been opened since, in which case it's kept until it is.
+    prefetched: bool = False
+
+
+class DetailTabPool:
+    """
+    A small pool of tabs used for opening individual posts. Tabs are reused rather than being created and closed
+    for each post, and a post can be prefetched in a spare tab so it loads while another post is being processed.
+    """
+
+    def __init__(
+        self,
+        driver: ChromeWebDriver | FirefoxWebDriver,
+        original_handle: str,
+        size: int = DEFAULT_POOL_SIZE,
+        blocklist: ResourceBlocklist | None = None,
+        governor: RateGovernor | None = None,
+    ) -> None:
+        self.driver = driver
+        self.original_handle = original_handle
+        self.size = max(1, size)
+        self.blocklist = blocklist
+        self.governor = governor
+        self.tabs: list[DetailTab] = []
+        self.active: DetailTab | None = None
+
+    def __spare_tab(self) -> DetailTab:
+        """
+        Get a tab that isn't in use, creating one if the pool isn't full yet. Otherwise, the least
+        recently used tab is recycled. Tabs waiting to be opened after being prefetched are only recycled
+        if there's nothing else left, which only happens if prefetched posts were never opened.
+        """
+
+        candidates = [tab for tab in self.tabs if tab is not self.active]
+        if len(self.tabs) >= self.size:
+            candidates = [tab for tab in candidates if not tab.prefetched] or candidates
+
+        if len(self.tabs) < self.size or not candidates:
+            self.driver.switch_to.new_window("tab")
+            apply_resource_blocking(self.driver, self.blocklist)
+
+            tab = DetailTab(handle=self.driver.current_window_handle)
+            self.tabs.append(tab)
+            return tab
+
+        tab = min(candidates, key=lambda t: t.last_used)
+        self.driver.switch_to.window(tab.handle)
+        return tab
+
+    def __find_tab(self, url: str) -> DetailTab | None:
+        return next((tab for tab in self.tabs if tab.url == url), None)
+
+    def prefetch(self, url: str):
+        """
+        Start loading the URL in a spare tab, without waiting for it to load. This switches back to the
+        original tab afterwards.
+        """
+
+        tab = self.__find_tab(url)
+        if tab is not None:
+            # It's already loaded, so just make sure it's kept around.
+            if tab is not self.active:
+                tab.prefetched = True
+            return
+
+        if self.governor is not None:
+            self.governor.acquire(url)
+
+        tab = self.__spare_tab()
+        tab.url = url
+        tab.last_used = time.monotonic()
+        tab.prefetched = True
+        self.driver.execute_script(START_LOADING_JS, url)
+
+        self.driver.switch_to.window(self.original_handle)
+
+    def open(self, url: str, reload: bool = False) -> WebElement | None:
+        """
+        Switch to a tab with the URL loaded, and return the post element. If the URL was prefetched, this only
+        waits for it to finish loading.
+        """
+
+        tab = self.__find_tab(url)
+
+        if tab is None or reload:
+            tab = tab or self.__spare_tab()
+            self.driver.switch_to.window(tab.handle)
+            tab.url = url
+            navigate(self.driver, url, self.governor)
+        else:
+            self.driver.switch_to.window(tab.handle)
+
+            if is_throttled_page(self.driver):
+                tab.url = None
+                if self.governor is not None:
+                    self.governor.penalize(url, "captcha page")
+                raise ThrottledError(f"hit a captcha page when loading `{url}`")
+
+        tab.last_used = time.monotonic()
+        tab.prefetched = False
+        self.active = tab
+
+        return self.__wait_for_post()
+
+    def __wait_for_post(self) -> WebElement | None:
+        deadline = time.monotonic() + POST_LOAD_TIMEOUT_SECS
+        post = find_post_element(self.driver)
+        while post is None and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL_SECS)
+            post = find_post_element(self.driver)
+
+        if post is None:
+            return None
+
+        # The comment count loads in after the post, so give it a bit of time as well. Not every post has
+        # comments enabled though, so don't wait too long.
+        deadline = time.monotonic() + LOAD_SLEEP_SECS
+        while (
+            get_true_comment_count(self.driver) is None and time.monotonic() < deadline
+        ):
+            time.sleep(POLL_INTERVAL_SECS)
+
+        return post
+
+    def release(self):
+        """
+        Go back to the original tab, leaving the current tab open to be reused.
+        """
+
+        if self.active is not None:
+            self.active = None
+            self.driver.switch_to.window(self.original_handle)
+
+    def close(self):
+        """
+        Close all tabs in the pool.
+        """
+
+        for tab in self.tabs:
+            try:
+                self.driver.switch_to.window(tab.handle)
+                self.driver.close()
+            except Exception as ex:
+                print(f"warning: couldn't close tab - {ex}")
+
+        self.tabs = []
+        self.active = None
+        self.driver.switch_to.window(self.original_handle)
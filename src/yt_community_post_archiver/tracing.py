@@ -0,0 +1,177 @@
+# Opt-in tracing of WebDriver commands, to see which calls are costing the most round trips.
+
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+_THIS_FILE = os.path.abspath(__file__)
+
+# How many rows to show in the summary table.
+SUMMARY_ROWS = 30
+
+
+@dataclass
+class TraceEvent:
+    name: str
+    category: str
+    start_secs: float
+    duration_secs: float
+    caller: str | None
+    post: str | None
+
+
+def _is_internal_frame(filename: str) -> bool:
+    filename = os.path.abspath(filename)
+    return filename == _THIS_FILE or f"{os.sep}selenium{os.sep}" in filename
+
+
+def _find_caller() -> str:
+    """
+    Find the first function up the stack that isn't part of Selenium or the tracer itself.
+    """
+
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if not _is_internal_frame(code.co_filename):
+            module = frame.f_globals.get("__name__", "?").rsplit(".", 1)[-1]
+            return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+        frame = frame.f_back
+
+    return "unknown"
+
+
+class WebDriverTracer:
+    """
+    Counts and times every WebDriver command sent by a driver, attributing each one to the function that
+    (indirectly) sent it and to the post being processed at the time.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.start = clock()
+        self.events: list[TraceEvent] = []
+        self.current_post: str | None = None
+
+    def attach(self, driver: Any):
+        """
+        Start tracing a driver. Every command (including those sent by elements) goes through `driver.execute`,
+        so that's what gets wrapped.
+        """
+
+        original_execute = driver.execute
+
+        def traced_execute(driver_command: str, params: dict | None = None):
+            start = self.clock()
+            try:
+                return original_execute(driver_command, params)
+            finally:
+                self.record(
+                    driver_command,
+                    "webdriver",
+                    start,
+                    self.clock() - start,
+                    _find_caller(),
+                )
+
+        driver.execute = traced_execute
+
+    def record(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        duration: float,
+        caller: str | None = None,
+    ):
+        self.events.append(
+            TraceEvent(
+                name=name,
+                category=category,
+                start_secs=start - self.start,
+                duration_secs=duration,
+                caller=caller,
+                post=self.current_post,
+            )
+        )
+
+    @contextmanager
+    def post(self, post_id: str | None) -> Iterator[None]:
+        """
+        Attribute commands sent within this block to a post.
+        """
+
+        previous = self.current_post
+        self.current_post = post_id
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(post_id or "unknown", "post", start, self.clock() - start)
+            self.current_post = previous
+
+    def summary(self) -> list[tuple[str, str, int, float]]:
+        """
+        Return (command, caller, count, total seconds) rows, sorted by total time.
+        """
+
+        totals: dict[tuple[str, str], list[float]] = defaultdict(lambda: [0, 0.0])
+        for event in self.events:
+            if event.category != "webdriver":
+                continue
+
+            total = totals[(event.name, event.caller or "unknown")]
+            total[0] += 1
+            total[1] += event.duration_secs
+
+        return sorted(
+            (
+                (command, caller, int(count), secs)
+                for (command, caller), (count, secs) in totals.items()
+            ),
+            key=lambda row: row[3],
+            reverse=True,
+        )
+
+    def print_summary(self):
+        rows = self.summary()
+        num_commands = sum(row[2] for row in rows)
+        total_secs = sum(row[3] for row in rows)
+
+        print(
+            f"WebDriver commands: {num_commands} in {total_secs:.2f}s (showing the top {min(len(rows), SUMMARY_ROWS)})"
+        )
+        print(f"{'count':>8} {'total ms':>10} {'mean ms':>9}  {'command':<24} caller")
+        for command, caller, count, secs in rows[:SUMMARY_ROWS]:
+            print(
+                f"{count:>8} {secs * 1000:>10.1f} {secs * 1000 / count:>9.2f}  {command:<24} {caller}"
+            )
+
+    def write_chrome_trace(self, path: str):
+        """
+        Write the trace in the Chrome trace event format, which can be opened in `chrome://tracing`,
+        Perfetto, or speedscope.
+        """
+
+        trace_events = [
+            {
+                "name": event.name,
+                "cat": event.category,
+                "ph": "X",
+                "ts": event.start_secs * 1_000_000,
+                "dur": event.duration_secs * 1_000_000,
+                "pid": 1,
+                "tid": 1,
+                "args": {"caller": event.caller, "post": event.post},
+            }
+            for event in self.events
+        ]
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events}, f)
@@ -0,0 +1,447 @@
+import argparse
+import io
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+from yt_community_post_archiver.arguments import DirectoryLayout
+from yt_community_post_archiver.dead_letter import (
+    DEAD_LETTER_FILE_NAME,
+    DeadLetterQueue,
+)
+from yt_community_post_archiver.storage import (
+    SQLITE_FILE_NAME,
+    ArchiveStorage,
+    DirectoryStorage,
+    SqliteStorage,
+    find_post_dirs,
+)
+
+# `filetype` only looks at the start of a file, so that's all that needs to be read to check what it is.
+HEAD_SIZE = 261
+
+# Enough of the end of a file to check that it wasn't cut off.
+TAIL_SIZE = 16
+
+# How many posts each worker process is handed at a time.
+BATCH_SIZE = 256
+
+POST_URL_PREFIX = "https://www.youtube.com/post/"
+
+
+def _create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="yt-community-post-archiver verify",
+        description="Checks an archive for corrupt or missing posts and images.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+
+    parser.add_argument(
+        "output_dir",
+        type=str,
+        help=f"The archive to check; either an output directory, or one containing `{SQLITE_FILE_NAME}`.",
+    )
+    parser.add_argument(
+        "--decode",
+        action="store_true",
+        help="Also fully decode every image to check it isn't corrupt. This is much slower, as every image has to be read in full.",
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help=f"Download broken or missing images again. Posts whose `post.json` is broken are added to `{DEAD_LETTER_FILE_NAME}`, so they can be archived again with `--retry-failed`.",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        required=False,
+        default=os.cpu_count() or 4,
+        help="How many processes to check posts with.",
+    )
+
+    return parser
+
+
+@dataclass
+class Problem:
+    post_id: str
+    # The file with the problem, i.e. `post.json` or an image.
+    name: str
+    issue: str
+    # For images that can be downloaded again, which of the post's images this is.
+    image_index: int | None = None
+
+
+@dataclass
+class AssetInfo:
+    name: str
+    size: int
+    head: bytes
+    tail: bytes
+
+
+def check_image(info: AssetInfo) -> str | None:
+    """
+    Check that an image is actually an image, and that it wasn't cut off, from just the start and end of it.
+    Returns what's wrong with it, if anything.
+    """
+
+    import filetype
+
+    if info.size == 0:
+        return "is empty"
+
+    kind = filetype.guess(info.head)
+    if kind is None or not kind.mime.startswith("image/"):
+        if info.head.lstrip()[:15].lower().startswith((b"<!doctype", b"<html")):
+            return "is an HTML page, not an image"
+        return "is not an image"
+
+    match kind.extension:
+        case "jpg":
+            complete = info.tail.rstrip(b"\x00\r\n").endswith(b"\xff\xd9")
+        case "png":
+            complete = info.tail.endswith(b"IEND\xaeB`\x82")
+        case "gif":
+            complete = info.tail.endswith(b";")
+        case "webp":
+            complete = int.from_bytes(info.head[4:8], "little") + 8 == info.size
+        case _:
+            complete = True
+
+    return None if complete else f"is a truncated {kind.extension}"
+
+
+def decode_image(data: bytes) -> str | None:
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+    except Exception as ex:
+        return f"couldn't be decoded - {ex}"
+
+    return None
+
+
+def _image_index(post_id: str, name: str) -> int | None:
+    stem = name.rsplit(".", 1)[0]
+    index = stem.removeprefix(f"{post_id}-")
+    return int(index) if index != stem and index.isdigit() else None
+
+
+def verify_post(
+    post_id: str,
+    post_json: bytes | None,
+    assets: list[AssetInfo],
+    read_asset: Callable[[str], bytes] | None = None,
+) -> list[Problem]:
+    """
+    Check a post's `post.json` and images. If `read_asset` is given, images are also fully decoded.
+    """
+
+    if post_json is None:
+        return [Problem(post_id, "post.json", "is missing")]
+
+    try:
+        data = json.loads(post_json)
+    except ValueError as ex:
+        return [Problem(post_id, "post.json", f"is not valid JSON - {ex}")]
+
+    if not isinstance(data, dict) or not isinstance(data.get("images"), list):
+        return [Problem(post_id, "post.json", "doesn't have a list of images")]
+
+    problems = []
+    num_images = len(data["images"])
+    found: set[int] = set()
+
+    for info in assets:
+        if info.name == "screenshot.png":
+            index = None
+        elif (index := _image_index(post_id, info.name)) is None:
+            continue
+        elif index >= num_images:
+            problems.append(
+                Problem(post_id, info.name, f"is extra; the post has {num_images}")
+            )
+            continue
+        elif index in found:
+            problems.append(
+                Problem(post_id, info.name, f"is a duplicate of image {index}")
+            )
+            continue
+        else:
+            found.add(index)
+
+        issue = check_image(info)
+        if issue is None and read_asset is not None:
+            issue = decode_image(read_asset(info.name))
+
+        if issue is not None:
+            problems.append(Problem(post_id, info.name, issue, index))
+
+    for index in range(num_images):
+        if index not in found:
+            problems.append(
+                Problem(post_id, f"{post_id}-{index}.*", "is missing", index)
+            )
+
+    return problems
+
+
+def _read_file_info(path: str, size: int) -> AssetInfo:
+    with open(path, "rb") as f:
+        head = f.read(HEAD_SIZE)
+        if size > HEAD_SIZE:
+            f.seek(max(size - TAIL_SIZE, HEAD_SIZE))
+            tail = (head + f.read())[-TAIL_SIZE:]
+        else:
+            tail = head[-TAIL_SIZE:]
+
+    return AssetInfo(os.path.basename(path), size, head, tail)
+
+
+def _verify_post_dir(post_dir: str, decode: bool) -> list[Problem]:
+    post_id = os.path.basename(post_dir)
+
+    try:
+        with open(os.path.join(post_dir, "post.json"), "rb") as f:
+            post_json: bytes | None = f.read()
+    except FileNotFoundError:
+        post_json = None
+
+    assets = [
+        _read_file_info(entry.path, entry.stat().st_size)
+        for entry in os.scandir(post_dir)
+        if entry.is_file() and entry.name != "post.json"
+    ]
+
+    def read_asset(name: str) -> bytes:
+        with open(os.path.join(post_dir, name), "rb") as f:
+            return f.read()
+
+    return verify_post(post_id, post_json, assets, read_asset if decode else None)
+
+
+# Each worker process opens its own connection to a SQLite archive.
+_connection: sqlite3.Connection | None = None
+
+
+def _verify_sqlite_post(path: str, post_id: str, decode: bool) -> list[Problem]:
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    connection = _connection
+    row = connection.execute(
+        "SELECT data FROM posts WHERE post_id = ?", (post_id,)
+    ).fetchone()
+    post_json = row[0].encode("utf-8") if row is not None else None
+
+    # Only the start and end of each image are read, unless they're being decoded.
+    assets = [
+        AssetInfo(name, size, head, tail)
+        for name, size, head, tail in connection.execute(
+            "SELECT name, length(data), substr(data, 1, ?), substr(data, -?) FROM assets WHERE post_id = ?",
+            (HEAD_SIZE, TAIL_SIZE, post_id),
+        )
+    ]
+
+    def read_asset(name: str) -> bytes:
+        return connection.execute(
+            "SELECT data FROM assets WHERE post_id = ? AND name = ?", (post_id, name)
+        ).fetchone()[0]
+
+    return verify_post(post_id, post_json, assets, read_asset if decode else None)
+
+
+def _verify_batch(location: str, keys: list[str], decode: bool) -> list[Problem]:
+    """
+    Check a batch of posts in a worker process. For a SQLite archive, `location` is the database and `keys`
+    are post IDs; otherwise, `keys` are post directories.
+    """
+
+    problems = []
+    for key in keys:
+        if location.endswith(SQLITE_FILE_NAME):
+            problems.extend(_verify_sqlite_post(location, key, decode))
+        else:
+            problems.extend(_verify_post_dir(key, decode))
+
+    return problems
+
+
+def _batches(keys: Iterator[str], size: int) -> Iterator[list[str]]:
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) == size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def verify_archive(
+    output_dir: str, decode: bool = False, jobs: int = 4
+) -> tuple[int, list[Problem]]:
+    """
+    Check every post in an archive, spread over several processes. Returns how many posts were checked, and
+    the problems found.
+    """
+
+    sqlite_path = os.path.join(output_dir, SQLITE_FILE_NAME)
+    if os.path.exists(sqlite_path):
+        source = SqliteStorage(sqlite_path)
+        try:
+            keys = list(source.iter_post_ids())
+        finally:
+            source.close()
+        location = sqlite_path
+    else:
+        keys = [str(post_dir) for post_dir in find_post_dirs(output_dir)]
+        location = output_dir
+
+    batches = list(_batches(iter(keys), BATCH_SIZE))
+    problems: list[Problem] = []
+
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as executor:
+        for batch_problems in executor.map(
+            _verify_batch,
+            [location] * len(batches),
+            batches,
+            [decode] * len(batches),
+        ):
+            problems.extend(batch_problems)
+
+    return len(keys), problems
+
+
+def _storage_for(output_dir: str, post_id: str) -> ArchiveStorage:
+    sqlite_path = os.path.join(output_dir, SQLITE_FILE_NAME)
+    if os.path.exists(sqlite_path):
+        return SqliteStorage(sqlite_path)
+
+    layout = (
+        DirectoryLayout.FLAT
+        if (Path(output_dir) / post_id).is_dir()
+        else DirectoryLayout.SHARDED
+    )
+    return DirectoryStorage(output_dir, layout)
+
+
+def _repair_images(output_dir: str, problems: list[Problem], fetcher: Callable) -> int:
+    """
+    Download a post's broken or missing images again. All of a post's images are repaired together, so two
+    repairs never touch the same post at once.
+    """
+
+    import filetype
+
+    post_id = problems[0].post_id
+    num_fixed = 0
+
+    storage = _storage_for(output_dir, post_id)
+    try:
+        data = storage.read_post(post_id) or {}
+
+        for problem in problems:
+            assert problem.image_index is not None
+            url = data["images"][problem.image_index]
+
+            try:
+                image = fetcher(url, None)
+            except Exception as ex:
+                print(f"err: couldn't download `{url}` again - {ex}")
+                continue
+
+            kind = filetype.guess(image)
+            info = AssetInfo("", len(image), image[:HEAD_SIZE], image[-TAIL_SIZE:])
+            if kind is None or check_image(info) is not None:
+                print(f"err: `{url}` is still broken after downloading it again")
+                continue
+
+            # Missing images have nothing to replace.
+            prefix = f"{post_id}-{problem.image_index}."
+            if storage.has_asset(post_id, prefix):
+                storage.delete_asset(post_id, problem.name)
+
+            storage.write_asset(post_id, f"{prefix}{kind.extension}", image)
+            num_fixed += 1
+    finally:
+        storage.close()
+
+    return num_fixed
+
+
+def repair_archive(
+    output_dir: str, problems: list[Problem], fetcher: Callable | None = None
+) -> int:
+    """
+    Fix what can be fixed without a browser: broken or missing images are downloaded again, and posts with a
+    broken `post.json` are queued to be archived again with `--retry-failed`. Returns how many problems were
+    fixed or queued.
+    """
+
+    if fetcher is None:
+        from yt_community_post_archiver.governor import fetch
+
+        fetcher = fetch
+
+    dead_letters = DeadLetterQueue(os.path.join(output_dir, DEAD_LETTER_FILE_NAME))
+    num_fixed = 0
+
+    image_problems: dict[str, list[Problem]] = {}
+    for problem in problems:
+        if problem.name == "post.json":
+            dead_letters.record(
+                POST_URL_PREFIX + problem.post_id,
+                f"post.json {problem.issue}",
+                "verify",
+            )
+            num_fixed += 1
+        elif problem.image_index is not None:
+            image_problems.setdefault(problem.post_id, []).append(problem)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        num_fixed += sum(
+            executor.map(
+                lambda post_problems: _repair_images(
+                    output_dir, post_problems, fetcher
+                ),
+                image_problems.values(),
+            )
+        )
+
+    return num_fixed
+
+
+def main(argv: list[str]):
+    args = _create_parser().parse_args(argv)
+
+    if not os.path.isdir(args.output_dir):
+        print(f"err: no archive found at {args.output_dir}")
+        sys.exit(1)
+
+    num_posts, problems = verify_archive(args.output_dir, args.decode, args.jobs)
+
+    for problem in problems:
+        print(f"{problem.post_id}: {problem.name} {problem.issue}")
+
+    num_broken = len({problem.post_id for problem in problems})
+    print(
+        f"Checked {num_posts} post(s); found {len(problems)} problem(s) in {num_broken} post(s)."
+    )
+
+    if args.repair and problems:
+        num_fixed = repair_archive(args.output_dir, problems)
+        print(f"Repaired or queued {num_fixed} of {len(problems)} problem(s).")
+    elif problems:
+        sys.exit(1)
@@ -0,0 +1,308 @@
+"""
+An in-memory stand-in for a Selenium WebDriver, for testing how the archiver behaves on large feeds and
+comment sections without a browser. Only the parts of the WebDriver and WebElement interfaces that the
+archiver uses are implemented.
+
+Posts can also be opened in their own tabs. Every URL loaded, in any tab, is recorded in `loaded_urls`.
+
+The feed has `num_posts` posts, and loads `feed_batch_size` more each time it's scrolled to the end. A post's
+comment section works the same way with `threads` and `comment_batch_size`. Every WebDriver command can be
+slowed down with `latency_secs`, and posts can be made to fail a number of times before they work with
+`flaky_posts`. The date shown for each post comes from `post_date`, and each post has `images_per_post` images.
+
+A comment thread's replies (its `replies`) load `reply_batch_size` at a time once it's expanded, and only show up
+after being checked for `reply_delay` times, to mimic replies that take a while to load.
+"""
+
+import time
+from collections import Counter
+from typing import Callable
+
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.webdriver.common.by import By
+
+from yt_community_post_archiver import archiver, post_builder, tabs
+
+POST_URL = "https://www.youtube.com/post/Ugkx{:06d}"
+FEED_URL = "https://www.youtube.com/@fake/posts"
+
+
+class FakeElement:
+    def __init__(
+        self,
+        driver: "FakeWebDriver",
+        text: str = "",
+        children: dict[tuple[str, str], list] | None = None,
+        **attributes,
+    ):
+        self.driver = driver
+        self.id = str(id(self))
+        self.text = text
+        self.children = children or {}
+        self.attributes = attributes
+
+    def get_attribute(self, name: str):
+        self.driver.command("get_attribute")
+        return self.attributes.get(name)
+
+    def find_elements(self, by: str = By.ID, value: str | None = None) -> list:
+        self.driver.command("find_elements")
+        return self.children.get((by, value), [])
+
+    def click(self):
+        self.driver.command("click")
+
+
+class FakePost(FakeElement):
+    def __init__(self, driver: "FakeWebDriver", index: int):
+        super().__init__(driver)
+        self.index = index
+        self.url = POST_URL.format(index)
+        self.link = FakeElement(driver, text=driver.post_date(index), href=self.url)
+        self.content = FakeElement(driver, innerText=f"post {index}")
+        # The first image is always the channel's avatar.
+        self.images = [
+            FakeElement(driver, src=f"https://yt3.ggpht.com/{name}=s88")
+            for name in ["avatar"]
+            + [f"post-{index}-{i}" for i in range(driver.images_per_post)]
+        ]
+
+    def find_elements(self, by: str = By.ID, value: str | None = None) -> list:
+        self.driver.command("find_elements")
+
+        if by == By.TAG_NAME and value == "a":
+            self.driver.calls["post_links"] += 1
+            return [self.link]
+
+        # Anything other than finding the post's link is part of extracting it.
+        failures_left = self.driver.flaky_posts.get(self.index, 0)
+        if failures_left > 0:
+            self.driver.flaky_posts[self.index] = failures_left - 1
+            raise StaleElementReferenceException(f"post {self.index} went stale")
+
+        if by == By.ID and value == "content":
+            return [self.content]
+
+        if by == By.TAG_NAME and value == "img" and self.driver.images_per_post:
+            return list(self.images)
+
+        return []
+
+
+class _SwitchTo:
+    def __init__(self, driver: "FakeWebDriver"):
+        self.driver = driver
+
+    def window(self, handle: str):
+        self.driver.command("switch_to.window")
+        self.driver.current_window_handle = handle
+
+    def new_window(self, type_hint: str | None = None):
+        self.driver.command("switch_to.new_window")
+        handle = f"tab-{len(self.driver.urls)}"
+        self.driver.window_handles.append(handle)
+        self.driver.urls[handle] = ""
+        self.driver.current_window_handle = handle
+
+
+class FakeWebDriver:
+    def __init__(
+        self,
+        num_posts: int = 0,
+        feed_batch_size: int = 10,
+        threads: list[dict] | None = None,
+        comment_batch_size: int = 20,
+        latency_secs: float = 0.0,
+        flaky_posts: dict[int, int] | None = None,
+        post_date: Callable[[int], str] = lambda _index: "1 day ago",
+        reply_batch_size: int = 10,
+        reply_delay: int = 0,
+        images_per_post: int = 0,
+    ):
+        self.num_posts = num_posts
+        self.feed_batch_size = feed_batch_size
+        self.threads = threads or []
+        self.comment_batch_size = comment_batch_size
+        self.latency_secs = latency_secs
+        self.flaky_posts = dict(flaky_posts or {})
+        self.post_date = post_date
+        self.reply_batch_size = reply_batch_size
+        self.reply_delay = reply_delay
+        self.images_per_post = images_per_post
+
+        # How many times each command was run.
+        self.calls: Counter[str] = Counter()
+
+        self.posts: list[FakePost] = []
+        self.loaded_threads = comment_batch_size
+        # For each expanded thread, how many replies have loaded and how many more checks until they show up.
+        self.loaded_replies: dict[int, list[int]] = {}
+        self.loaded_urls: list[str] = []
+        self.current_window_handle = "feed"
+        self.window_handles = ["feed"]
+        self.urls = {"feed": ""}
+        self.switch_to = _SwitchTo(self)
+
+    def command(self, name: str):
+        self.calls[name] += 1
+        if self.latency_secs:
+            time.sleep(self.latency_secs)
+
+    def __load_posts(self, count: int):
+        start = len(self.posts)
+        end = min(start + count, self.num_posts)
+        self.posts.extend(FakePost(self, i) for i in range(start, end))
+
+    @property
+    def current_url(self) -> str:
+        return self.urls[self.current_window_handle]
+
+    def __load(self, url: str):
+        self.urls[self.current_window_handle] = url
+        self.loaded_urls.append(url)
+
+        if self.current_window_handle == "feed":
+            self.posts = []
+            self.__load_posts(self.feed_batch_size)
+
+    def __opened_post(self) -> FakePost | None:
+        """
+        The post loaded in the current tab, if it's one of the posts' own tabs rather than the feed.
+        """
+
+        if self.current_window_handle == "feed" or not self.current_url:
+            return None
+        return FakePost(self, int(self.current_url[-6:]))
+
+    def get(self, url: str):
+        self.command("get")
+        self.__load(url)
+
+    def find_elements(self, by: str = By.ID, value: str | None = None) -> list:
+        self.command("find_elements")
+
+        opened_post = self.__opened_post()
+
+        if by == By.ID and value == "post":
+            return [opened_post] if opened_post is not None else list(self.posts)
+
+        if by == By.TAG_NAME and value == "ytd-comments" and opened_post is not None:
+            count = FakeElement(self, text=f"{len(self.threads)} Comments")
+            return [FakeElement(self, children={(By.ID, "count"): [count]})]
+
+        return []
+
+    def execute(self, command: str, params: dict | None = None) -> dict:
+        # Used by `ActionChains`.
+        self.command(command)
+        return {"value": None}
+
+    def execute_script(self, script: str, *args):
+        self.command("execute_script")
+
+        if script == tabs.START_LOADING_JS:
+            self.__load(args[0])
+            return None
+
+        if script == archiver.FEED_STATE_JS:
+            return [len(self.posts), len(self.posts) < self.num_posts]
+
+        if script == archiver.SCROLL_TO_FEED_END_JS:
+            self.calls["feed_scrolls"] += 1
+            self.__load_posts(self.feed_batch_size)
+            return None
+
+        if script == archiver.DESCRIBE_FEED_POSTS_JS:
+            return [
+                {"url": post.url, "relative_date": post.link.text, "is_members": False}
+                for post in self.posts[args[0] :]
+            ]
+
+        if script == post_builder.DESCRIBE_THREADS_JS:
+            described = self.threads[args[0] : self.loaded_threads]
+            self.calls["threads_described"] += len(described)
+            return described
+
+        if script == post_builder.EXPAND_REPLIES_JS:
+            return self.__expand_replies(args[0])
+
+        if script == post_builder.LOAD_MORE_REPLIES_JS:
+            return self.__load_more_replies(args[0])
+
+        if script == post_builder.GET_REPLIES_JS:
+            return [self.__get_replies(element) for element in args[0]]
+
+        if script == post_builder.SCROLL_COMMENTS_JS:
+            self.calls["scroll_comments"] += 1
+            self.loaded_threads += self.comment_batch_size
+            return None
+
+        return None
+
+    def __thread(self, element: int) -> dict:
+        return next(thread for thread in self.threads if thread["element"] == element)
+
+    def __expand_replies(self, elements: list[int]) -> int:
+        clicked = 0
+        for element in elements:
+            if (
+                self.__thread(element).get("replies")
+                and element not in self.loaded_replies
+            ):
+                first_batch = 0 if self.reply_delay else self.reply_batch_size
+                self.loaded_replies[element] = [first_batch, self.reply_delay]
+                clicked += 1
+        return clicked
+
+    def __load_more_replies(self, elements: list[int]) -> int:
+        clicked = 0
+        for element in elements:
+            loaded = self.loaded_replies.get(element)
+            if loaded and 0 < loaded[0] < len(self.__thread(element)["replies"]):
+                loaded[0] += self.reply_batch_size
+                clicked += 1
+        return clicked
+
+    def __get_replies(self, element: int) -> dict:
+        replies = self.__thread(element).get("replies") or []
+        loaded = self.loaded_replies.get(element)
+        if loaded is None:
+            return {"replies": [], "complete": not replies}
+
+        if loaded[0] == 0:
+            if loaded[1] > 0:
+                loaded[1] -= 1
+            else:
+                loaded[0] = self.reply_batch_size
+
+        shown = replies[: loaded[0]]
+        return {"replies": shown, "complete": len(shown) == len(replies)}
+
+    def set_window_size(self, width: int, height: int):
+        pass
+
+    def add_cookie(self, cookie: dict):
+        pass
+
+    def close(self):
+        self.command("close")
+        self.window_handles.remove(self.current_window_handle)
+
+    def quit(self):
+        self.command("quit")
+
+
+def make_thread(i: int, **badges) -> dict:
+    """
+    What `DESCRIBE_THREADS_JS` returns for a comment thread.
+    """
+
+    return {
+        "element": i,
+        "link": f"{POST_URL.format(0)}?lc={i}",
+        "creator": False,
+        "hearted": False,
+        "pinned": False,
+        "members": False,
+        **badges,
+    }
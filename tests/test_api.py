@@ -0,0 +1,103 @@
+import sys
+
+import pytest
+
+import yt_community_post_archiver
+from yt_community_post_archiver.api import ScrapedPost, iter_posts, make_settings
+
+URL = "https://www.youtube.com/@IRyS/posts"
+SMILE = "https://yt3.ggpht.com/smile=w24-h24"
+
+
+def test_make_settings_uses_command_line_defaults():
+    settings = make_settings(URL, "--max-posts", "5", "--save-comments", "all")
+
+    assert settings.url == URL
+    assert settings.max_posts == 5
+    assert settings.headless
+    assert not settings.save_replies
+    assert settings.rate_limit == 0
+
+
+def test_make_settings_raises_on_invalid_arguments():
+    with pytest.raises(ValueError, match="--since must be before --until"):
+        make_settings(URL, "--since", "1d", "--until", "30d")
+
+    with pytest.raises(ValueError):
+        make_settings(URL, "--max-posts", "lots")
+
+
+def test_make_settings_leaves_stdout_alone():
+    stdout = sys.stdout
+    settings = make_settings(URL, "--list-only", "--stream-ndjson", "-")
+
+    assert settings.list_only == "-"
+    assert sys.stdout is stdout
+
+
+def test_api_is_exported_lazily():
+    assert yt_community_post_archiver.ScrapedPost is ScrapedPost
+
+
+def test_iter_posts_without_persisting(tmp_path, monkeypatch):
+    pytest.importorskip("selenium")
+
+    from fake_webdriver import FEED_URL, FakeWebDriver, make_thread
+
+    from yt_community_post_archiver import (
+        archiver,
+        asset_cache,
+        helpers,
+        post,
+        post_builder,
+        tabs,
+    )
+    from yt_community_post_archiver.comment import Comment
+
+    for module in [archiver, helpers, post_builder, tabs]:
+        monkeypatch.setattr(module, "LOAD_SLEEP_SECS", 0)
+    monkeypatch.setattr(archiver, "END_OF_FEED_GRACE_SECS", 0)
+    monkeypatch.setattr(post, "fetch", lambda url, _governor: url.encode())
+    monkeypatch.setattr(asset_cache, "fetch", lambda url, _governor: url.encode())
+    monkeypatch.setattr(post_builder, "scroll_to_element", lambda *_args: None)
+    monkeypatch.setattr(
+        post_builder,
+        "build_comment",
+        lambda element, link, cache, *_args: Comment(
+            author=None,
+            relative_date=None,
+            member_length=None,
+            likes=None,
+            is_hearted=False,
+            is_pinned=False,
+            contents=f"comment {element}",
+            replies=None,
+            link=link,
+            when_archived="now",
+            emotes={":smile:": cache.register(SMILE, "emote", ":smile:")},
+        ),
+    )
+    monkeypatch.chdir(tmp_path)
+
+    driver = FakeWebDriver(
+        num_posts=5, threads=[make_thread(i) for i in range(3)], images_per_post=2
+    )
+    settings = make_settings(FEED_URL, "--save-comments", "all", "--cache-emotes")
+    scraped = list(iter_posts(FEED_URL, settings, driver=driver))
+
+    assert [result.post.text for result in scraped] == [f"post {i}" for i in range(5)]
+    for result in scraped:
+        assert [comment.contents for comment in result.comments] == [
+            f"comment {i}" for i in range(3)
+        ]
+        assert len(result.post.images) == 2
+        assert sorted(result.assets.values()) == sorted(
+            url.encode() for url in result.post.images
+        )
+        assert list(result.cached_assets.values()) == [
+            b"https://yt3.ggpht.com/smile=s0"
+        ]
+
+    # Nothing was written to disk, and the browser was left running.
+    assert list(tmp_path.iterdir()) == []
+    assert driver.calls["quit"] == 0
@@ -0,0 +1,303 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from fake_webdriver import FEED_URL, POST_URL, FakeWebDriver  # noqa: E402
+from selenium.common.exceptions import TimeoutException  # noqa: E402
+
+from yt_community_post_archiver import archiver, helpers, stages  # noqa: E402
+from yt_community_post_archiver.api import make_settings  # noqa: E402
+from yt_community_post_archiver.archiver import RESUME_OVERLAP_POSTS  # noqa: E402
+from yt_community_post_archiver.archiver import Archiver  # noqa: E402
+from yt_community_post_archiver.recycling import (  # noqa: E402
+    RecycleMonitor,
+    RecyclePolicy,
+)
+from yt_community_post_archiver.stages import RetryPolicy, Stage  # noqa: E402
+from yt_community_post_archiver.storage import MemoryStorage  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(archiver, "LOAD_SLEEP_SECS", 0)
+    monkeypatch.setattr(helpers, "LOAD_SLEEP_SECS", 0)
+    monkeypatch.setattr(archiver, "END_OF_FEED_GRACE_SECS", 0)
+    for stage, policy in stages.DEFAULT_RETRY_POLICIES.items():
+        monkeypatch.setitem(
+            stages.DEFAULT_RETRY_POLICIES,
+            stage,
+            RetryPolicy(policy.max_attempts, backoff_secs=0),
+        )
+
+
+def _archive(
+    driver: FakeWebDriver,
+    *args: str,
+    storage: MemoryStorage | None = None,
+    fast_comment_count: bool = True,
+) -> tuple[Archiver, MemoryStorage]:
+    if fast_comment_count:
+        args = ("--fast-comment-count", *args)
+    settings = make_settings(FEED_URL, *args)
+    storage = storage or MemoryStorage()
+
+    with Archiver(settings, driver=driver, storage=storage) as archiver:  # type: ignore
+        archiver.scrape()
+
+    return archiver, storage
+
+
+def test_whole_feed_is_archived():
+    driver = FakeWebDriver(num_posts=250, feed_batch_size=10)
+    archiver, storage = _archive(driver)
+
+    assert len(list(storage.iter_post_ids())) == 250
+    assert storage.read_post("Ugkx000042")["text"] == "post 42"
+    assert len(archiver.seen) == 250
+
+
+def test_feed_is_only_scanned_once():
+    # Each post should only be looked at a fixed number of times, rather than every post being looked at
+    # again after each scroll.
+    def num_commands(num_posts: int) -> int:
+        driver = FakeWebDriver(num_posts=num_posts, feed_batch_size=10)
+        _archive(driver)
+        return driver.calls.total()
+
+    assert num_commands(2000) <= 2 * num_commands(1000) + 10
+
+
+def test_prefetched_posts_are_only_loaded_once():
+    # Without `--fast-comment-count`, each post is opened in its own tab, and the next one is prefetched.
+    driver = FakeWebDriver(num_posts=30)
+    _, storage = _archive(driver, fast_comment_count=False)
+
+    assert len(list(storage.iter_post_ids())) == 30
+    post_loads = [url for url in driver.loaded_urls if url != FEED_URL]
+    assert sorted(post_loads) == [POST_URL.format(i) for i in range(30)]
+
+    # Posts are prefetched from what's loaded in the feed, so only the first post in each batch of 10 is
+    # loaded directly; every other post was prefetched.
+    assert driver.calls["get"] == driver.loaded_urls.count(FEED_URL) + 3
+
+    # The tabs opened for posts are closed afterwards, as the browser isn't ours.
+    assert driver.window_handles == ["feed"]
+    assert driver.current_window_handle == "feed"
+    assert driver.calls["quit"] == 0
+
+
+def test_restarted_browser_picks_up_where_it_left_off():
+    def archive(restart_after: int) -> tuple[int, MemoryStorage]:
+        first = FakeWebDriver(num_posts=100, feed_batch_size=10)
+        second = FakeWebDriver(num_posts=100, feed_batch_size=10)
+        settings = make_settings(FEED_URL, "--fast-comment-count")
+        storage = MemoryStorage()
+
+        with Archiver(settings, driver=first, storage=storage) as archiver:  # type: ignore
+            # Pretend the browser is ours, so it can be restarted.
+            archiver.recycle_monitor = RecycleMonitor(
+                RecyclePolicy(
+                    max_posts=restart_after, max_memory_mb=0, latency_factor=0
+                )
+            )
+            archiver._Archiver__start_driver = lambda: second  # type: ignore
+            archiver.scrape()
+
+        assert first.calls["quit"] == (1 if restart_after else 0)
+        return first.calls["post_links"] + second.calls["post_links"], storage
+
+    without_restart, _ = archive(restart_after=0)
+    with_restart, storage = archive(restart_after=55)
+
+    assert len(list(storage.iter_post_ids())) == 100
+
+    # The new browser only went back over a few posts before where the old one had got to, rather than
+    # going through the whole feed again.
+    assert with_restart - without_restart <= RESUME_OVERLAP_POSTS + 10
+
+
+def test_fatal_error_leaves_the_browser_running():
+    driver = FakeWebDriver(num_posts=10)
+    settings = make_settings(FEED_URL, "--fast-comment-count")
+
+    with Archiver(settings, driver=driver, storage=MemoryStorage()) as archiver:  # type: ignore
+
+        def broken():
+            raise RuntimeError("broken")
+
+        archiver.find_posts = broken  # type: ignore
+        with pytest.raises(SystemExit):
+            archiver.scrape()
+
+    # It's not ours to quit.
+    assert driver.calls["quit"] == 0
+
+
+def test_retrying_carries_on_when_a_post_does_not_load():
+    driver = FakeWebDriver(num_posts=1)
+    settings = make_settings(FEED_URL, "--fast-comment-count")
+    storage = MemoryStorage()
+    broken_url, working_url = POST_URL.format(1), POST_URL.format(0)
+
+    load = driver.get
+
+    def get(url: str):
+        if url == broken_url:
+            raise TimeoutException(f"timed out loading `{url}`")
+        load(url)
+
+    driver.get = get  # type: ignore
+
+    with Archiver(settings, driver=driver, storage=storage) as archiver:  # type: ignore
+        archiver.dead_letters.record(broken_url, "failed before")
+        archiver.dead_letters.record(working_url, "failed before")
+        archiver.retry_failed()
+
+    assert list(storage.iter_post_ids()) == ["Ugkx000000"]
+    [failed] = archiver.dead_letters.load()
+    assert failed.url == broken_url
+    assert failed.stage == "navigate"
+
+
+def test_rerun_only_records_that_posts_were_seen():
+    storage = MemoryStorage()
+    first, _ = _archive(FakeWebDriver(num_posts=20), storage=storage)
+    second, _ = _archive(
+        FakeWebDriver(num_posts=20, post_date=lambda _index: "2 days ago"),
+        storage=storage,
+    )
+
+    assert all(sighting.changed for sighting in first.last_seen.load().values())
+    sightings = second.last_seen.load()
+    assert len(sightings) == 20
+    assert not any(sighting.changed for sighting in sightings.values())
+    assert storage.read_post("Ugkx000000")["relative_date"] == "1 day ago"
+
+
+def test_max_posts():
+    driver = FakeWebDriver(num_posts=100, feed_batch_size=10)
+    archiver, storage = _archive(driver, "--max-posts", "25")
+
+    assert len(list(storage.iter_post_ids())) == 25
+    assert len(driver.posts) < 100
+
+
+def test_flaky_posts_are_retried():
+    # The extract stage is tried 3 times, so post 3 makes it and post 7 doesn't.
+    driver = FakeWebDriver(num_posts=20, flaky_posts={3: 2, 7: 5})
+    archiver, storage = _archive(driver)
+
+    post_ids = set(storage.iter_post_ids())
+    assert "Ugkx000003" in post_ids
+    assert "Ugkx000007" not in post_ids
+    assert len(post_ids) == 19
+
+    [failed] = archiver.dead_letters.load()
+    assert failed.url == POST_URL.format(7)
+    assert failed.stage == str(Stage.EXTRACT)
+    assert failed.attempts == 3
+
+
+def test_date_range_stops_scrolling():
+    # Post i is i days old, except for an old pinned post at the top.
+    driver = FakeWebDriver(
+        num_posts=1000,
+        post_date=lambda i: "2 years ago" if i == 0 else f"{i} days ago",
+    )
+    archiver, storage = _archive(driver, "--since", "30d", "--until", "10d", "-m", "15")
+
+    post_ids = sorted(storage.iter_post_ids())
+    assert post_ids == [f"Ugkx{i:06d}" for i in range(10, 25)]
+    assert len(driver.posts) <= 40
+
+
+def test_date_range_finds_every_post_in_range():
+    driver = FakeWebDriver(num_posts=1000, post_date=lambda i: f"{i} days ago")
+    archiver, storage = _archive(driver, "--since", "30d", "--until", "10d")
+
+    # Posts are only skipped if they're definitely out of range, so "30 days ago" (which could be up to 31 days
+    # ago) is kept.
+    post_ids = sorted(storage.iter_post_ids())
+    assert post_ids == [f"Ugkx{i:06d}" for i in range(10, 31)]
+    assert len(driver.posts) <= 50
+    assert archiver.passed_since
+
+
+def test_posts_outside_date_range_are_only_checked_once():
+    driver = FakeWebDriver(
+        num_posts=10, post_date=lambda i: "1 day ago" if i < 8 else "2 years ago"
+    )
+    settings = make_settings(
+        FEED_URL, "--fast-comment-count", "--since", "30d", "-m", "3"
+    )
+
+    with Archiver(settings, driver=driver, storage=MemoryStorage()) as archiver:  # type: ignore
+        archiver._Archiver__open_feed()  # type: ignore
+        assert len(archiver.find_posts()) == 8
+        assert archiver.older_posts_in_a_row == 2
+
+        # Looking at the old posts again, e.g. after a restarted browser goes back a bit, doesn't count them
+        # twice.
+        archiver.feed_scanned = 8
+        assert archiver.find_posts() == []
+        assert archiver.older_posts_in_a_row == 2
+        assert not archiver.passed_since
+
+        # Skipped posts don't count towards the maximum.
+        assert not archiver.at_max_posts()
+
+
+def test_posts_outside_date_range_do_not_stop_prefetching():
+    driver = FakeWebDriver(
+        num_posts=20, post_date=lambda i: "1 day ago" if i < 5 else "30 days ago"
+    )
+    _, storage = _archive(driver, "--until", "7d", "-m", "4", fast_comment_count=False)
+
+    assert list(storage.iter_post_ids()) == [f"Ugkx{i:06d}" for i in range(5, 9)]
+    # Only the first post was loaded directly; the rest were prefetched.
+    assert driver.calls["get"] == driver.loaded_urls.count(FEED_URL) + 1
+
+
+def test_list_only():
+    driver = FakeWebDriver(num_posts=500, feed_batch_size=10)
+    settings = make_settings(FEED_URL, "--list-only")
+    stream = io.StringIO()
+
+    with Archiver(settings, driver=driver, storage=MemoryStorage()) as archiver:  # type: ignore
+        archiver.list_posts(stream)
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(records) == 500
+    assert records[42] == {
+        "post_id": "Ugkx000042",
+        "url": POST_URL.format(42),
+        "relative_date": "1 day ago",
+        "is_members": False,
+    }
+
+    # Nothing is looked at post by post.
+    assert driver.calls["get_attribute"] == 0
+    assert driver.calls["execute_script"] < 500
+
+
+def test_work_per_post_does_not_grow_with_the_feed():
+    # Rescanning the whole feed after every scroll made each post cost more the longer the feed got.
+    def per_post(num_posts: int) -> dict[str, float]:
+        driver = FakeWebDriver(num_posts=num_posts, feed_batch_size=10)
+        _archive(driver)
+        return {
+            name: driver.calls[name] / num_posts
+            for name in ["execute_script", "feed_scrolls", "post_links"]
+        }
+
+    small = per_post(1000)
+    large = per_post(10000)
+
+    for name, count in large.items():
+        assert count <= small[name] * 1.01, name
+
+    # One scroll for every batch of posts.
+    assert large["feed_scrolls"] <= 1 / 10 * 1.01
@@ -0,0 +1,93 @@
+import json
+
+from yt_community_post_archiver.asset_cache import (
+    ASSET_CACHE_ID,
+    AssetCache,
+    asset_id_for,
+)
+from yt_community_post_archiver.storage import (
+    DirectoryStorage,
+    SqliteStorage,
+    export_archive,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+
+
+def test_asset_ids_ignore_image_size():
+    assert asset_id_for("https://yt3.ggpht.com/abc=w24-h24-c-k-nd") == asset_id_for(
+        "https://yt3.ggpht.com/abc=w48-h48-c-k-nd"
+    )
+    assert asset_id_for("https://yt3.ggpht.com/abc=w24-h24") != asset_id_for(
+        "https://yt3.ggpht.com/def=w24-h24"
+    )
+
+
+def test_asset_cache_downloads_once(tmp_path):
+    fetched = []
+
+    def fetcher(url, _governor):
+        fetched.append(url)
+        # Two different emotes that happen to be the same image.
+        return PNG
+
+    cache = AssetCache(DirectoryStorage(str(tmp_path)), fetcher=fetcher)
+
+    smile = cache.register("https://yt3.ggpht.com/smile=w24-h24", "emote", ":smile:")
+    assert cache.register("https://yt3.ggpht.com/smile=w48-h48", "emote") == smile
+    grin = cache.register("https://yt3.ggpht.com/grin=w24-h24", "emote", ":grin:")
+    assert not fetched
+
+    cache.flush()
+    assert sorted(fetched) == [
+        "https://yt3.ggpht.com/grin=s0",
+        "https://yt3.ggpht.com/smile=s0",
+    ]
+
+    # Deduplicated by content.
+    assert cache.assets[smile]["file"] == cache.assets[grin]["file"]
+    cache_dir = tmp_path / ASSET_CACHE_ID
+    assert len([p for p in cache_dir.iterdir() if p.suffix == ".png"]) == 1
+    assert cache.read(smile) == PNG
+
+    index = json.loads((cache_dir / "index.json").read_text(encoding="utf-8"))
+    assert index["assets"][smile]["name"] == ":smile:"
+
+    # The cache carries over to later runs.
+    cache = AssetCache(DirectoryStorage(str(tmp_path)), fetcher=fetcher)
+    cache.register("https://yt3.ggpht.com/smile=w24-h24", "emote")
+    cache.flush()
+    assert len(fetched) == 2
+
+
+def test_asset_cache_retries_failed_downloads(tmp_path):
+    def failing_fetcher(_url, _governor):
+        raise Exception("nope")
+
+    cache = AssetCache(DirectoryStorage(str(tmp_path)), fetcher=failing_fetcher)
+    asset_id = cache.register("https://example.com/badge.png", "badge")
+    cache.flush()
+
+    assert asset_id not in cache.assets
+    assert asset_id in cache.pending
+
+    cache.fetcher = lambda _url, _governor: PNG
+    cache.flush()
+    assert asset_id in cache.assets
+
+
+def test_asset_cache_is_saved_with_the_archive(tmp_path):
+    storage = SqliteStorage(str(tmp_path / "archive.sqlite3"))
+    cache = AssetCache(storage, fetcher=lambda _url, _governor: PNG)
+    asset_id = cache.register("https://yt3.ggpht.com/smile=w24-h24", "emote")
+    cache.flush()
+
+    # Everything is in the database, rather than next to it.
+    assert all(p.name.startswith("archive.sqlite3") for p in tmp_path.iterdir())
+    assert AssetCache(storage).read(asset_id) == PNG
+
+    # It's exported along with the posts.
+    unpacked = DirectoryStorage(str(tmp_path / "unpacked"))
+    export_archive(storage, unpacked)
+    assert AssetCache(unpacked).read(asset_id) == PNG
+    storage.close()
@@ -0,0 +1,48 @@
+import importlib.util
+
+
+def _load_module(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec is not None
+    assert spec.loader is not None
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+blocking = _load_module("blocking_module", "src/yt_community_post_archiver/blocking.py")
+
+
+def test_default_blocklist_keeps_images():
+    blocklist = blocking.ResourceBlocklist()
+    urls = blocking.chrome_blocked_urls(blocklist)
+
+    assert "*doubleclick.net*" in urls
+    assert "*fonts.gstatic.com*" in urls
+    assert not any("ggpht" in url or "ytimg" in url for url in urls)
+    assert blocking.chrome_prefs(blocklist) == {}
+    assert "permissions.default.image" not in blocking.firefox_prefs(blocklist)
+
+
+def test_image_blocking():
+    blocklist = blocking.ResourceBlocklist(
+        url_patterns=[], resource_types={blocking.ResourceType.IMAGE}
+    )
+
+    assert "*yt3.ggpht.com/*" in blocking.chrome_blocked_urls(blocklist)
+    assert blocking.chrome_prefs(blocklist) == {
+        "profile.managed_default_content_settings.images": 2
+    }
+    assert blocking.firefox_prefs(blocklist) == {"permissions.default.image": 2}
+
+
+def test_blocked_urls_are_deduplicated():
+    blocklist = blocking.ResourceBlocklist(
+        url_patterns=["*.woff2*", "*example.com*"],
+        resource_types={blocking.ResourceType.FONT},
+    )
+
+    urls = blocking.chrome_blocked_urls(blocklist)
+    assert len(urls) == len(set(urls))
+    assert urls[0] == "*.woff2*"
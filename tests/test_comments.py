@@ -0,0 +1,172 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from fake_webdriver import FakeWebDriver, make_thread  # noqa: E402
+
+from yt_community_post_archiver import post_builder  # noqa: E402
+from yt_community_post_archiver.arguments import CommentType  # noqa: E402
+from yt_community_post_archiver.post_builder import PostBuilder  # noqa: E402
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    saved = []
+
+    class FakeComment:
+        def __init__(self, element) -> None:
+            self.element = element
+
+        def save(self, _storage, _url):
+            saved.append(self.element)
+
+    monkeypatch.setattr(
+        post_builder,
+        "build_comment",
+        lambda element, *_args: FakeComment(element),
+    )
+    monkeypatch.setattr(post_builder, "scroll_to_element", lambda *_args: None)
+    monkeypatch.setattr(post_builder, "LOAD_SLEEP_SECS", 0)
+
+    return saved
+
+
+def _get_comments(
+    driver, types, max_comments=None, comment_scan_limit=0, save_replies=False
+):
+    builder = PostBuilder(
+        driver=driver,  # type: ignore
+        post=None,  # type: ignore
+        url="https://www.youtube.com/post/abc",
+        take_screenshots=False,
+        storage=None,  # type: ignore
+        members=None,
+        save_comments_types=types,
+        max_comments=max_comments,
+        tab_pool=None,  # type: ignore
+        comment_scan_limit=comment_scan_limit,
+        save_replies=save_replies,
+    )
+    builder.opened_post = object()  # type: ignore
+    builder._PostBuilder__get_comments()  # type: ignore
+
+    return builder
+
+
+def test_pinned_only_stops_after_first_batch(saved):
+    driver = FakeWebDriver(
+        threads=[make_thread(0, pinned=True)] + [make_thread(i) for i in range(1, 100)],
+        comment_batch_size=20,
+    )
+    _get_comments(driver, {CommentType.PINNED})
+
+    assert saved == [0]
+    assert driver.calls["scroll_comments"] == 0
+
+
+def test_selective_types_stop_at_scan_limit(saved):
+    driver = FakeWebDriver(
+        threads=[make_thread(i, creator=(i % 4 == 0)) for i in range(100)],
+        comment_batch_size=10,
+    )
+    builder = _get_comments(driver, {CommentType.CREATOR}, comment_scan_limit=30)
+
+    assert saved == [0, 4, 8, 12, 16, 20, 24, 28]
+    assert builder.threads_scanned == 30
+
+
+def test_non_matching_comments_are_not_rescanned(saved):
+    # This used to loop forever, as threads that weren't saved were picked up again after every scroll.
+    driver = FakeWebDriver(
+        threads=[make_thread(i) for i in range(10)], comment_batch_size=5
+    )
+    builder = _get_comments(driver, {CommentType.HEARTED})
+
+    assert saved == []
+    assert builder.threads_scanned == 10
+    assert len(builder.seen_comments) == 10
+
+
+def test_threads_still_loading_are_checked_again(saved):
+    threads = [make_thread(i, creator=True) for i in range(30)]
+    # Thread 5's link hasn't loaded yet the first time it's looked at, and thread 25's never does.
+    link = threads[5]["link"]
+    threads[5]["link"] = threads[25]["link"] = None
+
+    driver = FakeWebDriver(threads=threads, comment_batch_size=10)
+    describe_threads = driver.execute_script
+
+    def execute_script(script, *args):
+        if (
+            script == post_builder.DESCRIBE_THREADS_JS
+            and driver.calls["threads_described"]
+        ):
+            threads[5]["link"] = link
+        return describe_threads(script, *args)
+
+    driver.execute_script = execute_script
+    builder = _get_comments(driver, {CommentType.CREATOR})
+
+    assert sorted(saved) == [i for i in range(30) if i != 25]
+    assert builder.threads_scanned == 25
+
+
+def test_all_comments_respects_max_comments(saved):
+    driver = FakeWebDriver(
+        threads=[make_thread(i) for i in range(100)], comment_batch_size=10
+    )
+    _get_comments(driver, {CommentType.ALL}, max_comments=25, comment_scan_limit=5)
+
+    assert saved == list(range(25))
+
+
+def test_large_comment_section_is_scanned_once(saved):
+    num_threads = 50_000
+    driver = FakeWebDriver(
+        threads=[make_thread(i, hearted=(i % 100 == 0)) for i in range(num_threads)],
+        comment_batch_size=500,
+    )
+    builder = _get_comments(driver, {CommentType.HEARTED})
+
+    assert saved == list(range(0, num_threads, 100))
+    assert driver.calls["threads_described"] == num_threads
+    assert len(builder.seen_comments) == num_threads
+
+
+def _thread_with_replies(i: int, num_replies: int) -> dict:
+    return make_thread(
+        i, replies=[make_thread(i * 1000 + j) for j in range(1, num_replies + 1)]
+    )
+
+
+def test_replies_are_expanded_and_loaded(saved):
+    driver = FakeWebDriver(
+        threads=[
+            _thread_with_replies(1, 25),
+            make_thread(2),
+            _thread_with_replies(3, 3),
+        ],
+        reply_batch_size=10,
+    )
+    builder = _get_comments(driver, {CommentType.ALL}, save_replies=True)
+
+    assert sorted(saved) == sorted(
+        [1, 2, 3] + [1000 + j for j in range(1, 26)] + [3001, 3002, 3003]
+    )
+    assert builder.harvested_threads == {make_thread(i)["link"] for i in [1, 2, 3]}
+
+
+def test_replies_that_are_slow_to_load_are_waited_for(saved):
+    driver = FakeWebDriver(threads=[_thread_with_replies(1, 5)], reply_delay=1)
+    builder = _get_comments(driver, {CommentType.ALL}, save_replies=True)
+
+    assert sorted(saved) == [1, 1001, 1002, 1003, 1004, 1005]
+    assert builder.harvested_threads == {make_thread(1)["link"]}
+
+
+def test_replies_that_never_load_are_not_marked_as_saved(saved):
+    driver = FakeWebDriver(threads=[_thread_with_replies(1, 5)], reply_delay=100)
+    builder = _get_comments(driver, {CommentType.ALL}, save_replies=True)
+
+    assert saved == [1]
+    assert builder.harvested_threads == set()
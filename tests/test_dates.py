@@ -0,0 +1,54 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from yt_community_post_archiver.dates import (
+    DatePosition,
+    DateRange,
+    parse_date_bound,
+    parse_post_date,
+)
+
+NOW = datetime(2026, 6, 1, 12, tzinfo=UTC)
+DAY = timedelta(days=1)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("3 days ago", (NOW - 4 * DAY, NOW - 3 * DAY)),
+        ("1 day ago (edited)", (NOW - 2 * DAY, NOW - DAY)),
+        ("2 weeks ago", (NOW - 21 * DAY, NOW - 14 * DAY)),
+        ("1 month ago", (NOW - 60 * DAY, NOW - 30 * DAY)),
+        ("5 hours ago", (NOW - timedelta(hours=6), NOW - timedelta(hours=5))),
+        (
+            "Jan 5, 2024",
+            (datetime(2024, 1, 5, tzinfo=UTC), datetime(2024, 1, 6, tzinfo=UTC)),
+        ),
+        ("yesterday-ish", None),
+    ],
+)
+def test_parse_post_date(text, expected):
+    assert parse_post_date(text, NOW) == expected
+
+
+def test_parse_date_bound():
+    assert parse_date_bound("30d", NOW) == NOW - 30 * DAY
+    assert parse_date_bound("12h", NOW) == NOW - timedelta(hours=12)
+    assert parse_date_bound("2024-05-01", NOW) == datetime(2024, 5, 1, tzinfo=UTC)
+
+    with pytest.raises(ValueError):
+        parse_date_bound("last week", NOW)
+
+
+def test_date_range_position():
+    date_range = DateRange(since=NOW - 30 * DAY, until=NOW - 7 * DAY)
+
+    assert date_range.position("10 days ago", NOW) == DatePosition.IN_RANGE
+    assert date_range.position("2 days ago", NOW) == DatePosition.NEWER
+    assert date_range.position("2 months ago", NOW) == DatePosition.OLDER
+
+    # These might be in the range, or can't be told, so they're kept.
+    assert date_range.position("1 month ago", NOW) == DatePosition.IN_RANGE
+    assert date_range.position("6 days ago", NOW) == DatePosition.IN_RANGE
+    assert date_range.position(None, NOW) == DatePosition.IN_RANGE
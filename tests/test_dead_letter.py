@@ -0,0 +1,47 @@
+import json
+
+from yt_community_post_archiver.dead_letter import DeadLetterQueue
+
+
+def test_dead_letter_queue(tmp_path):
+    queue = DeadLetterQueue(str(tmp_path / "failed-posts.jsonl"))
+    assert queue.load() == []
+
+    queue.record("https://www.youtube.com/post/a", "timed out", "extract", 3)
+    queue.record("https://www.youtube.com/post/b", "HTTP 404", "fetch_assets", 5)
+    queue.record("https://www.youtube.com/post/a", "still timed out", "extract", 3)
+    assert queue.num_recorded == 3
+
+    # The latest failure for each post is the one that counts.
+    failed = queue.load()
+    assert [entry.url for entry in failed] == [
+        "https://www.youtube.com/post/a",
+        "https://www.youtube.com/post/b",
+    ]
+    assert failed[0].error == "still timed out"
+    assert failed[1].stage == "fetch_assets"
+    assert failed[1].attempts == 5
+
+    queue.resolve("https://www.youtube.com/post/a")
+    assert [entry.url for entry in queue.load()] == ["https://www.youtube.com/post/b"]
+
+
+def test_dead_letter_queue_skips_bad_lines(tmp_path):
+    path = tmp_path / "failed-posts.jsonl"
+    path.write_text(
+        "not json\n"
+        + json.dumps(
+            {
+                "url": "https://www.youtube.com/post/a",
+                "error": "oops",
+                "stage": None,
+                "attempts": 1,
+                "when": "2026-01-01",
+            }
+        )
+        + "\n\n",
+        encoding="utf-8",
+    )
+
+    failed = DeadLetterQueue(str(path)).load()
+    assert [entry.url for entry in failed] == ["https://www.youtube.com/post/a"]
@@ -0,0 +1,97 @@
+import importlib.util
+
+
+def _load_module(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    assert spec is not None
+    assert spec.loader is not None
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+governor_module = _load_module(
+    "governor_module", "src/yt_community_post_archiver/governor.py"
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, secs: float):
+        self.sleeps.append(secs)
+        self.now += secs
+
+
+def _governor(clock: FakeClock, **kwargs):
+    return governor_module.RateGovernor(
+        clock=clock, sleep=clock.sleep, cooldown_secs=10, **kwargs
+    )
+
+
+def test_token_bucket_paces_after_burst():
+    clock = FakeClock()
+    governor = _governor(clock, default_rate=2, burst=3)
+
+    for _ in range(5):
+        governor.acquire("https://www.youtube.com/post/abc")
+
+    # The first three requests use up the burst, after which we're paced at 2 requests/sec.
+    assert clock.sleeps == [0.5, 0.5]
+
+
+def test_hosts_are_paced_separately():
+    clock = FakeClock()
+    governor = _governor(
+        clock, default_rate=1, burst=1, host_rates={"yt3.ggpht.com": 10}
+    )
+
+    governor.acquire("https://www.youtube.com/a")
+    governor.acquire("https://yt3.ggpht.com/a")
+    governor.acquire("https://yt3.ggpht.com/b")
+
+    assert clock.sleeps == [0.1]
+
+
+def test_penalize_backs_off_and_reward_ramps_up():
+    clock = FakeClock()
+    governor = _governor(clock, default_rate=4, burst=1)
+    url = "https://www.youtube.com/post/abc"
+
+    governor.acquire(url)
+    governor.penalize(url, "HTTP 429")
+    assert governor.current_rate(url) == 2
+
+    # We should wait out the cooldown before the next request.
+    governor.acquire(url)
+    assert clock.sleeps[-1] >= 10
+
+    for _ in range(governor.SUCCESS_STREAK):
+        governor.reward(url)
+
+    assert 2 < governor.current_rate(url) <= 4
+
+    for _ in range(governor.SUCCESS_STREAK * 20):
+        governor.reward(url)
+
+    assert governor.current_rate(url) == 4
+
+
+def test_repeated_penalties_increase_cooldown():
+    clock = FakeClock()
+    governor = _governor(clock, default_rate=1, burst=1, min_rate=0.5)
+    url = "https://www.youtube.com/post/abc"
+
+    governor.penalize(url, "captcha page")
+    first = governor.paused_until["www.youtube.com"]
+    governor.penalize(url, "captcha page")
+    second = governor.paused_until["www.youtube.com"]
+
+    assert second - clock.now > first - clock.now
+    assert governor.current_rate(url) == 0.5
@@ -0,0 +1,96 @@
+import pytest
+
+from yt_community_post_archiver import jobs
+from yt_community_post_archiver.jobs import (
+    SqliteJobStore,
+    open_job_store,
+    register_job_store,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"), max_attempts=2, clock=clock)
+    yield store
+    store.close()
+
+
+def test_jobs_are_leased_once(store):
+    assert store.enqueue(["a", "b"]) == 2
+    assert store.enqueue(["b", "c"]) == 1
+
+    first = store.lease("worker-1", 60)
+    second = store.lease("worker-2", 60)
+    third = store.lease("worker-1", 60)
+    assert first is not None and second is not None and third is not None
+    assert [first.url, second.url, third.url] == ["a", "b", "c"]
+    assert store.lease("worker-2", 60) is None
+
+    store.complete("a", "worker-1")
+    assert store.counts() == {"pending": 0, "leased": 2, "done": 1, "failed": 0}
+
+
+def test_expired_leases_are_requeued(store, clock):
+    store.enqueue(["a"])
+    assert store.lease("worker-1", 60) is not None
+
+    # Heartbeats keep the lease alive.
+    clock.now += 50
+    assert store.heartbeat("a", "worker-1", 60)
+    clock.now += 50
+    assert store.lease("worker-2", 60) is None
+
+    clock.now += 60
+    job = store.lease("worker-2", 60)
+    assert job is not None and job.url == "a" and job.attempts == 2
+
+    # The original worker no longer has the lease.
+    assert not store.heartbeat("a", "worker-1", 60)
+    store.complete("a", "worker-1")
+    assert store.counts()["leased"] == 1
+
+    # After too many expired leases, the job is given up on.
+    clock.now += 120
+    assert store.lease("worker-3", 60) is None
+    assert store.counts()["failed"] == 1
+
+
+def test_failed_jobs_are_retried(store):
+    store.enqueue(["a"])
+
+    store.lease("worker-1", 60)
+    store.fail("a", "worker-1", "oops")
+    assert store.counts()["pending"] == 1
+
+    store.lease("worker-1", 60)
+    store.fail("a", "worker-1", "oops")
+    assert store.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+
+
+def test_open_job_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_STORES", dict(jobs.JOB_STORES))
+
+    store = open_job_store(f"sqlite://{tmp_path / 'jobs.sqlite3'}")
+    assert isinstance(store, SqliteJobStore)
+    store.close()
+
+    register_job_store("memory", lambda location: SqliteJobStore(":memory:"))
+    store = open_job_store("memory://anything")
+    assert store.enqueue(["a"]) == 1
+    store.close()
+
+    with pytest.raises(ValueError, match="Unsupported job store `redis`"):
+        open_job_store("redis://localhost")
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from yt_community_post_archiver.pipeline import CrawlPipeline  # noqa: E402
+from yt_community_post_archiver.stages import Stage, StageFailedError  # noqa: E402
+
+
+class FakeBuilder:
+    def __init__(self, archiver: "FakeArchiver", url: str) -> None:
+        self.archiver = archiver
+        self.url = url
+
+    def __log(self, step: str):
+        self.archiver.log.append((step, self.url, threading.current_thread().name))
+
+    def refresh_metadata(self) -> bool:
+        return False
+
+    def extract(self):
+        if self.url in self.archiver.broken:
+            raise RuntimeError("unexpected page layout")
+        self.__log("extract")
+        return object()
+
+    def persist(self):
+        self.__log("persist")
+
+    def fetch_assets(self):
+        if self.url in self.archiver.failing:
+            raise StageFailedError(Stage.FETCH_ASSETS, 5, Exception("oops"))
+        self.__log("fetch")
+
+    def needs_harvest(self) -> bool:
+        return True
+
+    def harvest(self):
+        self.__log("harvest")
+
+    def close_opened_tab(self):
+        pass
+
+
+class FakeSwitchTo:
+    def window(self, _handle):
+        pass
+
+
+class FakeDriver:
+    switch_to = FakeSwitchTo()
+
+
+class FakeArchiver:
+    def __init__(self, pages: list[list[str]], failing: set[str]) -> None:
+        self.pages = pages
+        self.failing = failing
+        self.broken: set[str] = set()
+        self.broken_feed = False
+        self.log = []
+        self.failed = []
+        self.seen = set()
+        self.max_posts = None
+        self.tab_pool_size = 2
+        self.driver = FakeDriver()
+        self.original_handle = "feed"
+
+    def find_posts(self):
+        if self.broken_feed:
+            raise RuntimeError("the feed went away")
+        self.log.append(("find", None, threading.current_thread().name))
+        return [(None, url) for url in self.pages[0] if url not in self.seen]
+
+    def advance_feed(self) -> bool:
+        self.pages.pop(0)
+        return bool(self.pages)
+
+    def at_max_posts(self) -> bool:
+        return False
+
+    def should_skip_post(self, url: str) -> bool:
+        return url.endswith("skip")
+
+    def should_refresh_post(self, _url: str) -> bool:
+        return False
+
+    def make_post_builder(self, _post, url: str) -> FakeBuilder:
+        return FakeBuilder(self, url)
+
+    def record_failed_post(self, url: str, ex: Exception):
+        self.failed.append((url, getattr(ex, "stage", None)))
+
+
+def test_pipeline_runs_every_stage():
+    archiver = FakeArchiver([["a", "b", "c-skip"], ["d", "e"]], failing={"d"})
+    asyncio.run(CrawlPipeline(archiver, queue_size=1, fetch_workers=2).run())  # type: ignore
+
+    for step in ["extract", "persist", "harvest"]:
+        assert sorted(url for s, url, _ in archiver.log if s == step) == [
+            "a",
+            "b",
+            "d",
+            "e",
+        ]
+    assert sorted(url for s, url, _ in archiver.log if s == "fetch") == [
+        "a",
+        "b",
+        "e",
+    ]
+    assert archiver.failed == [("d", Stage.FETCH_ASSETS)]
+    assert archiver.seen == {"a", "b", "c-skip", "d", "e"}
+
+    # Everything that touches the browser happens on the same thread.
+    browser_threads = {
+        thread
+        for step, _, thread in archiver.log
+        if step in ("find", "extract", "harvest")
+    }
+    assert len(browser_threads) == 1
+    assert not browser_threads & {
+        thread for step, _, thread in archiver.log if step in ("persist", "fetch")
+    }
+
+    # Each post is persisted before it's harvested.
+    for url in ["a", "b", "d", "e"]:
+        steps = [s for s, u, _ in archiver.log if u == url]
+        assert steps.index("persist") < steps.index("harvest")
+
+
+def _run(archiver: FakeArchiver, **kwargs):
+    # Fail rather than hang if the pipeline deadlocks.
+    pipeline = CrawlPipeline(archiver, **kwargs)  # type: ignore
+    asyncio.run(asyncio.wait_for(pipeline.run(), timeout=10))
+
+
+def test_unexpected_errors_only_fail_the_post():
+    urls = [f"post-{i}" for i in range(10)]
+    archiver = FakeArchiver([urls], failing=set())
+    archiver.broken = set(urls[:6])
+    _run(archiver, queue_size=1, fetch_workers=1)
+
+    assert [url for url, _ in archiver.failed] == urls[:6]
+    assert sorted(url for s, url, _ in archiver.log if s == "harvest") == urls[6:]
+
+
+def test_discovery_failing_stops_every_stage():
+    archiver = FakeArchiver([["a"]], failing=set())
+    archiver.broken_feed = True
+
+    with pytest.raises(ExceptionGroup) as ex:
+        _run(archiver, queue_size=1, fetch_workers=2)
+
+    assert ex.group_contains(RuntimeError, match="the feed went away")
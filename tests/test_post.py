@@ -0,0 +1,87 @@
+import pytest
+
+from yt_community_post_archiver.post import (
+    Poll,
+    PollEntry,
+    exact_comment_count,
+    get_post_id,
+    refresh_post_data,
+)
+
+
+@pytest.mark.parametrize(
+    "approximate,expected",
+    [
+        ("35", "35"),
+        ("1,234", "1234"),
+        ("0", "0"),
+        ("2.5K", None),
+        ("1M", None),
+        ("", None),
+        (None, None),
+    ],
+)
+def test_exact_comment_count(approximate, expected):
+    assert exact_comment_count(approximate) == expected
+
+
+def test_get_post_id():
+    assert (
+        get_post_id("https://www.youtube.com/post/UgkxzjFK9MbmdHoUW7Tyg54ncKqzkQxAb1AN")
+        == "UgkxzjFK9MbmdHoUW7Tyg54ncKqzkQxAb1AN"
+    )
+    assert get_post_id("https://www.youtube.com/@IRyS/posts") is None
+
+
+def test_refresh_post_data():
+    existing = {
+        "url": "https://www.youtube.com/post/abc",
+        "text": "hello",
+        "images": ["https://example.com/a.png"],
+        "num_thumbs_up": "10",
+        "num_comments": "2",
+        "approximate_num_comments": "2",
+        "poll": None,
+        "when_archived": "2026-01-01",
+    }
+
+    poll = Poll([PollEntry("Yes\n60%"), PollEntry("No\n40%")], "5 votes")
+    first = refresh_post_data(
+        existing,
+        {
+            "num_thumbs_up": "12",
+            "num_comments": "3",
+            "approximate_num_comments": "3",
+            "poll": poll,
+        },
+        "2026-01-02",
+    )
+
+    # Non-volatile fields are untouched.
+    assert first["text"] == "hello"
+    assert first["images"] == existing["images"]
+    assert first["when_archived"] == "2026-01-01"
+
+    assert first["num_thumbs_up"] == "12"
+    assert first["poll"] == {
+        "entries": [
+            {"option": "Yes", "percentage": 60},
+            {"option": "No", "percentage": 40},
+        ],
+        "total_votes": "5 votes",
+    }
+    assert first["when_refreshed"] == "2026-01-02"
+    assert [snapshot["when"] for snapshot in first["history"]] == [
+        "2026-01-01",
+        "2026-01-02",
+    ]
+    assert first["history"][0]["num_thumbs_up"] == "10"
+
+    # Nothing has changed, so there's nothing to save.
+    assert refresh_post_data(first, first, "2026-01-03") is None
+
+    second = refresh_post_data(first, {"num_thumbs_up": "15"}, "2026-01-03")
+    assert second is not None
+    assert second["num_thumbs_up"] == "15"
+    assert len(second["history"]) == 3
+    assert len(first["history"]) == 2
@@ -0,0 +1,95 @@
+from yt_community_post_archiver.recycling import RecycleMonitor, RecyclePolicy
+
+
+def test_recycle_after_posts():
+    monitor = RecycleMonitor(
+        RecyclePolicy(max_posts=3, max_memory_mb=0, latency_factor=0)
+    )
+
+    for _ in range(2):
+        monitor.record_post(1.0)
+        assert monitor.should_recycle() is None
+
+    monitor.record_post(1.0)
+    assert monitor.should_recycle() is not None
+
+    monitor.reset()
+    assert monitor.should_recycle() is None
+
+
+def test_recycle_on_memory():
+    monitor = RecycleMonitor(
+        RecyclePolicy(max_posts=0, max_memory_mb=100, latency_factor=0)
+    )
+
+    monitor.record_post(1.0, 50)
+    assert monitor.should_recycle() is None
+
+    # Browsers that don't report memory shouldn't reset the last known value.
+    monitor.record_post(1.0, None)
+    assert monitor.should_recycle() is None
+
+    monitor.record_post(1.0, 150)
+    assert monitor.should_recycle() is not None
+
+
+def test_memory_is_measured_from_a_fresh_page():
+    monitor = RecycleMonitor(
+        RecyclePolicy(max_posts=0, max_memory_mb=100, latency_factor=0)
+    )
+
+    # A long feed can use a lot of memory from the start, which isn't a reason to restart.
+    monitor.reset(memory_mb=500)
+    monitor.record_post(1.0, 550)
+    assert monitor.should_recycle() is None
+
+    monitor.record_post(1.0, 600)
+    assert monitor.should_recycle() is not None
+
+
+def test_recycle_on_latency_regression():
+    monitor = RecycleMonitor(
+        RecyclePolicy(max_posts=0, max_memory_mb=0, latency_factor=2, latency_window=3)
+    )
+
+    for _ in range(3):
+        monitor.record_post(1.0)
+
+    # Not enough recent posts to compare yet.
+    monitor.record_post(3.0)
+    assert monitor.should_recycle() is None
+
+    monitor.record_post(1.0)
+    monitor.record_post(1.0)
+    assert monitor.should_recycle() is None
+
+    for _ in range(3):
+        monitor.record_post(2.5)
+    assert monitor.should_recycle() is not None
+
+
+def test_one_slow_post_does_not_skew_latency():
+    monitor = RecycleMonitor(
+        RecyclePolicy(max_posts=0, max_memory_mb=0, latency_factor=2, latency_window=3)
+    )
+
+    for duration in [1.0, 10.0, 1.0]:
+        monitor.record_post(duration)
+    for duration in [2.5, 2.5, 2.5]:
+        monitor.record_post(duration)
+    assert monitor.should_recycle() is not None
+
+    monitor.reset()
+    for duration in [1.0, 1.0, 1.0, 1.0, 10.0, 1.0]:
+        monitor.record_post(duration)
+    assert monitor.should_recycle() is None
+
+
+def test_disabled_policy():
+    policy = RecyclePolicy(max_posts=0, max_memory_mb=0, latency_factor=0)
+    assert not policy.is_enabled()
+
+    monitor = RecycleMonitor(policy)
+    for _ in range(100):
+        monitor.record_post(100.0, 100_000)
+    assert monitor.should_recycle() is None
@@ -0,0 +1,65 @@
+import pytest
+
+from yt_community_post_archiver.stages import (
+    DEFAULT_RETRY_POLICIES,
+    Stage,
+    StageFailedError,
+    StageTracker,
+)
+
+
+class Flaky:
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("flaky")
+
+
+def test_stage_is_retried_with_backoff():
+    sleeps = []
+    tracker = StageTracker(sleep=sleeps.append)
+    fn = Flaky(2)
+
+    tracker.run(Stage.FETCH_ASSETS, fn)
+
+    assert fn.calls == 3
+    assert tracker.is_done(Stage.FETCH_ASSETS)
+    policy = DEFAULT_RETRY_POLICIES[Stage.FETCH_ASSETS]
+    assert sleeps == [policy.delay(1), policy.delay(2)]
+    assert sleeps[1] > sleeps[0]
+
+
+def test_completed_stages_are_not_rerun():
+    tracker = StageTracker(sleep=lambda _: None)
+    extract = Flaky(0)
+    comments = Flaky(10)
+
+    def process():
+        tracker.run(Stage.EXTRACT, extract)
+        tracker.run(Stage.COMMENTS, comments)
+
+    with pytest.raises(StageFailedError) as ex:
+        process()
+
+    assert ex.value.stage == Stage.COMMENTS
+    assert ex.value.attempts == 3
+
+    # Resuming should only retry the failed stage.
+    comments.failures = 0
+    process()
+
+    assert extract.calls == 1
+    assert comments.calls == 4
+
+
+def test_on_retry_only_called_before_retries():
+    retries = []
+    tracker = StageTracker(sleep=lambda _: None)
+
+    tracker.run(Stage.SCREENSHOT, Flaky(1), on_retry=lambda: retries.append(1))
+
+    assert retries == [1]
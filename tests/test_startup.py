@@ -0,0 +1,69 @@
+import subprocess
+import sys
+
+import pytest
+
+ARCHIVER = "yt_community_post_archiver"
+
+# Dependencies that should only be loaded once we actually start archiving.
+HEAVY_MODULES = ["selenium", "PIL", "bs4", "requests", "filetype"]
+
+# A (generous) budget for how long importing the entry point can take, in microseconds.
+IMPORT_BUDGET_US = 250_000
+
+
+def _import_times(args: list[str]) -> dict[str, int]:
+    """
+    Run the given arguments with `-X importtime`, and return the cumulative import time of each module.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd="src/",
+        capture_output=True,
+        text=True,
+    )
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) != 3:
+            continue
+
+        try:
+            times[fields[2].strip()] = int(fields[1])
+        except ValueError:
+            continue
+
+    return times
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["-c", f"import {ARCHIVER}"],
+        ["-m", ARCHIVER, "--help"],
+        ["-m", ARCHIVER, "--version"],
+        # Missing URL, so this is an argument error.
+        ["-m", ARCHIVER],
+    ],
+)
+def test_startup_does_not_import_heavy_modules(args: list[str]):
+    times = _import_times(args)
+
+    assert ARCHIVER in times
+    for module in HEAVY_MODULES:
+        assert module not in times, f"`{module}` was imported on startup"
+
+
+def test_import_time_budget():
+    """
+    A simple benchmark that guards the import time of the entry point.
+    """
+
+    times = _import_times(["-c", f"from {ARCHIVER} import main"])
+
+    assert times[ARCHIVER] < IMPORT_BUDGET_US
@@ -0,0 +1,214 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from yt_community_post_archiver import export, migrate
+from yt_community_post_archiver.arguments import DirectoryLayout
+from yt_community_post_archiver.post import Poll, PollEntry, Post, refresh_post_data
+from yt_community_post_archiver.storage import (
+    SQLITE_FILE_NAME,
+    DirectoryStorage,
+    MemoryStorage,
+    SqliteStorage,
+    export_archive,
+    shard_name,
+)
+
+POST_ID = "UgkxzjFK9MbmdHoUW7Tyg54ncKqzkQxAb1AN"
+
+
+def _post() -> Post:
+    return Post(
+        url=f"https://www.youtube.com/post/{POST_ID}",
+        text="hello",
+        images=["https://yt3.ggpht.com/abc=s0?imgmax=0"],
+        links=[],
+        is_members=False,
+        relative_date="1 day ago",
+        approximate_num_comments="1",
+        num_comments="1",
+        num_thumbs_up="10",
+        poll=Poll([PollEntry("yes\n50%"), PollEntry("no\n50%")], "2 votes"),
+        when_archived="2026-01-01 00:00:00+00:00",
+    )
+
+
+@pytest.fixture(params=["directory", "sqlite", "memory"])
+def storage(request, tmp_path: Path):
+    if request.param == "directory":
+        storage = DirectoryStorage(str(tmp_path))
+    elif request.param == "memory":
+        storage = MemoryStorage()
+    else:
+        storage = SqliteStorage(str(tmp_path / SQLITE_FILE_NAME))
+
+    yield storage
+    storage.close()
+
+
+def test_storage_round_trip(storage):
+    assert not storage.has_post(POST_ID)
+
+    _post().save_metadata(storage)
+    storage.write_asset(POST_ID, f"{POST_ID}-0.jpg", b"\xff\xd8\xff")
+    storage.write_comment(POST_ID, "lc=abc", {"author": "someone"})
+
+    assert storage.has_post(POST_ID)
+    assert list(storage.iter_post_ids()) == [POST_ID]
+    assert storage.has_asset(POST_ID, f"{POST_ID}-0.")
+    assert not storage.has_asset(POST_ID, f"{POST_ID}-1.")
+
+    data = storage.read_post(POST_ID)
+    assert data["text"] == "hello"
+    assert data["poll"]["entries"][0] == {"option": "yes", "percentage": 50}
+
+    assert list(storage.iter_assets(POST_ID)) == [(f"{POST_ID}-0.jpg", b"\xff\xd8\xff")]
+    [(comment_id, comment)] = list(storage.iter_comments(POST_ID))
+    assert comment_id == "lc=abc"
+    assert json.loads(comment) == {"author": "someone"}
+
+
+def test_unchanged_records_are_not_rewritten(storage):
+    assert _post().save_metadata(storage)
+    assert storage.write_comment_if_changed(
+        POST_ID, "lc=abc", {"text": "hi", "when_archived": "1"}
+    )
+
+    # Only the timestamps are different.
+    later = _post()
+    later.when_archived = "2026-02-01 00:00:00+00:00"
+    later.relative_date = "1 month ago"
+    assert not later.save_metadata(storage)
+    assert not storage.write_comment_if_changed(
+        POST_ID, "lc=abc", {"text": "hi", "when_archived": "2"}
+    )
+    assert storage.read_post(POST_ID)["when_archived"] == _post().when_archived
+
+    later.num_thumbs_up = "11"
+    assert later.save_metadata(storage)
+    assert storage.write_comment_if_changed(
+        POST_ID, "lc=abc", {"text": "edited", "when_archived": "3"}
+    )
+    assert storage.read_post(POST_ID)["num_thumbs_up"] == "11"
+    assert storage.read_comment(POST_ID, "lc=abc")["text"] == "edited"
+
+
+def test_refresh_history_is_kept(storage):
+    _post().save_metadata(storage)
+    saved = storage.read_post(POST_ID)
+    refreshed = refresh_post_data(saved, {**saved, "num_thumbs_up": "12"}, "2026-02-01")
+    storage.write_post(POST_ID, refreshed)
+
+    # A full save with the same values as the refresh doesn't count as a change.
+    later = _post()
+    later.num_thumbs_up = "12"
+    assert not later.save_metadata(storage)
+
+    later.num_thumbs_up = "13"
+    assert later.save_metadata(storage)
+    saved = storage.read_post(POST_ID)
+    assert saved["num_thumbs_up"] == "13"
+    assert saved["when_refreshed"] == "2026-02-01"
+    assert len(saved["history"]) == 2
+
+
+def test_unchanged_post_keeps_its_file(tmp_path: Path):
+    storage = DirectoryStorage(str(tmp_path))
+    _post().save_metadata(storage)
+
+    post_path = tmp_path / POST_ID / "post.json"
+    os.utime(post_path, (0, 0))
+    _post().save_metadata(storage)
+    assert post_path.stat().st_mtime == 0
+
+    # A broken post is replaced.
+    post_path.write_text("{")
+    assert _post().save_metadata(storage)
+    assert storage.read_post(POST_ID)["text"] == "hello"
+
+
+def test_memory_storage_discard():
+    storage = MemoryStorage()
+    _post().save_metadata(storage)
+    storage.write_asset(POST_ID, f"{POST_ID}-0.jpg", b"\xff\xd8\xff")
+
+    storage.discard(POST_ID)
+
+    assert not storage.has_post(POST_ID)
+    assert list(storage.iter_assets(POST_ID)) == []
+
+
+def test_images_already_saved_are_not_refetched(storage):
+    storage.write_asset(POST_ID, f"{POST_ID}-0.jpg", b"\xff\xd8\xff")
+
+    # This would fail if it tried to actually download anything.
+    _post().save_images(storage)
+
+
+def test_export_sqlite_to_directory(tmp_path: Path):
+    packed = tmp_path / "packed"
+    packed.mkdir()
+
+    source = SqliteStorage(str(packed / SQLITE_FILE_NAME))
+    _post().save_metadata(source)
+    source.write_asset(POST_ID, "screenshot.png", b"\x89PNG")
+    source.write_comment(POST_ID, "lc=abc", {"author": "someone"})
+    source.close()
+
+    unpacked = tmp_path / "unpacked"
+    export.main([str(packed), str(unpacked)])
+
+    post_dir = unpacked / POST_ID
+    assert json.loads((post_dir / "post.json").read_text())["url"] == _post().url
+    assert (post_dir / "screenshot.png").read_bytes() == b"\x89PNG"
+    assert json.loads((post_dir / "comments" / "lc=abc.json").read_text()) == {
+        "author": "someone"
+    }
+
+    # And back again.
+    repacked = SqliteStorage(str(tmp_path / "repacked.sqlite3"))
+    assert export_archive(DirectoryStorage(str(unpacked)), repacked) == 1
+    assert repacked.read_post(POST_ID) == json.loads(
+        (post_dir / "post.json").read_text()
+    )
+    repacked.close()
+
+
+def test_sharded_layout(tmp_path: Path):
+    storage = DirectoryStorage(str(tmp_path), DirectoryLayout.SHARDED)
+    _post().save_metadata(storage)
+    storage.write_comment(POST_ID, "lc=abc", {"author": "someone"})
+
+    post_dir = tmp_path / shard_name(POST_ID) / POST_ID
+    assert (post_dir / "post.json").exists()
+    assert (post_dir / "comments" / "lc=abc.json").exists()
+    assert storage.has_post(POST_ID)
+    assert list(storage.iter_post_ids()) == [POST_ID]
+
+    # A flat storage shouldn't see sharded posts, and vice versa.
+    assert not DirectoryStorage(str(tmp_path)).has_post(POST_ID)
+    assert list(DirectoryStorage(str(tmp_path)).iter_post_ids()) == []
+
+
+def test_migrate_between_layouts(tmp_path: Path):
+    flat = DirectoryStorage(str(tmp_path))
+    post_ids = [f"{POST_ID}{i}" for i in range(50)]
+    for post_id in post_ids:
+        flat.write_post(post_id, {"id": post_id})
+        flat.write_asset(post_id, f"{post_id}-0.jpg", b"\xff\xd8\xff")
+
+    migrate.main([str(tmp_path), "--to", "sharded", "-j", "4"])
+
+    sharded = DirectoryStorage(str(tmp_path), DirectoryLayout.SHARDED)
+    assert sorted(sharded.iter_post_ids()) == sorted(post_ids)
+    assert list(flat.iter_post_ids()) == []
+    assert sharded.has_asset(post_ids[0], f"{post_ids[0]}-0.")
+
+    # Migrating again is a no-op.
+    assert migrate.migrate_archive(str(tmp_path), DirectoryLayout.SHARDED) == 0
+
+    assert migrate.migrate_archive(str(tmp_path), DirectoryLayout.FLAT) == 50
+    assert sorted(flat.iter_post_ids()) == sorted(post_ids)
+    assert sorted(os.listdir(tmp_path)) == sorted(post_ids)
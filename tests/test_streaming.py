@@ -0,0 +1,76 @@
+import hashlib
+import io
+import json
+
+from yt_community_post_archiver.storage import DirectoryStorage
+from yt_community_post_archiver.streaming import StreamingStorage, open_record_stream
+
+
+def test_streaming_storage(tmp_path):
+    stream = io.StringIO()
+    storage = StreamingStorage(DirectoryStorage(str(tmp_path)), stream)
+
+    storage.write_post("abc", {"url": "https://www.youtube.com/post/abc"})
+    storage.write_asset("abc", "abc-0.png", b"image")
+    storage.write_comment("abc", "lc=1", {"contents": "hi"})
+
+    # Everything is still saved as usual.
+    assert storage.read_post("abc") == {"url": "https://www.youtube.com/post/abc"}
+    assert (tmp_path / "abc" / "abc-0.png").read_bytes() == b"image"
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["type"] for record in records] == ["post", "asset", "comment"]
+    assert records[0]["data"]["url"] == "https://www.youtube.com/post/abc"
+    assert records[1]["sha256"] == hashlib.sha256(b"image").hexdigest()
+    assert records[1]["path"] == str(tmp_path / "abc" / "abc-0.png")
+    assert records[2]["comment_id"] == "lc=1"
+
+
+def test_unchanged_records_are_still_streamed(tmp_path):
+    stream = io.StringIO()
+    storage = StreamingStorage(DirectoryStorage(str(tmp_path)), stream)
+    post = {"url": "https://www.youtube.com/post/abc", "when_archived": "1"}
+    comment = {"contents": "hi", "when_archived": "1"}
+
+    assert storage.write_post_if_changed("abc", post)
+    assert storage.write_comment_if_changed("abc", "lc=1", comment)
+    assert not storage.write_post_if_changed("abc", {**post, "when_archived": "2"})
+    assert not storage.write_comment_if_changed(
+        "abc", "lc=1", {**comment, "when_archived": "2"}
+    )
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record["type"] for record in records] == [
+        "post",
+        "comment",
+        "post",
+        "comment",
+    ]
+    assert records[2]["data"]["when_archived"] == "2"
+
+    # The saved records weren't touched.
+    assert storage.read_post("abc")["when_archived"] == "1"
+
+
+def test_broken_stream_does_not_stop_archiving(tmp_path):
+    class BrokenStream(io.StringIO):
+        def write(self, _s):
+            raise BrokenPipeError
+
+    storage = StreamingStorage(DirectoryStorage(str(tmp_path)), BrokenStream())
+
+    storage.write_post("abc", {"url": "https://www.youtube.com/post/abc"})
+    storage.write_post("def", {"url": "https://www.youtube.com/post/def"})
+
+    assert storage.stream is None
+    assert storage.has_post("abc") and storage.has_post("def")
+
+
+def test_stream_to_file(tmp_path):
+    path = tmp_path / "records.ndjson"
+    stream = open_record_stream(str(path))
+    storage = StreamingStorage(DirectoryStorage(str(tmp_path / "output")), stream)
+    storage.write_post("abc", {"url": "https://www.youtube.com/post/abc"})
+    stream.close()
+
+    assert json.loads(path.read_text(encoding="utf-8"))["post_id"] == "abc"
@@ -0,0 +1,29 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from fake_webdriver import POST_URL, FakeWebDriver  # noqa: E402
+
+from yt_community_post_archiver import tabs  # noqa: E402
+from yt_community_post_archiver.tabs import DetailTabPool  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(tabs, "LOAD_SLEEP_SECS", 0)
+
+
+def test_prefetched_tab_is_kept_until_opened():
+    driver = FakeWebDriver()
+    pool = DetailTabPool(driver, "feed", size=2)  # type: ignore
+    urls = [POST_URL.format(i) for i in range(5)]
+
+    # Process posts one at a time, prefetching the next one before opening the current one.
+    for i, url in enumerate(urls):
+        if i + 1 < len(urls):
+            pool.prefetch(urls[i + 1])
+        assert pool.open(url) is not None
+        pool.release()
+
+    assert sorted(driver.loaded_urls) == urls
+    assert driver.calls["get"] == 1
@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+from yt_community_post_archiver.tracing import WebDriverTracer
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += 0.001
+        return self.now
+
+
+class FakeDriver:
+    def execute(self, driver_command: str, params: dict | None = None):
+        return {"value": None}
+
+
+def _find_likes(driver: FakeDriver):
+    driver.execute("findElements", {"using": "css selector", "value": "#likes"})
+
+
+def _get_text(driver: FakeDriver):
+    driver.execute("getElementText", {"id": "abc"})
+
+
+def test_commands_are_counted_and_attributed(tmp_path: Path):
+    driver = FakeDriver()
+    tracer = WebDriverTracer(clock=FakeClock())
+    tracer.attach(driver)
+
+    with tracer.post("post1"):
+        _find_likes(driver)
+        _find_likes(driver)
+        _get_text(driver)
+
+    _get_text(driver)
+
+    summary = {
+        (command, caller): count for command, caller, count, _ in tracer.summary()
+    }
+    assert summary == {
+        ("findElements", "test_tracing._find_likes"): 2,
+        ("getElementText", "test_tracing._get_text"): 2,
+    }
+
+    webdriver_events = [e for e in tracer.events if e.category == "webdriver"]
+    assert [e.post for e in webdriver_events] == ["post1", "post1", "post1", None]
+
+    trace_path = tmp_path / "trace.json"
+    tracer.write_chrome_trace(str(trace_path))
+    trace = json.loads(trace_path.read_text())
+
+    assert len(trace["traceEvents"]) == 5
+    post_event = next(e for e in trace["traceEvents"] if e["cat"] == "post")
+    assert post_event["name"] == "post1"
+    assert post_event["ph"] == "X"
+    assert all(e["dur"] > 0 for e in trace["traceEvents"])
@@ -0,0 +1,91 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from yt_community_post_archiver.dead_letter import (
+    DEAD_LETTER_FILE_NAME,
+    DeadLetterQueue,
+)
+from yt_community_post_archiver.storage import (
+    SQLITE_FILE_NAME,
+    DirectoryStorage,
+    SqliteStorage,
+)
+from yt_community_post_archiver.verify import repair_archive, verify_archive
+
+Image = pytest.importorskip("PIL.Image")
+
+GOOD_ID = "UgkxGood"
+BROKEN_ID = "UgkxBroken"
+CORRUPT_ID = "UgkxCorrupt"
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _jpg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (4, 4), "blue").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _fill(storage):
+    images = [f"https://yt3.ggpht.com/{i}=s0" for i in range(3)]
+
+    storage.write_post(GOOD_ID, {"images": images[:1]})
+    storage.write_asset(GOOD_ID, f"{GOOD_ID}-0.png", _png())
+
+    storage.write_post(BROKEN_ID, {"images": images})
+    storage.write_asset(BROKEN_ID, f"{BROKEN_ID}-0.jpg", _jpg()[:-40])
+    storage.write_asset(BROKEN_ID, f"{BROKEN_ID}-1.png", b"<!DOCTYPE html><html>")
+    storage.write_asset(BROKEN_ID, "screenshot.png", _png())
+
+    storage.write_post(CORRUPT_ID, {"images": []})
+
+
+@pytest.fixture(params=["directory", "sqlite"])
+def archive(request, tmp_path: Path) -> str:
+    if request.param == "directory":
+        storage = DirectoryStorage(str(tmp_path))
+        _fill(storage)
+        (tmp_path / CORRUPT_ID / "post.json").write_text('{"images": [')
+    else:
+        storage = SqliteStorage(str(tmp_path / SQLITE_FILE_NAME))
+        _fill(storage)
+        storage.connection.execute(
+            "UPDATE posts SET data = ? WHERE post_id = ?", ('{"images": [', CORRUPT_ID)
+        )
+
+    storage.close()
+    return str(tmp_path)
+
+
+def test_verify_finds_problems(archive: str):
+    num_posts, problems = verify_archive(archive, decode=True, jobs=2)
+
+    assert num_posts == 3
+    issues = {(p.post_id, p.name): p.issue for p in problems}
+    assert issues == {
+        (BROKEN_ID, f"{BROKEN_ID}-0.jpg"): "is a truncated jpg",
+        (BROKEN_ID, f"{BROKEN_ID}-1.png"): "is an HTML page, not an image",
+        (BROKEN_ID, f"{BROKEN_ID}-2.*"): "is missing",
+        (CORRUPT_ID, "post.json"): issues[(CORRUPT_ID, "post.json")],
+    }
+    assert issues[(CORRUPT_ID, "post.json")].startswith("is not valid JSON")
+
+
+def test_repair(archive: str):
+    _, problems = verify_archive(archive, jobs=1)
+
+    num_fixed = repair_archive(archive, problems, fetcher=lambda url, _: _png())
+
+    assert num_fixed == 4
+    _, remaining = verify_archive(archive, jobs=1)
+    assert [(p.post_id, p.name) for p in remaining] == [(CORRUPT_ID, "post.json")]
+
+    [queued] = DeadLetterQueue(str(Path(archive) / DEAD_LETTER_FILE_NAME)).load()
+    assert queued.url.endswith(CORRUPT_ID)